@@ -20,8 +20,16 @@ def get_care_suggestions(health_status):
             {"icon": "📝", "text": "Test soil pH and nutrient levels to ensure optimal growing conditions", "color": "#dc2626"}
         ]
 
-def render_results(health_status, confidence):
-    """Render the analysis results."""
+def render_results(health_status, confidence, spread=None, heatmap_overlay=None, gradcam_overlay=None):
+    """Render the analysis results.
+
+    ``spread`` is the standard deviation of the prediction across test-time
+    augmentation views; when given it is shown under the confidence meter.
+    ``heatmap_overlay`` is an image with unhealthy regions highlighted by
+    tiled analysis and ``gradcam_overlay`` one with the regions that drove the
+    verdict highlighted by Grad-CAM; each is shown below the confidence meter
+    when given.
+    """
     if health_status is None or confidence is None:
         st.error("Could not analyze the image. Please try uploading a different photo.")
         return
@@ -373,7 +381,26 @@ def render_results(health_status, confidence):
                 <span class="confidence-value">{confidence:.1%}</span>
             </div>
         """, unsafe_allow_html=True)
+
+        # Agreement across augmented views
+        if spread is not None:
+            stability = "stable" if spread < 0.05 else "sensitive to framing - consider another photo"
+            st.markdown(f"""
+                <p style="color: #64748b; font-size: 0.9rem; margin: -0.5rem 0 1.5rem 0;">
+                    Spread across augmented views: ±{spread:.1%} ({stability})
+                </p>
+            """, unsafe_allow_html=True)
         
+        # Per-tile unhealthy heatmap from tiled analysis
+        if heatmap_overlay is not None:
+            st.image(heatmap_overlay, use_column_width=True,
+                     caption="Tile heatmap: redder areas look less healthy")
+
+        # Grad-CAM explanation of the verdict
+        if gradcam_overlay is not None:
+            st.image(gradcam_overlay, use_column_width=True,
+                     caption=f"Why \"{status_text}\": redder areas influenced the verdict most")
+
         # Care recommendations
         st.markdown("""
             <h3 class="recommendations-title fade-in-up">
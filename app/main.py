@@ -1,17 +1,37 @@
 """Main application file for the Smart Plant Care app."""
+import time
+_SCRIPT_START = time.perf_counter()
 import os
+import logging
 import streamlit as st
 from PIL import Image
-import io
-import numpy as np
 import sys
 # Add utils directory to path to ensure imports work
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from app.utils.image_diagnostics import run_image_diagnostic_test, diagnose_image, repair_image
+from utils.image_diagnostics import run_image_diagnostic_test, repair_image
 from components.header import render_header
 from components.sidebar import render_sidebar, render_sidebar_toggle
 from components.results import render_results
-from utils.model_utils import analyze_image
+from utils.batching import get_dispatcher
+from utils.prediction_cache import get_prediction_cache
+from utils.model_utils import preload_model, is_model_ready, analyze_image
+from utils.decoding import ImageDecodeError
+from utils.upload import Upload
+from utils.tta import analyze_image_tta, DEFAULT_TTA_VIEWS, MAX_TTA_VIEWS
+from utils.tiling import analyze_image_tiled, heatmap_overlay, DEFAULT_TILE_STRIDE, DEFAULT_MAX_TILES
+from utils.timing import STAGES, span, snapshot, is_enabled as timing_enabled
+from utils.inference_gate import get_inference_gate
+from utils.model_family import available_tiers, tier_metadata, DEFAULT_TIER, MAIN_MODEL
+from utils.precision import PRECISION_LABELS
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# Uploads are decoded at the smallest JPEG scale that still covers this preview size
+PREVIEW_MIN_SIZE = (512, 512)
+
+# Start loading and warming the model in the background as soon as the server runs this script
+model_future = preload_model()
 
 # Set page config
 st.set_page_config(
@@ -604,6 +624,66 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+def render_model_status():
+    """Show whether the AI model has finished loading in the background."""
+    if is_model_ready():
+        # Registry-backed models report the version currently being served
+        model = preload_model().result()
+        details = [getattr(model, 'version', None)]
+        # Reduced precision is named so float16 is not mistaken for a faster compute mode
+        precision = getattr(model, 'precision', 'float32')
+        if precision != 'float32':
+            details.append(PRECISION_LABELS[precision])
+        details = [detail for detail in details if detail]
+        label = f"🟢 AI model ready ({', '.join(details)})" if details else "🟢 AI model ready"
+        st.markdown(f'<p style="text-align: center; color: #059669; font-weight: 600;">{label}</p>',
+                    unsafe_allow_html=True)
+    elif model_future.done():
+        st.markdown('<p style="text-align: center; color: #dc2626; font-weight: 600;">🔴 AI model failed to load</p>',
+                    unsafe_allow_html=True)
+    else:
+        st.markdown('<p style="text-align: center; color: #f59e0b; font-weight: 600;">⏳ AI model is loading...</p>',
+                    unsafe_allow_html=True)
+
+def render_latency_breakdown():
+    """Show per-stage latency percentiles collected while PLANT_CARE_TIMING=1."""
+    stats = snapshot()
+    with st.expander("⏱️ Latency breakdown"):
+        rows = [{
+            'stage': stage,
+            'count': stats[stage]['count'],
+            'p50 (ms)': round(stats[stage]['p50'] * 1000, 2),
+            'p95 (ms)': round(stats[stage]['p95'] * 1000, 2),
+            'p99 (ms)': round(stats[stage]['p99'] * 1000, 2),
+        } for stage in STAGES if stage in stats]
+        if rows:
+            st.table(rows)
+        else:
+            st.write("No timings recorded yet.")
+
+        # Queue wait versus inference time separates contention from compute
+        gate = get_inference_gate()
+        if gate is not None:
+            gate_stats = gate.stats()
+            st.caption(f"Inference gate: {gate_stats['in_flight']}/{gate_stats['max_concurrent']} slots busy, "
+                       f"{gate_stats['queued_now']} waiting, {gate_stats['had_to_queue']} of "
+                       f"{gate_stats['admitted']} requests queued, {gate_stats['timed_out']} timed out")
+
+def get_session_upload(uploaded_file) -> Upload:
+    """Return the Upload for this file, reused across reruns while the same bytes stay uploaded.
+
+    Streamlit reruns the whole script on every interaction (changing an option,
+    pressing the diagnostics button), so keeping the Upload in the session means
+    its hash, decode and diagnostics are computed once per upload, not per rerun.
+    """
+    uploaded_file.seek(0)
+    image_bytes = uploaded_file.read()
+    upload = st.session_state.get('upload')
+    if upload is None or upload.data != image_bytes:
+        upload = Upload(image_bytes, name=uploaded_file.name, mime_type=uploaded_file.type)
+        st.session_state.upload = upload
+    return upload
+
 def main():
     """Main function to run the Streamlit app."""
     # Initialize sidebar state
@@ -655,6 +735,8 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
+    render_model_status()
+
     # File uploader in its own container
     st.markdown("""
         <div class="file-uploader-container">
@@ -668,6 +750,37 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
+    # Optional test-time augmentation for borderline photos
+    with st.expander("⚙️ Analysis options"):
+        use_tta = st.checkbox("Test-time augmentation",
+                              help="Score flipped, cropped and rotated views together and average them. "
+                                   "Slower, but steadier on borderline photos.")
+        tta_views = st.slider("Augmented views", min_value=2, max_value=MAX_TTA_VIEWS,
+                              value=DEFAULT_TTA_VIEWS, disabled=not use_tta)
+        use_tiles = st.checkbox("High-resolution tiled analysis",
+                                help="Score overlapping 224x224 tiles of the full-resolution photo so small "
+                                     "lesions are not lost, and show where the model sees problems.")
+        tile_stride = st.slider("Tile stride (pixels)", min_value=56, max_value=224, step=28,
+                                value=DEFAULT_TILE_STRIDE, disabled=not use_tiles)
+        max_tiles = st.slider("Maximum tiles", min_value=4, max_value=256,
+                              value=DEFAULT_MAX_TILES, disabled=not use_tiles)
+        explain = st.checkbox("Explain the verdict (Grad-CAM)",
+                              help="Highlight the parts of the leaf that drove the result. "
+                                   "Computed in the same pass as the prediction.")
+        tier = None
+        tiers = available_tiers()
+        if tiers:
+            # Standard must mean the main model even when PLANT_CARE_TIER makes a tier the default
+            tier_labels = {'Standard': MAIN_MODEL if DEFAULT_TIER else None,
+                           **{name.capitalize(): name for name in tiers}}
+            tier = tier_labels[st.radio("Model", list(tier_labels), horizontal=True,
+                                        help="Fast uses a lower-resolution model for quicker results on "
+                                             "slow devices; Accurate uses the most accurate model.")]
+            if tier in tiers:
+                metadata = tier_metadata(tier)
+                st.caption(f"{metadata['input_size']}px model, ~{metadata['cpu_latency_ms']:.0f} ms per image, "
+                           f"{metadata['val_accuracy']:.1%} validation accuracy")
+
     uploaded_file = st.file_uploader(
         "",  # Empty label since we have custom HTML above
         type=['jpg', 'jpeg', 'png'],
@@ -676,126 +789,42 @@ def main():
 
     # Handle uploaded file
     if uploaded_file is not None:
+        upload = None
         try:
             # Get file info for debugging
             file_info = f"File: {uploaded_file.name}, Type: {uploaded_file.type}, Size: {uploaded_file.size} bytes"
 
-            # Reset file pointer and read bytes
-            uploaded_file.seek(0)
-            image_bytes = uploaded_file.read()
+            # Read the bytes once; hashing, decoding and diagnostics are shared through the Upload
+            upload = get_session_upload(uploaded_file)
 
-            # Try multiple approaches to load the image
-            image = None
+            # Reuse a cached prediction for identical bytes and skip decoding entirely
+            prediction_cache = get_prediction_cache()
+            cached_result = None if use_tta or use_tiles or tier else prediction_cache.get(upload)
+            cached_gradcam = None
+            if explain and cached_result is not None:
+                # Explanations are cached with the prediction; without one the image must be scored again
+                cached_gradcam = prediction_cache.get_gradcam(upload)
+                if cached_gradcam is None:
+                    cached_result = None
 
-            # Method 1: Direct BytesIO with proper error handling
-            try:
-                # Create a fresh BytesIO object to ensure clean data
-                image_buffer = io.BytesIO(image_bytes)
-                image = Image.open(image_buffer)
-
-                # Verify image is valid by forcing load
-                image.load()
-
-                # Convert to RGB immediately to avoid mode issues
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-
-                # Test if image can be processed
-                test_array = np.array(image)
-                if test_array.size == 0:
-                    raise Exception("Image array is empty")
-            except Exception as e1:
-                st.markdown(f"""
-                    <div style="background: linear-gradient(135deg, #fff3cd 0%, #ffeaa7 100%); border: 2px solid #fdcb6e; border-radius: 12px; padding: 1rem; margin: 0.75rem 0; color: #856404; font-weight: 500; box-shadow: 0 4px 12px rgba(253, 203, 110, 0.2);">
-                        <strong style="color: #d63031;">⚠️ Method 1 failed:</strong> {str(e1)}
-                    </div>
-                """, unsafe_allow_html=True)
-
-                # Method 2: Using temporary file with proper extension
+            # Load the image
+            image = None
+            if cached_result is not None:
+                # st.image can render the raw bytes directly
+                image = upload.data
+            else:
+                # Decode once from memory: PIL first, OpenCV for files PIL rejects.
+                # Tiling needs every pixel; otherwise a reduced-scale decode covers both
+                # the preview and the model input.
                 try:
-                    import tempfile
-                    import os
-                    import imghdr
-
-                    # Try to detect actual image type regardless of extension
-                    actual_type = imghdr.what(None, h=image_bytes)
-
-                    # Use detected type if available, fallback to content-type
-                    if actual_type:
-                        file_extension = f'.{actual_type}'
-                    else:
-                        file_extension = '.png' if uploaded_file.type == 'image/png' else '.jpg'
-
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-                        tmp_file.write(image_bytes)
-                        tmp_file.flush()
-                        os.fsync(tmp_file.fileno())  # Ensure data is written to disk
-
-                        # Force sync and wait
-                        import time
-                        time.sleep(0.1)
-
-                        image = Image.open(tmp_file.name)
-                        image.load()  # Force load to verify image is valid
-
-                        if image.mode != 'RGB':
-                            image = image.convert('RGB')
-
-                        # Clean up
-                        os.unlink(tmp_file.name)
-                except Exception as e2:
+                    image = upload.image(None if use_tiles else PREVIEW_MIN_SIZE)
+                except ImageDecodeError as e:
                     st.markdown(f"""
                         <div style="background: linear-gradient(135deg, #fff3cd 0%, #ffeaa7 100%); border: 2px solid #fdcb6e; border-radius: 12px; padding: 1rem; margin: 0.75rem 0; color: #856404; font-weight: 500; box-shadow: 0 4px 12px rgba(253, 203, 110, 0.2);">
-                            <strong style="color: #d63031;">⚠️ Method 2 failed:</strong> {str(e2)}
+                            <strong style="color: #d63031;">⚠️ Decoding failed:</strong> {str(e)}
                         </div>
                     """, unsafe_allow_html=True)
-
-                    # Method 3: Try with different approach and image libraries
-                    try:
-                        import tempfile
-                        import cv2
-
-                        # Try OpenCV as an alternative to PIL
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                            tmp_file.write(image_bytes)
-                            tmp_file.flush()
-                            os.fsync(tmp_file.fileno())
-
-                            # Try OpenCV first
-                            try:
-                                cv_img = cv2.imread(tmp_file.name)
-                                if cv_img is not None and cv_img.size > 0:
-                                    # Convert from BGR to RGB
-                                    cv_img = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-                                    # Convert OpenCV image to PIL
-                                    image = Image.fromarray(cv_img)
-                                else:
-                                    raise Exception("OpenCV could not load the image")
-                            except Exception as cv_error:
-                                # Fallback to PIL with different modes
-                                for mode in ['RGB', 'RGBA', 'L', 'P', '1']:
-                                    try:
-                                        image = Image.open(tmp_file.name)
-                                        image.load()  # Force load
-                                        image = image.convert(mode)
-                                        if mode != 'RGB':
-                                            image = image.convert('RGB')
-                                        break
-                                    except:
-                                        continue
-
-                            # Clean up
-                            os.unlink(tmp_file.name)
-
-                            if image is None:
-                                raise Exception("Could not load image with any method or mode")
-                    except Exception as e3:
-                        st.markdown(f"""
-                            <div style="background: linear-gradient(135deg, #fff3cd 0%, #ffeaa7 100%); border: 2px solid #fdcb6e; border-radius: 12px; padding: 1rem; margin: 0.75rem 0; color: #856404; font-weight: 500; box-shadow: 0 4px 12px rgba(253, 203, 110, 0.2);">
-                                <strong style="color: #d63031;">⚠️ Method 3 failed:</strong> {str(e3)}
-                            </div>
-                        """, unsafe_allow_html=True)
-                        raise Exception(f"All methods failed. The image file appears to be corrupted or in an unsupported format.")
+                    raise Exception(f"All methods failed. The image file appears to be corrupted or in an unsupported format.")
 
             # Verify image was loaded
             if image is None:
@@ -806,21 +835,64 @@ def main():
 
             # Column 1: Image Preview
             st.markdown('<div class="image-preview">', unsafe_allow_html=True)
-            st.image(image, use_column_width=True, caption="Your Plant Photo")
+            with span('render'):
+                st.image(image, use_column_width=True, caption="Your Plant Photo")
             st.markdown('</div>', unsafe_allow_html=True)
 
             # Column 2: Analysis Results
+            if cached_result is None and not model_future.done():
+                # Only block on the background load if it has not finished yet
+                with st.spinner('⏳ Waiting for the AI model to finish loading...'):
+                    wait_start = time.perf_counter()
+                    preload_model().exception()
+                    logger.info("Upload waited %.2fs for the model", time.perf_counter() - wait_start)
+
             with st.spinner('🔍 Analyzing your plant with AI...'):
-                # Analyze the image
-                health_status, confidence = analyze_image(image)
+                # Analyze the image unless an identical upload was already scored
+                spread = None
+                overlay = None
+                gradcam = None
+                if use_tiles:
+                    health_status, confidence, heatmap = analyze_image_tiled(upload, tile_stride, max_tiles, tier=tier)
+                    if heatmap is not None:
+                        overlay = heatmap_overlay(image, heatmap)
+                elif use_tta:
+                    health_status, confidence, spread = analyze_image_tta(upload, tta_views, tier=tier)
+                elif cached_result is not None:
+                    health_status, confidence = cached_result
+                    gradcam = cached_gradcam
+                elif explain:
+                    health_status, confidence, gradcam = analyze_image(upload, return_gradcam=True, tier=tier)
+                    # The cache holds results of the main model only
+                    if health_status is not None and not tier:
+                        prediction_cache.put(upload, (health_status, confidence), gradcam)
+                elif tier:
+                    health_status, confidence = analyze_image(upload, tier=tier)
+                else:
+                    health_status, confidence = get_dispatcher().analyze_image(upload)
+                    if health_status is not None:
+                        prediction_cache.put(upload, (health_status, confidence))
+
+                gradcam_overlay = None
+                if explain and gradcam is not None:
+                    base_image = image if isinstance(image, Image.Image) else upload.image(PREVIEW_MIN_SIZE)
+                    gradcam_overlay = heatmap_overlay(base_image, gradcam)
+                elif health_status is not None and explain and not (use_tta or use_tiles):
+                    # Images the cascade stage answers never reach the CNN, so there is no map
+                    st.caption("No map for this photo: the quick color check answered it without running the "
+                               "full model, or the model backend cannot explain")
 
                 # Render results
                 st.markdown('<div class="analysis-results">', unsafe_allow_html=True)
-                render_results(health_status, confidence)
+                with span('render'):
+                    render_results(health_status, confidence, spread, overlay, gradcam_overlay)
                 st.markdown('</div>', unsafe_allow_html=True)
 
             st.markdown('</div>', unsafe_allow_html=True)
 
+            if timing_enabled():
+                render_latency_breakdown()
+
         except Exception as e:
             st.markdown("""
                 <div class="error-container">
@@ -846,10 +918,9 @@ def main():
                 st.markdown("### Image Diagnostics")
                 st.markdown("Running comprehensive diagnostics on your image to identify the problem...")
 
-                # Run diagnostics
-                if uploaded_file:
-                    uploaded_file.seek(0)
-                    diagnostic_results = diagnose_image(uploaded_file)
+                # Run diagnostics on the already-read upload, reusing its decode
+                if upload is not None:
+                    diagnostic_results = upload.diagnostics
 
                     # Display diagnostic info
                     st.markdown(f"**Format detected:** {diagnostic_results.get('format', 'Unknown')}")
@@ -873,8 +944,7 @@ def main():
                     # Try repair if needed
                     if not diagnostic_results.get('valid'):
                         st.markdown("#### Attempting to repair image...")
-                        uploaded_file.seek(0)
-                        repaired_image = repair_image(uploaded_file)
+                        repaired_image = repair_image(upload)
 
                         if repaired_image:
                             st.markdown("✅ Image successfully repaired! You can now proceed with analysis.")
@@ -882,7 +952,7 @@ def main():
 
                             # Analyze repaired image
                             with st.spinner('🔍 Analyzing your plant with AI...'):
-                                health_status, confidence = analyze_image(repaired_image)
+                                health_status, confidence = get_dispatcher().analyze_image(repaired_image)
 
                                 # Render results
                                 st.markdown('<div class="analysis-results">', unsafe_allow_html=True)
@@ -926,7 +996,7 @@ def main():
             if diagnostic_image is not None:
                 # User selected a sample image, analyze it
                 with st.spinner('🔍 Analyzing sample plant with AI...'):
-                    health_status, confidence = analyze_image(diagnostic_image)
+                    health_status, confidence = get_dispatcher().analyze_image(diagnostic_image)
 
                     # Render results
                     st.markdown('<div class="analysis-results">', unsafe_allow_html=True)
@@ -935,3 +1005,4 @@ def main():
 
 if __name__ == "__main__":
     main()
+    logger.info("Script run rendered in %.2fs", time.perf_counter() - _SCRIPT_START)
@@ -0,0 +1,253 @@
+"""Alternative inference backends for the plant health model.
+
+Each backend wraps a non-Keras runtime behind a Keras-style
+``predict(x, batch_size=None, verbose=0)`` method so that ``analyze_image``,
+``analyze_images`` and the batching dispatcher can use it unchanged.
+"""
+import json
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Byte alignment of each tensor inside a flat weight file
+WEIGHT_ALIGNMENT = 64
+
+def save_flat_weights(model, architecture_path: str, weights_path: str, dtype=None):
+    """Save a Keras model as an architecture/manifest JSON plus one flat, memory-mappable weight file.
+
+    Args:
+        model: Keras model to export
+        architecture_path: Where to write the JSON with the architecture and tensor offsets
+        weights_path: Where to write the raw concatenated weight bytes
+        dtype: Optional storage dtype for floating-point weights (e.g. np.float16)
+    """
+    manifest = []
+    offset = 0
+    with open(weights_path, 'wb') as f:
+        for weight in model.get_weights():
+            if dtype is not None and np.issubdtype(weight.dtype, np.floating):
+                weight = weight.astype(dtype)
+            weight = np.ascontiguousarray(weight)
+            padding = (-offset) % WEIGHT_ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+            f.write(weight.tobytes())
+            manifest.append({'shape': list(weight.shape), 'dtype': weight.dtype.str, 'offset': offset})
+            offset += weight.nbytes
+
+    with open(architecture_path, 'w') as f:
+        json.dump({'architecture': json.loads(model.to_json()), 'weights': manifest}, f)
+
+def load_flat_weights(architecture_path: str, weights_path: str):
+    """Rebuild a Keras model from ``save_flat_weights`` output, reading weights through a memory map.
+
+    This is a faster load, not a memory saving: there is no HDF5 parsing and
+    no intermediate heap buffer, since each tensor is read as a view into the
+    mapped file. ``set_weights`` then copies every tensor into the model's
+    TensorFlow variables and the mapping is dropped, so the weights are not
+    backed by the file afterwards and resident memory is the same as after an
+    HDF5 load; each process that loads the model holds its own full copy.
+    """
+    import tensorflow as tf
+
+    with open(architecture_path, 'r') as f:
+        spec = json.load(f)
+
+    model = tf.keras.models.model_from_json(json.dumps(spec['architecture']))
+    mapped = np.memmap(weights_path, dtype=np.uint8, mode='r')
+    weights = []
+    for entry in spec['weights']:
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        weights.append(np.frombuffer(mapped, dtype=dtype, count=count, offset=entry['offset']).reshape(entry['shape']))
+    model.set_weights(weights)
+    return model
+
+class CompiledKerasModel:
+    """Serve a Keras model through pre-traced ``tf.function`` graphs instead of ``predict``.
+
+    ``model.predict`` builds a data adapter and callback machinery on every
+    call. This wrapper strips training-only layers, traces one function with a
+    fixed (1, height, width, 3) signature for single uploads and one with a
+    free batch dimension for batches, and warms both up at construction time.
+    """
+
+    def __init__(self, model, precision: str = 'float32'):
+        """
+        Args:
+            model: Keras model to serve
+            precision: Serving precision the model was built for, reported to the UI
+        """
+        import tensorflow as tf
+
+        self.model = _strip_training_layers(model)
+        self.precision = precision
+        input_shape = tuple(self.model.input_shape[1:])
+
+        self._single_fn = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec((1,) + input_shape, tf.float32)])
+        self._batch_fn = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec((None,) + input_shape, tf.float32)])
+        self._gradcam_fn = None
+        self._explain_lock = threading.Lock()
+        self.warm_up()
+
+    @property
+    def input_shape(self):
+        return self.model.input_shape
+
+    def explain(self, x: np.ndarray, threshold: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Score a batch and return Grad-CAM maps from the same forward+backward pass.
+
+        The Grad-CAM function is traced on first use, so models that never
+        explain a prediction do not pay for it.
+
+        Args:
+            x: Preprocessed input batch
+            threshold: Decision threshold; each map explains the class it picks (default 0.5)
+
+        Returns:
+            tuple: (predictions of shape (N, 1), maps of shape (N, h, w) in [0, 1])
+        """
+        from .gradcam import build_gradcam_function, explain_batch
+
+        with self._explain_lock:
+            if self._gradcam_fn is None:
+                self._gradcam_fn = build_gradcam_function(self.model)
+        return explain_batch(self._gradcam_fn, x, 0.5 if threshold is None else threshold)
+
+    def warm_up(self):
+        """Trace both inference functions so the first request does not pay for it."""
+        dummy = np.zeros((1,) + tuple(self.model.input_shape[1:]), dtype=np.float32)
+        self._single_fn(dummy)
+        self._batch_fn(np.concatenate([dummy, dummy]))
+
+    def predict(self, x: np.ndarray, batch_size: int = None, verbose: int = 0) -> np.ndarray:
+        """Score a float32 batch scaled to [0, 1] and return float32 probabilities.
+
+        Args:
+            x: Input batch of shape (N, height, width, 3)
+            batch_size: Maximum number of images per graph call; None runs the whole batch at once
+            verbose: Accepted for Keras compatibility and ignored
+
+        Returns:
+            np.ndarray: Sigmoid outputs of shape (N, 1)
+        """
+        x = np.asarray(x, dtype=np.float32)
+        if x.shape[0] == 1:
+            return self._single_fn(x).numpy()
+        if batch_size and x.shape[0] > batch_size:
+            return np.concatenate([self._batch_fn(x[start:start + batch_size]).numpy()
+                                   for start in range(0, x.shape[0], batch_size)])
+        return self._batch_fn(x).numpy()
+
+def _strip_training_layers(model):
+    """Rebuild a Sequential model without Dropout layers, sharing the trained weights."""
+    import tensorflow as tf
+
+    if not isinstance(model, tf.keras.Sequential):
+        return model
+    kept_layers = [layer for layer in model.layers if not isinstance(layer, tf.keras.layers.Dropout)]
+    if len(kept_layers) == len(model.layers):
+        return model
+    return tf.keras.Sequential([tf.keras.Input(shape=model.input_shape[1:])] + kept_layers)
+
+class TFLiteModel:
+    """Run a (optionally int8-quantized) ``.tflite`` model through the TFLite interpreter."""
+
+    def __init__(self, model_path: str, num_threads: int = None):
+        import tensorflow as tf
+
+        self.model_path = model_path
+        self._interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # The interpreter keeps per-instance tensor state and is not thread-safe
+        self._lock = threading.Lock()
+
+    @property
+    def input_shape(self):
+        """Input shape with a free batch dimension, mirroring ``tf.keras.Model.input_shape``."""
+        return (None,) + tuple(int(dim) for dim in self._input['shape'][1:])
+
+    def predict(self, x: np.ndarray, batch_size: int = None, verbose: int = 0) -> np.ndarray:
+        """Score a float32 batch scaled to [0, 1] and return float32 probabilities.
+
+        Args:
+            x: Input batch of shape (N, height, width, 3)
+            batch_size: Accepted for Keras compatibility; the whole batch runs in one invoke
+            verbose: Accepted for Keras compatibility and ignored
+
+        Returns:
+            np.ndarray: Sigmoid outputs of shape (N, 1)
+        """
+        x = np.asarray(x, dtype=np.float32)
+        with self._lock:
+            if x.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input['index'], list(x.shape))
+                self._interpreter.allocate_tensors()
+                self._input = self._interpreter.get_input_details()[0]
+                self._output = self._interpreter.get_output_details()[0]
+                self._batch_size = x.shape[0]
+
+            self._interpreter.set_tensor(self._input['index'], _quantize(x, self._input))
+            self._interpreter.invoke()
+            output = self._interpreter.get_tensor(self._output['index'])
+
+        return _dequantize(output, self._output)
+
+def _quantize(x: np.ndarray, details: dict) -> np.ndarray:
+    """Quantize a float array to the tensor's integer type using its scale and zero point."""
+    dtype = details['dtype']
+    if dtype == np.float32:
+        return x
+    scale, zero_point = details['quantization']
+    info = np.iinfo(dtype)
+    return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(dtype)
+
+def _dequantize(x: np.ndarray, details: dict) -> np.ndarray:
+    """Convert an integer tensor back to float32 using its scale and zero point."""
+    if details['dtype'] == np.float32:
+        return x
+    scale, zero_point = details['quantization']
+    return (x.astype(np.float32) - zero_point) * scale
+
+class OnnxModel:
+    """Run an ONNX export of the model through onnxruntime's CPU execution provider."""
+
+    def __init__(self, model_path: str, num_threads: int = None):
+        import onnxruntime as ort
+
+        self.model_path = model_path
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(model_path, sess_options=options,
+                                             providers=['CPUExecutionProvider'])
+        self._input = self._session.get_inputs()[0]
+        self._output_name = self._session.get_outputs()[0].name
+
+    @property
+    def input_shape(self):
+        """Input shape with a free batch dimension, mirroring ``tf.keras.Model.input_shape``."""
+        return (None,) + tuple(int(dim) for dim in self._input.shape[1:])
+
+    def predict(self, x: np.ndarray, batch_size: int = None, verbose: int = 0) -> np.ndarray:
+        """Score a float32 batch scaled to [0, 1] and return float32 probabilities.
+
+        Args:
+            x: Input batch of shape (N, height, width, 3)
+            batch_size: Accepted for Keras compatibility; the whole batch runs in one session call
+            verbose: Accepted for Keras compatibility and ignored
+
+        Returns:
+            np.ndarray: Sigmoid outputs of shape (N, 1)
+        """
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        return self._session.run([self._output_name], {self._input.name: x})[0]
@@ -0,0 +1,207 @@
+"""Cross-session micro-batching for the shared plant health model."""
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, BinaryIO, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import streamlit as st
+from PIL import Image
+
+from .model_utils import (MODEL_INPUT_SIZE, load_model, model_input_size, prepare_image_array,
+                          prediction_to_result, decision_threshold)
+from .worker_pool import get_shared_pool
+from .cascade import answer_confident, get_cascade_stage
+from .timing import span
+from .inference_gate import current_session_id, get_inference_gate, session_scope
+
+class MicroBatchDispatcher:
+    """Coalesce concurrent single-image requests into batched predictions.
+
+    Callers preprocess their own image and enqueue the resulting array. A
+    single worker thread drains the queue, waiting at most ``max_wait_ms``
+    for more requests once the first one arrives, and scores up to
+    ``max_batch_size`` images with one ``model.predict`` call. Each caller
+    receives its own result through a Future.
+
+    Requests are queued per session and a batch takes them round-robin, so a
+    session uploading many images cannot crowd the others out of a batch. The
+    forward pass runs inside ``session_scope`` of the session whose request
+    heads the batch, so the inference gate sees the callers rather than the
+    dispatcher thread.
+    """
+
+    def __init__(self, model_loader: Callable[[], Any] = load_model,
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.model_loader = model_loader
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._condition = threading.Condition()
+        self._pending: 'OrderedDict[str, Deque[Tuple[np.ndarray, Future]]]' = OrderedDict()
+        self._queued = 0
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._requests = 0
+        self._max_queue_depth = 0
+        self._stopped = threading.Event()
+
+        self._worker = threading.Thread(target=self._run, name="micro-batch-dispatcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, image_data: Union[str, Image.Image, BinaryIO]) -> Future:
+        """Preprocess an image and queue it for the next batch.
+
+        Args:
+            image_data: PIL Image object, file-like object, or path to image file
+
+        Returns:
+            Future: Resolves to a (health_status, confidence) tuple
+        """
+        future: Future = Future()
+        try:
+            img_array = prepare_image_array(image_data, self._input_size())
+        except Exception as e:
+            future.set_exception(e)
+            return future
+
+        if self._stopped.is_set():
+            future.set_exception(RuntimeError("Dispatcher has been shut down"))
+            return future
+
+        # Obvious images are answered by the cheap cascade stage and never queued for the CNN
+        answered = answer_confident(img_array[np.newaxis], decision_threshold(self.model_loader()))[0]
+        if answered is not None:
+            future.set_result(answered)
+            with self._stats_lock:
+                self._requests += 1
+            return future
+
+        with self._condition:
+            self._pending.setdefault(current_session_id(), deque()).append((img_array, future))
+            self._queued += 1
+            depth = self._queued
+            self._condition.notify()
+        with self._stats_lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def _input_size(self) -> Tuple[int, int]:
+        """Resolution the served model expects (family tiers differ from the default 224x224)."""
+        model = self.model_loader()
+        return model_input_size(model) if model is not None else MODEL_INPUT_SIZE
+
+    def analyze_image(self, image_data: Union[str, Image.Image, BinaryIO],
+                      timeout: Optional[float] = None) -> Tuple[Optional[bool], Optional[float]]:
+        """Drop-in replacement for ``model_utils.analyze_image`` that goes through the batch queue.
+
+        Args:
+            image_data: PIL Image object, file-like object, or path to image file
+            timeout: Seconds to wait for the result, or None to wait indefinitely
+
+        Returns:
+            tuple: (health_status: bool, confidence: float)
+        """
+        try:
+            return self.submit(image_data).result(timeout=timeout)
+        except Exception as e:
+            st.error(f"Error analyzing image: {str(e)}")
+            if not isinstance(image_data, (str, Image.Image)) and hasattr(image_data, 'seek'):
+                image_data.seek(0)
+            return None, None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue-depth, batch-size, cascade hit-rate and inference-gate statistics."""
+        stage = get_cascade_stage()
+        gate = get_inference_gate()
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            batched_images = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "queue_depth": self._queued,
+                "max_queue_depth": self._max_queue_depth,
+                "requests": self._requests,
+                "batches": batches,
+                "mean_batch_size": batched_images / batches if batches else 0.0,
+                "max_batch_size_seen": max(self._batch_sizes) if self._batch_sizes else 0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "cascade": stage.stats() if stage is not None else None,
+                "gate": gate.stats() if gate is not None else None,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker thread after it finishes the queued requests."""
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if wait:
+            self._worker.join()
+
+    def _collect_batch(self) -> List[Tuple[str, np.ndarray, Future]]:
+        """Block for the first request, then wait for more until the batch is full or the wait expires.
+
+        Returns (session_id, array, future) triples taken one per session in turn.
+        """
+        with self._condition:
+            while not self._queued:
+                if self._stopped.is_set():
+                    return []
+                self._condition.wait(0.1)
+
+            deadline = time.monotonic() + self.max_wait
+            while self._queued < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                session_id, requests = self._pending.popitem(last=False)
+                batch.append((session_id,) + requests.popleft())
+                if requests:
+                    self._pending[session_id] = requests
+            self._queued -= len(batch)
+            return batch
+
+    def _run(self):
+        """Worker loop: collect, predict, and route results back to callers."""
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                return
+
+            futures = [future for _, _, future in batch]
+            try:
+                model = self.model_loader()
+                if model is None:
+                    raise RuntimeError("Model is not available")
+
+                # Queue for the gate as the session at the head of the batch, not as this thread
+                with session_scope(batch[0][0]), span('inference'):
+                    predictions = model.predict(np.stack([array for _, array, _ in batch]), verbose=0)
+                threshold = decision_threshold(model)
+                for future, prediction in zip(futures, predictions):
+                    future.set_result(prediction_to_result(float(prediction[0]), threshold))
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+
+@st.cache_resource
+def get_dispatcher(max_batch_size: int = 16, max_wait_ms: float = 5.0) -> MicroBatchDispatcher:
+    """Return the process-wide dispatcher shared by every Streamlit session.
+
+    When PLANT_CARE_WORKERS is set, coalesced batches are scored by the
+    multi-process worker pool instead of the in-process model.
+    """
+    pool = get_shared_pool()
+    model_loader = (lambda: pool) if pool is not None else load_model
+    return MicroBatchDispatcher(model_loader=model_loader, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
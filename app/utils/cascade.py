@@ -0,0 +1,263 @@
+"""Cheap-first inference cascade in front of the CNN.
+
+Stage 1 is a logistic regression on a small color histogram (hue weighted by
+saturation, saturation, brightness and mean color) computed with a handful of
+vectorized numpy operations on a subsampled image. Images it scores outside
+the uncertainty band ``[low, high]`` are answered directly; only the rest are
+escalated to the CNN. ``train_model.py --train-cascade`` fits the stage and
+tunes the band so the cascade loses at most a target amount of accuracy
+against the CNN alone on held-out images.
+
+Every whole-image analysis of the main model (single images, batches, the
+micro-batch dispatcher, Grad-CAM and ``score_directory.py``) asks
+``answer_confident`` first, so an image gets the same verdict whichever of
+them scores it. Test-time augmentation and tiling never use it: they are
+the opt-in modes for borderline photos and small lesions, which a
+whole-image color summary is worst at. Tier models run without the
+cascade, because the stage is tuned against the main model only.
+"""
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .model_utils import MODEL_DIR, get_model_path, prediction_to_result
+from .timing import span
+
+logger = logging.getLogger(__name__)
+
+CASCADE_PATH = os.path.join(MODEL_DIR, 'cascade_stage.json')
+
+# Set PLANT_CARE_CASCADE=0 to always run the CNN even when a trained stage exists
+CASCADE_ENABLED = os.environ.get('PLANT_CARE_CASCADE', '1') != '0'
+
+HUE_BINS = 12
+LEVEL_BINS = 4
+# Only every SUBSAMPLE-th pixel in each direction is used for the histogram
+SUBSAMPLE = 4
+
+def color_features(batch: np.ndarray) -> np.ndarray:
+    """Compute color-histogram features for a batch of images.
+
+    Args:
+        batch: float32 array of shape (N, H, W, 3) with RGB values in [0, 1]
+
+    Returns:
+        np.ndarray: float32 array of shape (N, HUE_BINS + 2 * LEVEL_BINS + 3)
+    """
+    pixels = np.asarray(batch, dtype=np.float32)[:, ::SUBSAMPLE, ::SUBSAMPLE].reshape(len(batch), -1, 3)
+    count = pixels.shape[1]
+    red, green, blue = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+
+    # RGB -> HSV without a per-image loop
+    value = pixels.max(axis=2)
+    chroma = value - pixels.min(axis=2)
+    saturation = np.where(value > 0, chroma / np.maximum(value, 1e-6), 0.0)
+    safe_chroma = np.maximum(chroma, 1e-6)
+    hue = np.where(value == red, ((green - blue) / safe_chroma) % 6,
+                   np.where(value == green, (blue - red) / safe_chroma + 2, (red - green) / safe_chroma + 4)) / 6.0
+
+    def histogram(values, bins, weights=None):
+        # Offset each image's bin indices so one bincount builds all histograms at once
+        indices = np.minimum((values * bins).astype(np.int64), bins - 1)
+        indices += np.arange(len(values))[:, None] * bins
+        counts = np.bincount(indices.ravel(), weights=None if weights is None else weights.ravel(),
+                             minlength=len(values) * bins)
+        return counts.reshape(len(values), bins) / count
+
+    return np.concatenate([
+        histogram(hue, HUE_BINS, weights=saturation),
+        histogram(saturation, LEVEL_BINS),
+        histogram(value, LEVEL_BINS),
+        pixels.mean(axis=1),
+    ], axis=1).astype(np.float32)
+
+class CascadeStage:
+    """Stage-1 linear classifier with an uncertainty band and hit-rate counters."""
+
+    def __init__(self, weights: np.ndarray, bias: float, feature_mean: np.ndarray, feature_std: np.ndarray,
+                 low: float, high: float, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            weights: Logistic regression coefficients over standardized features
+            bias: Logistic regression intercept
+            feature_mean: Per-feature mean used for standardization
+            feature_std: Per-feature standard deviation used for standardization
+            low: Probabilities below this are answered as unhealthy
+            high: Probabilities above this are answered as healthy
+            metadata: Training and tuning details saved with the stage
+        """
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.feature_mean = np.asarray(feature_mean, dtype=np.float32)
+        self.feature_std = np.maximum(np.asarray(feature_std, dtype=np.float32), 1e-6)
+        self.low = float(low)
+        self.high = float(high)
+        self.metadata = metadata or {}
+
+        self._lock = threading.Lock()
+        self._answered = 0
+        self._escalated = 0
+
+    def predict_proba(self, batch: np.ndarray) -> np.ndarray:
+        """Return the stage-1 healthy probability for each image in the batch."""
+        features = (color_features(batch) - self.feature_mean) / self.feature_std
+        return 1.0 / (1.0 + np.exp(-(features @ self.weights + self.bias)))
+
+    def decide(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Score a batch and mark which images stage 1 can answer on its own.
+
+        Returns:
+            tuple: (probabilities, confident) where ``confident`` is a boolean
+            mask of images outside the uncertainty band
+        """
+        probabilities = self.predict_proba(batch)
+        confident = (probabilities < self.low) | (probabilities > self.high)
+        with self._lock:
+            answered = int(np.count_nonzero(confident))
+            self._answered += answered
+            self._escalated += len(probabilities) - answered
+        return probabilities, confident
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-stage hit counts and rates since the stage was loaded."""
+        with self._lock:
+            total = self._answered + self._escalated
+            return {
+                'images': total,
+                'stage1_answered': self._answered,
+                'escalated_to_cnn': self._escalated,
+                'stage1_hit_rate': self._answered / total if total else 0.0,
+                'band': [self.low, self.high],
+                'validation': self.metadata.get('validation', {}),
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'weights': self.weights.tolist(),
+            'bias': self.bias,
+            'feature_mean': self.feature_mean.tolist(),
+            'feature_std': self.feature_std.tolist(),
+            'low': self.low,
+            'high': self.high,
+            **self.metadata,
+        }
+
+    def save(self, path: str = CASCADE_PATH):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str = CASCADE_PATH) -> 'CascadeStage':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        metadata = {key: value for key, value in data.items()
+                    if key not in ('weights', 'bias', 'feature_mean', 'feature_std', 'low', 'high')}
+        return cls(data['weights'], data['bias'], data['feature_mean'], data['feature_std'],
+                   data['low'], data['high'], metadata)
+
+def tune_band(stage_probabilities: np.ndarray, cnn_probabilities: np.ndarray, labels: np.ndarray,
+              max_accuracy_loss: float = 0.01, threshold: float = 0.5) -> Dict[str, float]:
+    """Pick the widest-coverage uncertainty band that keeps accuracy within budget.
+
+    Every candidate band is evaluated at once: images outside the band take
+    the stage-1 label, the rest the CNN label, and the band answering the
+    most images with ``cnn_accuracy - cascade_accuracy <= max_accuracy_loss``
+    wins.
+
+    Args:
+        stage_probabilities: Stage-1 probabilities on held-out images
+        cnn_probabilities: CNN probabilities on the same images
+        labels: True labels (1 = healthy)
+        max_accuracy_loss: Allowed accuracy drop versus the CNN alone
+        threshold: Decision threshold of the CNN, also applied to stage-1 answers
+
+    Returns:
+        dict: low, high, stage-1 hit rate, CNN accuracy and cascade accuracy
+    """
+    labels = np.asarray(labels).astype(bool)
+    stage_correct = (stage_probabilities > threshold) == labels
+    cnn_correct = (cnn_probabilities > threshold) == labels
+    cnn_accuracy = float(np.mean(cnn_correct))
+
+    # Candidate cut points: percentiles of the observed probabilities plus the "answer nothing" extremes
+    percentiles = np.quantile(stage_probabilities, np.linspace(0.0, 1.0, 101))
+    candidates = np.unique(np.concatenate([[0.0, threshold, 1.0], percentiles]))
+    lows = candidates[candidates <= threshold][:, None, None]
+    highs = candidates[candidates >= threshold][None, :, None]
+    confident = (stage_probabilities < lows) | (stage_probabilities > highs)
+    cascade_accuracy = np.where(confident, stage_correct, cnn_correct).mean(axis=2)
+    coverage = confident.mean(axis=2)
+
+    # Among bands within the accuracy budget, prefer coverage, then accuracy
+    score = np.where(cnn_accuracy - cascade_accuracy <= max_accuracy_loss + 1e-9,
+                     coverage + 1e-3 * cascade_accuracy, -1.0)
+    low_index, high_index = np.unravel_index(np.argmax(score), score.shape)
+    return {
+        'low': float(lows[low_index, 0, 0]),
+        'high': float(highs[0, high_index, 0]),
+        'stage1_hit_rate': float(coverage[low_index, high_index]),
+        'cnn_accuracy': cnn_accuracy,
+        'cascade_accuracy': float(cascade_accuracy[low_index, high_index]),
+    }
+
+_stage: Optional[CascadeStage] = None
+_stage_key = None
+_stage_lock = threading.Lock()
+
+def get_cascade_stage() -> Optional[CascadeStage]:
+    """Return the trained stage for the current model, or None if the cascade is off.
+
+    The stage is reloaded when its file changes and ignored when it was tuned
+    against a different model file than the one being served, including when
+    PLANT_CARE_TIER serves a member of the model family.
+    """
+    global _stage, _stage_key
+    from .model_family import DEFAULT_TIER
+    if not CASCADE_ENABLED or DEFAULT_TIER:
+        return None
+    try:
+        stage_mtime = os.path.getmtime(CASCADE_PATH)
+        model_path = get_model_path('keras')
+        model_stat = os.stat(model_path)
+    except OSError:
+        return None
+
+    key = (stage_mtime, model_path, model_stat.st_mtime_ns, model_stat.st_size)
+    with _stage_lock:
+        if key == _stage_key:
+            return _stage
+        from .precision import file_fingerprint
+        try:
+            stage = CascadeStage.load(CASCADE_PATH)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not load cascade stage: %s", str(e))
+            stage = None
+        if stage is not None and stage.metadata.get('model_fingerprint') != file_fingerprint(model_path):
+            logger.warning("Cascade stage was tuned for a different model; run train_model.py --train-cascade")
+            stage = None
+        _stage, _stage_key = stage, key
+        return stage
+
+def answer_confident(batch: np.ndarray, threshold: float = 0.5) -> List[Optional[Tuple[bool, float]]]:
+    """Answer the images of a batch that stage 1 is confident about.
+
+    Args:
+        batch: float32 array of shape (N, H, W, 3) with RGB values in [0, 1]
+        threshold: Decision threshold of the main model (``decision_threshold(model)``)
+
+    Returns:
+        list: One (health_status, confidence) per image stage 1 answered, and
+        None for each image that must be escalated to the CNN. All None when
+        the cascade is off or untrained.
+    """
+    stage = get_cascade_stage()
+    if stage is None:
+        return [None] * len(batch)
+    with span('cascade'):
+        probabilities, confident = stage.decide(batch)
+    return [prediction_to_result(float(probability), threshold) if is_confident else None
+            for probability, is_confident in zip(probabilities, confident)]
@@ -0,0 +1,372 @@
+"""Single-pass, in-memory image decoding.
+
+Every upload path (the Streamlit app, ``load_image_multiple_methods`` and the
+diagnostics tool) decodes through ``decode_image``. The format is sniffed once
+from the magic bytes, then the bytes are decoded straight from memory: PIL
+first, restricted to the sniffed format, and ``cv2.imdecode`` on a numpy view
+of the same buffer for files PIL rejects. Nothing is written to disk. The
+result is always RGB, together with a record of which decoder succeeded and
+why the others failed.
+
+Files both decoders reject can still be recovered with ``salvage_image``,
+which repairs a damaged signature, skips junk in front of the image and
+accepts truncated pixel data. Nothing calls it implicitly: it is the
+explicit repair step the diagnostics tool offers.
+
+Large JPEGs can be decoded at reduced scale: given ``min_size``, the decoder
+asks libjpeg for the smallest 1/2, 1/4 or 1/8 DCT-domain downscale that is
+still at least ``min_size`` in both dimensions (PIL ``draft`` or OpenCV's
+``IMREAD_REDUCED_COLOR_*`` flags). A 12 MP photo decoded for a 224x224 model
+then costs a fraction of the time and memory of a full decode.
+"""
+import io
+import logging
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageFile
+
+from .timing import span
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the formats we expect, mapped to PIL format names
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+)
+
+# Decoders in the order they are tried
+DECODERS = ('PIL', 'OpenCV')
+
+# DCT-domain downscale factors libjpeg supports, largest first
+JPEG_REDUCTIONS = (8, 4, 2)
+
+# Signatures long enough to search for inside a file without false matches
+EMBEDDED_SIGNATURES = tuple((signature, format_name) for signature, format_name in SIGNATURES
+                            if len(signature) >= 3)
+
+# Pillow only reads truncated files through a process-wide flag, so salvage decodes take turns setting it
+_truncated_lock = threading.Lock()
+
+class ImageDecodeError(ValueError):
+    """Raised when no decoder can read the image.
+
+    Attributes:
+        attempts: Decoder name -> error message, in the order they were tried
+    """
+
+    def __init__(self, message: str, attempts: Dict[str, str]):
+        super().__init__(message)
+        self.attempts = attempts
+
+class DecodedImage:
+    """An RGB image decoded from memory, plus how it was decoded.
+
+    The PIL image and the uint8 array views are built lazily from whichever
+    one the decoder produced, so callers only pay for the form they use.
+
+    Attributes:
+        format: Format sniffed from the magic bytes (e.g. 'JPEG'), or None
+        decoder: Name of the decoder that succeeded ('PIL' or 'OpenCV')
+        source_mode: PIL mode before conversion to RGB
+        attempts: Decoder name -> None on success, else its error message
+        reduction: Factor the image was downscaled by while decoding (1 for a full decode)
+        source_size: (width, height) of the encoded image at full resolution
+    """
+
+    def __init__(self, format_name: Optional[str], decoder: str, source_mode: str,
+                 attempts: Dict[str, Optional[str]], image: Optional[Image.Image] = None,
+                 array: Optional[np.ndarray] = None, reduction: int = 1,
+                 source_size: Optional[Tuple[int, int]] = None):
+        self.format = format_name
+        self.decoder = decoder
+        self.source_mode = source_mode
+        self.attempts = attempts
+        self.reduction = reduction
+        self._image = image
+        self._array = array
+        self.source_size = tuple(source_size) if source_size else self.size
+
+    @property
+    def image(self) -> Image.Image:
+        """The decoded image as an RGB PIL image."""
+        if self._image is None:
+            self._image = Image.fromarray(self._array)
+        return self._image
+
+    @property
+    def array(self) -> np.ndarray:
+        """The decoded image as a (height, width, 3) uint8 RGB array."""
+        if self._array is None:
+            self._array = np.asarray(self._image)
+        return self._array
+
+    @property
+    def size(self):
+        """(width, height) in pixels."""
+        if self._image is not None:
+            return self._image.size
+        return self._array.shape[1], self._array.shape[0]
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """Identify an image format from its leading bytes.
+
+    Returns:
+        Optional[str]: PIL format name, or None if the signature is not recognised
+    """
+    for signature, format_name in SIGNATURES:
+        if data.startswith(signature):
+            return format_name
+    # WEBP is a RIFF container whose form type follows the chunk size
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+def read_image_bytes(image_data: Union[str, bytes, BinaryIO]) -> bytes:
+    """Return the encoded bytes of a file path, bytes object or file-like object.
+
+    File-like objects are rewound before and after reading so other callers
+    can read them again.
+
+    Raises:
+        TypeError: If ``image_data`` is none of the supported types
+    """
+    if isinstance(image_data, (bytes, bytearray, memoryview)):
+        return bytes(image_data)
+    if isinstance(image_data, str):
+        with open(image_data, 'rb') as f:
+            return f.read()
+    if hasattr(image_data, 'getvalue'):
+        # BytesIO and Streamlit uploads hold the whole buffer already
+        return image_data.getvalue()
+    if hasattr(image_data, 'read'):
+        if hasattr(image_data, 'seek'):
+            image_data.seek(0)
+        data = image_data.read()
+        if hasattr(image_data, 'seek'):
+            image_data.seek(0)
+        return data
+    raise TypeError(f"Cannot read image data from {type(image_data).__name__}")
+
+def jpeg_reduction(size: Tuple[int, int], min_size: Optional[Tuple[int, int]]) -> int:
+    """Return the largest JPEG downscale factor that keeps ``size`` at least ``min_size``.
+
+    Args:
+        size: (width, height) of the full-resolution image
+        min_size: (width, height) the decoded image must cover, or None for a full decode
+
+    Returns:
+        int: 8, 4, 2 or 1
+    """
+    if not min_size:
+        return 1
+    for factor in JPEG_REDUCTIONS:
+        if size[0] // factor >= min_size[0] and size[1] // factor >= min_size[1]:
+            return factor
+    return 1
+
+def _decode_pil(data: bytes, format_name: Optional[str],
+                min_size: Optional[Tuple[int, int]]) -> Tuple[Image.Image, str, Tuple[int, int]]:
+    image = Image.open(io.BytesIO(data), formats=[format_name] if format_name else None)
+    source_mode = image.mode
+    source_size = image.size
+    if min_size and image.format == 'JPEG':
+        # Let libjpeg scale down while decoding; the result still covers min_size
+        image.draft('RGB', tuple(min_size))
+    image.load()  # Force a full decode so truncated or corrupt data fails here
+    return image, source_mode, source_size
+
+def _decode_cv2(data: bytes, format_name: Optional[str],
+                min_size: Optional[Tuple[int, int]]) -> Tuple[np.ndarray, int, Optional[Tuple[int, int]]]:
+    import cv2
+
+    flags, reduction, source_size = cv2.IMREAD_COLOR, 1, None
+    if min_size and format_name == 'JPEG':
+        try:
+            # Reading the header is cheap even when PIL cannot decode the pixels
+            source_size = Image.open(io.BytesIO(data)).size
+            reduction = jpeg_reduction(source_size, min_size)
+        except Exception:
+            reduction = 1
+        flags = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[reduction]
+
+    array = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if array is None or array.size == 0:
+        raise ValueError("cv2.imdecode could not read the data")
+    if reduction == 1:
+        source_size = (array.shape[1], array.shape[0])
+    return cv2.cvtColor(array, cv2.COLOR_BGR2RGB), reduction, source_size
+
+def _from_pil_image(image: Image.Image) -> DecodedImage:
+    """Wrap an already decoded PIL image without copying it when it is RGB."""
+    image.load()
+    source_mode = image.mode
+    if image.width == 0 or image.height == 0:
+        raise ImageDecodeError("Image has invalid dimensions", {'PIL': "Image has invalid dimensions"})
+    rgb = image if source_mode == 'RGB' else image.convert('RGB')
+    return DecodedImage(image.format, 'PIL', source_mode, {'PIL': None}, image=rgb)
+
+def decode_image(image_data: Union[str, bytes, BinaryIO, Image.Image],
+                 min_size: Optional[Tuple[int, int]] = None) -> DecodedImage:
+    """Decode an image from memory into RGB.
+
+    Args:
+        image_data: Encoded bytes, file-like object, path to an image file,
+            or an already decoded PIL Image
+        min_size: (width, height) the caller will resize to. JPEGs are then
+            decoded at the smallest DCT-domain scale still covering it; None
+            always decodes at full resolution. Already decoded PIL Images are
+            returned at their own size.
+
+    Returns:
+        DecodedImage: The RGB image and a record of the decoder that succeeded
+
+    Raises:
+        ImageDecodeError: If the data is empty or no decoder can read it
+    """
+    if isinstance(image_data, Image.Image):
+        return _from_pil_image(image_data)
+
+    # The single place decode latency is recorded: only real decodes add a sample
+    with span('decode'):
+        data = read_image_bytes(image_data)
+        if not data:
+            raise ImageDecodeError("Image data is empty", {})
+        return _decode_bytes(data, min_size)
+
+def _decode_bytes(data: bytes, min_size: Optional[Tuple[int, int]]) -> DecodedImage:
+    format_name = sniff_format(data)
+
+    attempts: Dict[str, Optional[str]] = OrderedDict()
+    try:
+        image, source_mode, source_size = _decode_pil(data, format_name, min_size)
+        if image.width == 0 or image.height == 0:
+            raise ValueError("Image has invalid dimensions")
+        attempts['PIL'] = None
+        rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        reduction = max(1, round(source_size[0] / image.width))
+        return DecodedImage(format_name or image.format, 'PIL', source_mode, attempts, image=rgb,
+                            reduction=reduction, source_size=source_size)
+    except Exception as e:
+        attempts['PIL'] = str(e)
+
+    try:
+        array, reduction, source_size = _decode_cv2(data, format_name, min_size)
+        attempts['OpenCV'] = None
+        logger.info("PIL could not decode the image (%s); decoded with OpenCV", attempts['PIL'])
+        return DecodedImage(format_name, 'OpenCV', 'RGB', attempts, array=array, reduction=reduction,
+                            source_size=source_size)
+    except Exception as e:
+        attempts['OpenCV'] = str(e)
+
+    details = "; ".join(f"{name}: {error}" for name, error in attempts.items())
+    raise ImageDecodeError(f"Could not decode the image ({details})", attempts)
+
+def _restore_signature(data: bytes) -> Optional[bytes]:
+    """Rewrite a damaged PNG or JPEG signature when the structure behind it is intact."""
+    if data[12:16] == b'IHDR' and not data.startswith(b'\x89PNG\r\n\x1a\n'):
+        # Signature plus the IHDR chunk length, which is always 13
+        return b'\x89PNG\r\n\x1a\n\x00\x00\x00\r' + data[12:]
+    if data[6:11] in (b'JFIF\x00', b'Exif\x00') and not data.startswith(b'\xff\xd8\xff'):
+        marker = b'\xe0' if data[6:10] == b'JFIF' else b'\xe1'
+        return b'\xff\xd8\xff' + marker + data[4:]
+    return None
+
+def _embedded_offset(data: bytes) -> Optional[int]:
+    """Return where the first recognised image signature starts after leading junk, if anywhere."""
+    offsets = [data.find(signature, 1) for signature, _ in EMBEDDED_SIGNATURES]
+    offsets = [offset for offset in offsets if offset > 0]
+    return min(offsets) if offsets else None
+
+def _decode_pil_truncated(data: bytes) -> Image.Image:
+    with _truncated_lock:
+        previous = ImageFile.LOAD_TRUNCATED_IMAGES
+        ImageFile.LOAD_TRUNCATED_IMAGES = True
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        finally:
+            ImageFile.LOAD_TRUNCATED_IMAGES = previous
+    if image.width == 0 or image.height == 0:
+        raise ValueError("Image has invalid dimensions")
+    return image
+
+def _decode_cv2_unchanged(data: bytes) -> np.ndarray:
+    import cv2
+
+    array = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if array is None or array.size == 0:
+        raise ValueError("cv2.imdecode could not read the data")
+    if array.dtype != np.uint8:
+        # 16-bit and float images: scale into 8 bits
+        array = cv2.normalize(array, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    if array.ndim == 2:
+        return cv2.cvtColor(array, cv2.COLOR_GRAY2RGB)
+    if array.shape[2] == 4:
+        return cv2.cvtColor(array, cv2.COLOR_BGRA2RGB)
+    return cv2.cvtColor(array, cv2.COLOR_BGR2RGB)
+
+def salvage_image(image_data: Union[str, bytes, BinaryIO]) -> DecodedImage:
+    """Recover an image that ``decode_image`` rejects, working from the raw bytes.
+
+    Each repair is tried in turn and the first one that decodes wins:
+
+    * ``signature``: rewrite a damaged PNG or JPEG signature and decode normally
+    * ``embedded``: skip junk in front of the first recognised signature
+    * ``PIL-truncated``: let PIL fill the rows missing from a truncated file
+    * ``OpenCV-unchanged``: ``cv2.imdecode`` with ``IMREAD_UNCHANGED``, then
+      convert grayscale, alpha and 16-bit data to 8-bit RGB
+
+    Args:
+        image_data: Encoded bytes, file-like object or path to an image file
+
+    Returns:
+        DecodedImage: The recovered RGB image; ``decoder`` names the repair that worked
+
+    Raises:
+        ImageDecodeError: If no repair produces an image
+    """
+    data = read_image_bytes(image_data)
+    if not data:
+        raise ImageDecodeError("Image data is empty", {})
+
+    attempts: Dict[str, Optional[str]] = OrderedDict()
+    offset = _embedded_offset(data)
+    for name, repaired in (('signature', _restore_signature(data)),
+                           ('embedded', data[offset:] if offset else None)):
+        if repaired is None:
+            continue
+        try:
+            decoded = _decode_bytes(repaired, None)
+            attempts[name] = None
+            decoded.decoder, decoded.attempts = name, attempts
+            return decoded
+        except ImageDecodeError as e:
+            attempts[name] = str(e)
+
+    try:
+        image = _decode_pil_truncated(data)
+        attempts['PIL-truncated'] = None
+        rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        return DecodedImage(sniff_format(data) or image.format, 'PIL-truncated', image.mode, attempts, image=rgb)
+    except Exception as e:
+        attempts['PIL-truncated'] = str(e)
+
+    try:
+        array = _decode_cv2_unchanged(data)
+        attempts['OpenCV-unchanged'] = None
+        return DecodedImage(sniff_format(data), 'OpenCV-unchanged', 'RGB', attempts, array=array)
+    except Exception as e:
+        attempts['OpenCV-unchanged'] = str(e)
+
+    details = "; ".join(f"{name}: {error}" for name, error in attempts.items())
+    raise ImageDecodeError(f"Could not repair the image ({details})", attempts)
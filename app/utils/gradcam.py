@@ -0,0 +1,78 @@
+"""Grad-CAM explanations produced by the same pass that makes the prediction.
+
+A single traced function runs the forward pass up to the last Conv2D layer
+and through the classifier head under a ``GradientTape``, then back-propagates
+the score of the predicted class to that layer. It returns the prediction and
+the class activation map together, so explaining a result never needs a
+second inference call.
+"""
+from typing import Tuple
+
+import numpy as np
+
+def find_last_conv_layer(model):
+    """Return the last Conv2D or SeparableConv2D layer of a Keras model.
+
+    Raises:
+        ValueError: If the model has no convolution layer
+    """
+    import tensorflow as tf
+
+    for layer in reversed(model.layers):
+        if isinstance(layer, (tf.keras.layers.Conv2D, tf.keras.layers.SeparableConv2D)):
+            return layer
+    raise ValueError("Model has no Conv2D layer to explain")
+
+def build_gradcam_function(model):
+    """Trace a function mapping an input batch to (predictions, Grad-CAM maps).
+
+    Args:
+        model: Keras model with a single sigmoid output, such as ``create_model``'s
+
+    Returns:
+        Callable: ``fn(x, threshold) -> (predictions (N, 1), maps (N, h, w))``
+        where the maps are scaled to [0, 1] at the last Conv2D layer's
+        resolution. ``threshold`` is the model's decision threshold, passed as
+        a tensor so a registry swap to a new threshold does not retrace.
+    """
+    import tensorflow as tf
+
+    conv_layer = find_last_conv_layer(model)
+    conv_index = model.layers.index(conv_layer)
+    input_shape = tuple(model.input_shape[1:])
+
+    @tf.function(input_signature=[tf.TensorSpec((None,) + input_shape, tf.float32),
+                                  tf.TensorSpec((), tf.float32)])
+    def gradcam(x, threshold):
+        with tf.GradientTape() as tape:
+            # Run the layers by hand so the last conv activations can be watched mid-pass
+            activations = x
+            for layer in model.layers[:conv_index + 1]:
+                activations = layer(activations, training=False)
+            tape.watch(activations)
+            predictions = activations
+            for layer in model.layers[conv_index + 1:]:
+                predictions = layer(predictions, training=False)
+            # Explain whichever class the verdict picked: healthy probability or its complement
+            healthy = tf.cast(predictions[:, 0], tf.float32)
+            score = tf.where(healthy > threshold, healthy, 1.0 - healthy)
+        gradients = tf.cast(tape.gradient(score, activations), tf.float32)
+        activations = tf.cast(activations, tf.float32)
+
+        channel_weights = tf.reduce_mean(gradients, axis=(1, 2), keepdims=True)
+        maps = tf.nn.relu(tf.reduce_sum(channel_weights * activations, axis=-1))
+        maps /= tf.reduce_max(maps, axis=(1, 2), keepdims=True) + 1e-8
+        return tf.cast(predictions, tf.float32), maps
+
+    return gradcam
+
+def explain_batch(gradcam_fn, x: np.ndarray, threshold: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+    """Run a traced Grad-CAM function and return numpy (predictions, maps).
+
+    Args:
+        gradcam_fn: Function returned by ``build_gradcam_function``
+        x: Preprocessed input batch
+        threshold: Decision threshold that picks the class each map explains
+    """
+    predictions, maps = gradcam_fn(np.asarray(x, dtype=np.float32), np.float32(threshold))
+    return predictions.numpy(), maps.numpy()
@@ -3,7 +3,6 @@
 import os
 import io
 import sys
-import tempfile
 from typing import Union, Dict, Any, Optional, BinaryIO, List
 import base64
 import imghdr
@@ -13,15 +12,21 @@ import numpy as np
 import streamlit as st
 from PIL import Image, ImageFile, UnidentifiedImageError, ExifTags
 
+from .decoding import decode_image, salvage_image, sniff_format, ImageDecodeError
+from .upload import Upload
+
 # Allow loading truncated images
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
-def diagnose_image(image_data: Union[str, bytes, BinaryIO, Image.Image]) -> Dict[str, Any]:
+# The diagnostics preview is shown 300 px wide, so large JPEGs are decoded at reduced scale
+DIAGNOSTIC_PREVIEW_SIZE = (300, 300)
+
+def diagnose_image(image_data: Union[str, bytes, BinaryIO, Image.Image, Upload]) -> Dict[str, Any]:
     """
     Perform comprehensive diagnostics on an image file to identify potential issues.
 
     Args:
-        image_data: Can be a file path, bytes object, file-like object, or PIL Image
+        image_data: Can be a file path, bytes object, file-like object, PIL Image, or Upload
 
     Returns:
         Dict containing diagnostic information and potential issues
@@ -37,6 +42,7 @@ def diagnose_image(image_data: Union[str, bytes, BinaryIO, Image.Image]) -> Dict
         "suggestions": [],
         "valid": False,
         "diagnostics_passed": {},
+        "decoder": None,
         "loaded_image": None
     }
 
@@ -68,15 +74,26 @@ def diagnose_image(image_data: Union[str, bytes, BinaryIO, Image.Image]) -> Dict
         else:
             results["headers"] = "Valid"
 
-        # Try multiple loading methods
-        image, method_results = _try_multiple_loading_methods(image_data)
+        # Decode once from memory (or reuse the upload's decode), recording which decoders succeeded
+        try:
+            if isinstance(image_data, Upload):
+                decoded = image_data.decoded(DIAGNOSTIC_PREVIEW_SIZE)
+            else:
+                decoded = decode_image(image_data if isinstance(image_data, Image.Image) else image_bytes,
+                                       DIAGNOSTIC_PREVIEW_SIZE)
+            method_results = {name: error is None for name, error in decoded.attempts.items()}
+        except ImageDecodeError as e:
+            decoded = None
+            method_results = {name: False for name in e.attempts}
         results["diagnostics_passed"] = method_results
 
-        if image is not None:
+        if decoded is not None:
+            image = decoded.image
             results["valid"] = True
             results["loaded_image"] = image
-            results["dimensions"] = (image.width, image.height)
-            results["mode"] = image.mode
+            results["decoder"] = decoded.decoder
+            results["dimensions"] = decoded.source_size
+            results["mode"] = decoded.source_mode
 
             # Check for problematic dimensions
             if image.width <= 0 or image.height <= 0:
@@ -85,8 +102,8 @@ def diagnose_image(image_data: Union[str, bytes, BinaryIO, Image.Image]) -> Dict
                 results["suggestions"].append("Image has invalid dimensions, please check the file")
 
             # Check for unusual image modes
-            if image.mode not in ['RGB', 'RGBA', 'L', 'P']:
-                results["issues"].append(f"Unusual image mode: {image.mode}")
+            if decoded.source_mode not in ['RGB', 'RGBA', 'L', 'P']:
+                results["issues"].append(f"Unusual image mode: {decoded.source_mode}")
                 results["suggestions"].append("Try converting to a standard RGB mode")
 
             # Check for exif orientation
@@ -226,6 +243,8 @@ def run_image_diagnostic_test(uploaded_file=None):
 
                     # Show loading method results
                     st.markdown("### Loading Method Results")
+                    if results["decoder"]:
+                        st.markdown(f"**Decoded with:** {results['decoder']}")
                     for method, passed in results["diagnostics_passed"].items():
                         st.markdown(f"- {method}: {'✅ Passed' if passed else '❌ Failed'}")
 
@@ -263,10 +282,15 @@ def run_image_diagnostic_test(uploaded_file=None):
 
     return None
 
-def repair_image(image_data: Union[str, bytes, BinaryIO, Image.Image]) -> Optional[Image.Image]:
+def repair_image(image_data: Union[str, bytes, BinaryIO, Image.Image, Upload]) -> Optional[Image.Image]:
     """
     Attempt to repair a problematic image by reprocessing it.
 
+    The image is decoded normally first. If that fails, ``salvage_image``
+    works on the raw bytes instead: it restores a damaged signature, skips
+    junk in front of the image and accepts truncated pixel data. For an
+    Upload this bypasses its cached decode failure.
+
     Args:
         image_data: Image data to repair
 
@@ -274,95 +298,20 @@ def repair_image(image_data: Union[str, bytes, BinaryIO, Image.Image]) -> Option
         Repaired PIL Image or None if repair failed
     """
     try:
-        image_bytes, _ = _prepare_image_for_diagnosis(image_data)
-        if not image_bytes:
-            return None
-
-        # Method 1: Reprocess through BytesIO
-        try:
-            img = Image.open(io.BytesIO(image_bytes))
-            img.load()  # Force load
-
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-
-            # Resize slightly to trigger reprocessing
-            img = img.resize((img.width, img.height))
-
-            # Test validity
-            test_array = np.array(img)
-            if test_array.size == 0:
-                raise ValueError("Empty image array")
-
-            return img
-        except Exception:
-            pass
-
-        # Method 2: Try reencoding as PNG
+        if isinstance(image_data, np.ndarray):
+            return Image.fromarray(image_data)
+        if isinstance(image_data, Image.Image):
+            return decode_image(image_data).image
         try:
-            # Write to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                tmp_file.write(image_bytes)
-                tmp_file.flush()
-
-                img = Image.open(tmp_file.name)
-                img.load()
-
-                # Save to new BytesIO with explicit format
-                output = io.BytesIO()
-                img.save(output, format='PNG')
-                output.seek(0)
-
-                # Reload from the newly saved bytes
-                repaired = Image.open(output)
-                repaired.load()
-
-                # Clean up temp file
-                os.unlink(tmp_file.name)
-
-                return repaired
-        except Exception:
-            # Clean up temp file in case of exception
-            if 'tmp_file' in locals():
-                try:
-                    os.unlink(tmp_file.name)
-                except:
-                    pass
-
-        # Method 3: Try via numpy array if possible
-        try:
-            import cv2
-            # Try to get numpy array
-            if isinstance(image_data, np.ndarray):
-                array = image_data
-            elif isinstance(image_data, Image.Image):
-                array = np.array(image_data)
-            else:
-                # Save to temp file and use OpenCV
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                    tmp_file.write(image_bytes)
-                    tmp_file.flush()
-
-                    array = cv2.imread(tmp_file.name)
-                    os.unlink(tmp_file.name)
-
-                    if array is None:
-                        return None
-
-                    # Convert BGR to RGB
-                    array = cv2.cvtColor(array, cv2.COLOR_BGR2RGB)
-
-            # Create a new PIL image from the array
-            return Image.fromarray(array)
-        except Exception:
-            pass
-
-        return None
+            if isinstance(image_data, Upload):
+                return image_data.image()
+            return decode_image(image_data).image
+        except ImageDecodeError:
+            return salvage_image(image_data.data if isinstance(image_data, Upload) else image_data).image
     except Exception:
         return None
 
-def _prepare_image_for_diagnosis(image_data: Union[str, bytes, BinaryIO, Image.Image]) -> tuple:
+def _prepare_image_for_diagnosis(image_data: Union[str, bytes, BinaryIO, Image.Image, Upload]) -> tuple:
     """Prepare image data for diagnosis by converting to bytes and optionally path."""
     image_bytes = None
     image_path = None
@@ -378,6 +327,11 @@ def _prepare_image_for_diagnosis(image_data: Union[str, bytes, BinaryIO, Image.I
         # Already bytes
         image_bytes = image_data
 
+    elif isinstance(image_data, Upload):
+        # Shared upload: its bytes are already in memory
+        image_bytes = image_data.data
+        image_path = image_data.name
+
     elif isinstance(image_data, Image.Image):
         # PIL Image, convert to bytes
         buffer = io.BytesIO()
@@ -400,22 +354,9 @@ def _prepare_image_for_diagnosis(image_data: Union[str, bytes, BinaryIO, Image.I
 
 def _identify_format_from_magic_bytes(image_bytes: bytes) -> Optional[str]:
     """Identify image format from magic bytes."""
-    # Some common image format signatures
-    signatures = {
-        b'\xff\xd8\xff': 'JPEG',
-        b'\x89PNG\r\n\x1a\n': 'PNG',
-        b'GIF87a': 'GIF',
-        b'GIF89a': 'GIF',
-        b'BM': 'BMP',
-        b'II*\x00': 'TIFF',
-        b'MM\x00*': 'TIFF',
-        b'RIFF': 'WEBP',  # WEBP starts with RIFF
-        # Add more signatures as needed
-    }
-
-    for signature, format_name in signatures.items():
-        if image_bytes.startswith(signature):
-            return format_name
+    format_name = sniff_format(image_bytes)
+    if format_name:
+        return format_name
 
     # Try imghdr as a fallback
     format_imghdr = imghdr.what(None, h=image_bytes)
@@ -463,128 +404,6 @@ def _check_image_header(image_bytes: bytes, format_name: Optional[str]) -> List[
 
     return issues
 
-def _try_multiple_loading_methods(image_data: Union[str, bytes, BinaryIO, Image.Image]) -> tuple:
-    """Try multiple methods to load an image and return success results."""
-    results = {
-        "PIL direct": False,
-        "PIL via file": False,
-        "OpenCV": False,
-        "Pillow with different modes": False
-    }
-
-    # Method 1: Direct PIL
-    try:
-        if isinstance(image_data, str):
-            image = Image.open(image_data)
-        elif isinstance(image_data, Image.Image):
-            image = image_data.copy()
-        elif isinstance(image_data, bytes):
-            image = Image.open(io.BytesIO(image_data))
-        else:
-            # File-like object
-            if hasattr(image_data, 'seek'):
-                image_data.seek(0)
-            image = Image.open(image_data)
-            if hasattr(image_data, 'seek'):
-                image_data.seek(0)
-
-        image.load()  # Force load
-        results["PIL direct"] = True
-        return image, results
-    except Exception:
-        pass
-
-    # Method 2: PIL via temporary file
-    try:
-        image_bytes, _ = _prepare_image_for_diagnosis(image_data)
-        if image_bytes:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                tmp_file.write(image_bytes)
-                tmp_file.flush()
-
-                image = Image.open(tmp_file.name)
-                image.load()
-
-                # Clean up
-                os.unlink(tmp_file.name)
-
-                results["PIL via file"] = True
-                return image, results
-    except Exception:
-        # Clean up temp file in case of exception
-        if 'tmp_file' in locals():
-            try:
-                os.unlink(tmp_file.name)
-            except:
-                pass
-
-    # Method 3: OpenCV
-    try:
-        import cv2
-        image_bytes, image_path = _prepare_image_for_diagnosis(image_data)
-
-        if image_path and os.path.exists(image_path):
-            # Direct file path
-            cv_img = cv2.imread(image_path)
-            if cv_img is not None and cv_img.size > 0:
-                # Convert BGR to RGB
-                cv_img = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-                image = Image.fromarray(cv_img)
-                results["OpenCV"] = True
-                return image, results
-
-        if image_bytes:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                tmp_file.write(image_bytes)
-                tmp_file.flush()
-
-                cv_img = cv2.imread(tmp_file.name)
-                os.unlink(tmp_file.name)
-
-                if cv_img is not None and cv_img.size > 0:
-                    # Convert BGR to RGB
-                    cv_img = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-                    image = Image.fromarray(cv_img)
-                    results["OpenCV"] = True
-                    return image, results
-    except Exception:
-        pass
-
-    # Method 4: Try different PIL modes
-    try:
-        image_bytes, _ = _prepare_image_for_diagnosis(image_data)
-        if image_bytes:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                tmp_file.write(image_bytes)
-                tmp_file.flush()
-
-                for mode in ['RGB', 'RGBA', 'L', 'P', '1']:
-                    try:
-                        image = Image.open(tmp_file.name)
-                        image.load()
-                        image = image.convert(mode)
-
-                        # Clean up
-                        os.unlink(tmp_file.name)
-
-                        results["Pillow with different modes"] = True
-                        return image, results
-                    except Exception:
-                        continue
-
-                # Clean up if all modes failed
-                os.unlink(tmp_file.name)
-    except Exception:
-        # Clean up temp file in case of exception
-        if 'tmp_file' in locals():
-            try:
-                os.unlink(tmp_file.name)
-            except:
-                pass
-
-    # All methods failed
-    return None, results
-
 def _format_size(size_bytes: int) -> str:
     """Format bytes to human-readable size."""
     if size_bytes < 1024:
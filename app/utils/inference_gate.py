@@ -0,0 +1,227 @@
+"""Bounded, session-fair admission control for the shared model.
+
+Every Streamlit session and HTTP request in a process shares one model, and
+concurrent ``predict`` calls on the CPU only compete for the same cores. The
+gate admits at most ``max_concurrent`` forward passes at a time. Callers
+beyond that wait in per-session FIFO queues which are served round-robin,
+so one session submitting many requests cannot starve the others, and give
+up with ``InferenceBusyError`` after ``timeout`` seconds. Queue wait is
+recorded separately from compute so contention shows up as its own number.
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional
+
+from .timing import LatencyHistogram, record
+
+logger = logging.getLogger(__name__)
+
+def _default_max_concurrent() -> int:
+    """One forward pass per group of intra-op threads that fits on the machine."""
+    cores = os.cpu_count() or 1
+    intra_op = int(os.environ.get('PLANT_CARE_INTRA_OP_THREADS', '0') or 0) or cores
+    return max(1, cores // intra_op)
+
+# Concurrent forward passes allowed per process; 0 disables the gate
+MAX_CONCURRENT = int(os.environ.get('PLANT_CARE_MAX_CONCURRENT', str(_default_max_concurrent())))
+
+# Seconds a request may wait for a slot before giving up
+QUEUE_TIMEOUT = float(os.environ.get('PLANT_CARE_QUEUE_TIMEOUT', '30'))
+
+class InferenceBusyError(TimeoutError):
+    """Raised when no inference slot frees up within the queue timeout."""
+
+_session: contextvars.ContextVar = contextvars.ContextVar('inference_session', default=None)
+
+@contextmanager
+def session_scope(session_id: str):
+    """Attribute inference calls made inside the block to ``session_id``."""
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+def current_session_id() -> str:
+    """Return the session set by ``session_scope``, the Streamlit session, or the thread name."""
+    session_id = _session.get()
+    if session_id is not None:
+        return session_id
+    # Only use Streamlit if the host application already imported it
+    import sys
+    if 'streamlit' in sys.modules:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            return ctx.session_id
+    return threading.current_thread().name
+
+class _Ticket:
+    __slots__ = ('granted',)
+
+    def __init__(self):
+        self.granted = False
+
+class InferenceGate:
+    """Counting semaphore with per-session round-robin queues, a timeout and wait statistics."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, timeout: float = QUEUE_TIMEOUT):
+        """
+        Args:
+            max_concurrent: Forward passes allowed at once
+            timeout: Seconds to wait for a slot before raising InferenceBusyError
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.timeout = timeout
+
+        self._condition = threading.Condition()
+        self._active = 0
+        self._queues: 'OrderedDict[str, Deque[_Ticket]]' = OrderedDict()
+        self._held = threading.local()
+        self._wait_times = LatencyHistogram()
+        self._admitted = 0
+        self._queued = 0
+        self._rejected = 0
+
+    @contextmanager
+    def slot(self, session_id: Optional[str] = None, timeout: Optional[float] = None):
+        """Hold one inference slot for the duration of the block.
+
+        Re-entrant per thread: nested calls (for example a request that holds
+        a slot and then calls the gated model) do not take a second slot.
+
+        Raises:
+            InferenceBusyError: If no slot frees up within the timeout
+        """
+        depth = getattr(self._held, 'depth', 0)
+        if depth:
+            self._held.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._held.depth -= 1
+            return
+
+        self._acquire(session_id or current_session_id(), self.timeout if timeout is None else timeout)
+        self._held.depth = 1
+        try:
+            yield
+        finally:
+            self._held.depth = 0
+            self._release()
+
+    def _acquire(self, session_id: str, timeout: float):
+        start = time.perf_counter()
+        with self._condition:
+            if self._active < self.max_concurrent and not self._queues:
+                self._active += 1
+                self._admitted += 1
+                self._observe_wait(0.0)
+                return
+
+            ticket = _Ticket()
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._queued += 1
+            deadline = start + timeout
+            while not ticket.granted:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._withdraw(session_id, ticket)
+                    self._rejected += 1
+                    raise InferenceBusyError(f"No inference slot became free within {timeout:g}s; "
+                                             f"the server is busy, please retry")
+                self._condition.wait(remaining)
+            self._admitted += 1
+            self._observe_wait(time.perf_counter() - start)
+
+    def _withdraw(self, session_id: str, ticket: _Ticket):
+        queue = self._queues.get(session_id)
+        if queue is not None:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[session_id]
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            # Hand freed slots to the next session in turn, not the next request overall
+            while self._active < self.max_concurrent and self._queues:
+                session_id, queue = self._queues.popitem(last=False)
+                queue.popleft().granted = True
+                self._active += 1
+                if queue:
+                    self._queues[session_id] = queue
+            self._condition.notify_all()
+
+    def _observe_wait(self, seconds: float):
+        self._wait_times.observe(seconds)
+        record('queue_wait', seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return slot usage, queue depth, timeouts and wait-time percentiles (seconds)."""
+        with self._condition:
+            state = {
+                'max_concurrent': self.max_concurrent,
+                'in_flight': self._active,
+                'queued_now': sum(len(queue) for queue in self._queues.values()),
+                'waiting_sessions': len(self._queues),
+                'admitted': self._admitted,
+                'had_to_queue': self._queued,
+                'timed_out': self._rejected,
+            }
+        wait = self._wait_times.snapshot()
+        state['wait'] = {key: wait[key] for key in ('mean', 'max', 'p50', 'p95', 'p99')}
+        return state
+
+class GatedModel:
+    """Wraps a model so ``predict`` and ``explain`` run inside the inference gate.
+
+    Every other attribute (threshold, version, input_shape, ...) is forwarded
+    to the wrapped model, so the wrapper is a drop-in replacement.
+    """
+
+    def __init__(self, model, gate: 'InferenceGate'):
+        self.model = model
+        self.gate = gate
+        # Keep hasattr(model, 'explain') meaningful for callers that probe for Grad-CAM support
+        if hasattr(model, 'explain'):
+            self.explain = self._explain
+
+    def predict(self, x, batch_size=None, verbose=0):
+        with self.gate.slot():
+            return self.model.predict(x, batch_size=batch_size, verbose=verbose)
+
+    def _explain(self, x, threshold=None):
+        with self.gate.slot():
+            return self.model.explain(x, threshold)
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the wrapper itself
+        return getattr(self.model, name)
+
+_gate: Optional[InferenceGate] = None
+_gate_lock = threading.Lock()
+
+def get_inference_gate() -> Optional[InferenceGate]:
+    """Return the process-wide gate, or None when PLANT_CARE_MAX_CONCURRENT=0."""
+    global _gate
+    if MAX_CONCURRENT <= 0 and _gate is None:
+        return None
+    with _gate_lock:
+        if _gate is None:
+            _gate = InferenceGate()
+            logger.info("Inference gate: %d concurrent forward passes, %.0fs queue timeout",
+                        _gate.max_concurrent, _gate.timeout)
+        return _gate
+
+def configure_inference_gate(max_concurrent: int, timeout: float = QUEUE_TIMEOUT) -> InferenceGate:
+    """Size the process-wide gate; call before the model is loaded."""
+    global _gate
+    with _gate_lock:
+        _gate = InferenceGate(max_concurrent, timeout)
+        return _gate
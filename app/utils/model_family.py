@@ -0,0 +1,100 @@
+"""Multi-resolution model family with per-request latency tiers.
+
+``train_model.py --train-family`` trains the same architecture at several
+input resolutions (for example 96, 128, 160 and 224 pixels) into
+``model/family/`` and records each member's measured CPU latency and
+validation accuracy in a manifest. Two tiers are picked from the members:
+
+* ``accurate``: the most accurate member
+* ``fast``: the quickest member that is quicker than it and whose accuracy
+  is within a budget of it; omitted when no member qualifies
+
+Callers ask ``load_model(tier=...)`` for a tier and get that member, which
+declares its own input size through ``input_shape``.
+"""
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from .model_utils import MODEL_DIR
+
+logger = logging.getLogger(__name__)
+
+FAMILY_DIR = os.path.join(MODEL_DIR, 'family')
+MANIFEST_PATH = os.path.join(FAMILY_DIR, 'family.json')
+
+TIERS = ('fast', 'accurate')
+
+# Tier used when a caller does not ask for one; unset serves the main model
+DEFAULT_TIER = os.environ.get('PLANT_CARE_TIER') or None
+
+# Pass as ``tier`` to serve the main model even when PLANT_CARE_TIER sets a default tier
+MAIN_MODEL = 'main'
+
+def member_path(input_size: int, family_dir: str = FAMILY_DIR) -> str:
+    """Return the model file of the family member trained at ``input_size`` pixels."""
+    return os.path.join(family_dir, f'plant_health_{input_size}.h5')
+
+def read_manifest(path: str = MANIFEST_PATH) -> Optional[Dict[str, Any]]:
+    """Return the family manifest, or None if no family has been trained."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def available_tiers(path: str = MANIFEST_PATH) -> List[str]:
+    """Return the tiers the trained family provides, in ``TIERS`` order."""
+    manifest = read_manifest(path) or {}
+    return [tier for tier in TIERS if tier in manifest.get('tiers', {})]
+
+def tier_metadata(tier: str, path: str = MANIFEST_PATH) -> Dict[str, Any]:
+    """Return the recorded input size, latency and accuracy of a tier's model.
+
+    Raises:
+        ValueError: If the tier is unknown
+        FileNotFoundError: If no family has been trained or it lacks the tier
+    """
+    if tier not in TIERS:
+        raise ValueError(f"Unknown model tier '{tier}'. Choose one of: {', '.join(TIERS)}")
+    manifest = read_manifest(path)
+    if manifest is None or tier not in manifest.get('tiers', {}):
+        raise FileNotFoundError(f"No '{tier}' model found; train the family with train_model.py --train-family")
+    return manifest['tiers'][tier]
+
+def tier_model_path(tier: str, path: str = MANIFEST_PATH) -> str:
+    """Return the model file serving ``tier`` (see ``tier_metadata`` for errors)."""
+    return os.path.join(os.path.dirname(path), tier_metadata(tier, path)['model'])
+
+def choose_tiers(members: List[Dict[str, Any]], max_accuracy_loss: float = 0.02) -> Dict[str, Dict[str, Any]]:
+    """Assign tiers from profiled family members.
+
+    Args:
+        members: One dict per member with input_size, cpu_latency_ms and val_accuracy
+        max_accuracy_loss: Accuracy the fast tier may give up versus the accurate tier
+
+    Returns:
+        dict: Tier name -> the chosen member. 'fast' is left out when no
+        member is both quicker than the accurate one and within budget, so
+        the two tiers never name the same model.
+    """
+    # Most accurate wins; on ties prefer the cheaper member
+    accurate = max(members, key=lambda member: (member['val_accuracy'], -member['cpu_latency_ms']))
+    eligible = [member for member in members
+                if member['cpu_latency_ms'] < accurate['cpu_latency_ms']
+                and accurate['val_accuracy'] - member['val_accuracy'] <= max_accuracy_loss + 1e-9]
+    if not eligible:
+        return {'accurate': accurate}
+    fast = min(eligible, key=lambda member: member['cpu_latency_ms'])
+    return {'fast': fast, 'accurate': accurate}
+
+def save_manifest(members: List[Dict[str, Any]], tiers: Dict[str, Dict[str, Any]],
+                  max_accuracy_loss: float, path: str = MANIFEST_PATH):
+    """Write the manifest listing every member and the tier assignment."""
+    manifest = {'members': members, 'tiers': tiers, 'max_accuracy_loss': max_accuracy_loss}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
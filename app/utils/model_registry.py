@@ -0,0 +1,315 @@
+"""Versioned model registry with background hot-swapping.
+
+Layout of the registry directory (``model/registry`` by default)::
+
+    registry/
+        state.json              # {"active": "v3", "history": ["v1", "v2", "v3"]}
+        v1/
+            plant_health_model.h5
+            metadata.json       # input size, decision threshold, training metrics
+        v2/
+        ...
+
+Publishing a version copies its artifacts into a new directory and flips the
+``active`` pointer with an atomic file replace. ``HotSwapModel`` polls that
+pointer, loads and warms a new version on its own thread and only then swaps
+it in, so requests already running keep using the model they started with.
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .model_utils import MODEL_DIR, MODEL_INPUT_SIZE, companion_paths
+
+logger = logging.getLogger(__name__)
+
+# Registry location and how often running apps check it for a new active version
+REGISTRY_DIR = os.environ.get('PLANT_CARE_REGISTRY_DIR', os.path.join(MODEL_DIR, 'registry'))
+POLL_INTERVAL = float(os.environ.get('PLANT_CARE_REGISTRY_POLL', '5'))
+
+MODEL_FILENAME = 'plant_health_model.h5'
+METADATA_FILENAME = 'metadata.json'
+STATE_FILENAME = 'state.json'
+
+# Optional artifacts copied along with the model when present next to it: exports sharing the
+# model's file stem (see model_utils.COMPANION_SUFFIXES) and the precision check results
+GATE_FILENAME = 'precision_check.json'
+
+DEFAULT_THRESHOLD = 0.5
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    """Write JSON to a temporary file and rename it over ``path``."""
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ModelRegistry:
+    """Directory of versioned model artifacts with an active-version pointer."""
+
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def list_versions(self) -> List[str]:
+        """Return published versions, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        versions = [name for name in os.listdir(self.root)
+                    if os.path.isfile(os.path.join(self.root, name, METADATA_FILENAME))]
+        return sorted(versions, key=lambda name: (len(name), name))
+
+    def model_path(self, version: str) -> str:
+        """Return the Keras model file of a version."""
+        return os.path.join(self.root, version, MODEL_FILENAME)
+
+    def read_metadata(self, version: str) -> Dict[str, Any]:
+        """Return the metadata recorded when a version was published."""
+        with open(os.path.join(self.root, version, METADATA_FILENAME), 'r') as f:
+            return json.load(f)
+
+    def read_state(self) -> Dict[str, Any]:
+        """Return the pointer file contents, or an empty state if nothing was activated yet."""
+        try:
+            with open(os.path.join(self.root, STATE_FILENAME), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'active': None, 'history': []}
+
+    def active_version(self) -> Optional[str]:
+        """Return the version the app should serve, or None if the registry is empty."""
+        active = self.read_state().get('active')
+        if active and os.path.isfile(self.model_path(active)):
+            return active
+        return None
+
+    def publish(self, model_path: str, metadata: Optional[Dict[str, Any]] = None,
+                activate: bool = True) -> str:
+        """Copy a trained model into a new version directory.
+
+        Companion artifacts (memory-mapped weights, precision check results)
+        found next to ``model_path`` are copied too.
+
+        Args:
+            model_path: Keras .h5 file to publish
+            metadata: Extra metadata, e.g. {'metrics': {'val_accuracy': 0.97}}
+            activate: Make the new version active immediately
+
+        Returns:
+            str: The new version name
+        """
+        metadata = dict(metadata or {})
+        metadata.setdefault('input_size', list(MODEL_INPUT_SIZE))
+        metadata.setdefault('threshold', DEFAULT_THRESHOLD)
+        metadata.setdefault('metrics', {})
+
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            existing = [int(name[1:]) for name in os.listdir(self.root)
+                        if name.startswith('v') and name[1:].isdigit()]
+            version = f"v{max(existing, default=0) + 1}"
+
+            # Build the version in a staging directory so a half-copied version is never visible
+            staging_dir = os.path.join(self.root, f".staging-{version}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            os.makedirs(staging_dir)
+            shutil.copy2(model_path, os.path.join(staging_dir, MODEL_FILENAME))
+            # Companions are renamed to the version's stem so the loader finds them
+            source_dir = os.path.dirname(os.path.abspath(model_path))
+            companions = list(zip(companion_paths(model_path).values(),
+                                  companion_paths(os.path.join(staging_dir, MODEL_FILENAME)).values()))
+            companions.append((os.path.join(source_dir, GATE_FILENAME), os.path.join(staging_dir, GATE_FILENAME)))
+            for companion, target in companions:
+                if os.path.isfile(companion) and os.path.getmtime(companion) >= os.path.getmtime(model_path):
+                    shutil.copy2(companion, target)
+
+            metadata.update(version=version, source=os.path.abspath(model_path),
+                            created_at=datetime.now(timezone.utc).isoformat(timespec='seconds'))
+            _write_json_atomic(os.path.join(staging_dir, METADATA_FILENAME), metadata)
+            os.rename(staging_dir, os.path.join(self.root, version))
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str):
+        """Point the registry at ``version``; running apps pick it up on their next poll.
+
+        Raises:
+            ValueError: If the version does not exist
+        """
+        if not os.path.isfile(self.model_path(version)):
+            raise ValueError(f"Unknown model version '{version}'. Available: {', '.join(self.list_versions())}")
+        with self._lock:
+            state = self.read_state()
+            history = [name for name in state.get('history', []) if name != version]
+            _write_json_atomic(os.path.join(self.root, STATE_FILENAME),
+                               {'active': version, 'history': history + [version]})
+        logger.info("Model version %s activated", version)
+
+    def rollback(self) -> str:
+        """Re-activate the previously active version.
+
+        Returns:
+            str: The version that is now active
+
+        Raises:
+            ValueError: If there is no earlier version to roll back to
+        """
+        with self._lock:
+            state = self.read_state()
+            history = [name for name in state.get('history', []) if os.path.isfile(self.model_path(name))]
+            if len(history) < 2:
+                raise ValueError("No previous model version to roll back to")
+            previous = history[-2]
+            # Drop the rolled-back version from the history so repeated rollbacks keep going back
+            _write_json_atomic(os.path.join(self.root, STATE_FILENAME),
+                               {'active': previous, 'history': history[:-1]})
+        logger.info("Rolled back to model version %s", previous)
+        return previous
+
+def active_model_path(root: str = REGISTRY_DIR) -> Optional[str]:
+    """Return the active version's model file, or None when no registry is in use."""
+    registry = ModelRegistry(root)
+    version = registry.active_version()
+    return registry.model_path(version) if version else None
+
+def active_threshold(root: str = REGISTRY_DIR) -> float:
+    """Return the decision threshold of the active version, or the default without a registry."""
+    registry = ModelRegistry(root)
+    version = registry.active_version()
+    if version is None:
+        return DEFAULT_THRESHOLD
+    return float(registry.read_metadata(version).get('threshold', DEFAULT_THRESHOLD))
+
+class HotSwapModel:
+    """Keras-style model that follows the registry's active version without restarts.
+
+    ``predict`` takes a reference to the current model before running, so a
+    swap never interrupts requests that are already in flight; they finish on
+    the old version, which is released once the last of them returns.
+    """
+
+    def __init__(self, registry: ModelRegistry, loader: Callable[[str], Any],
+                 poll_interval: float = POLL_INTERVAL, watch: bool = True):
+        """
+        Args:
+            registry: Registry to follow
+            loader: Function that loads and warms the model at a given path
+            poll_interval: Seconds between checks for a new active version
+            watch: Start the background watcher thread
+        """
+        self.registry = registry
+        self.loader = loader
+        self.poll_interval = poll_interval
+
+        version = registry.active_version()
+        if version is None:
+            raise FileNotFoundError(f"No active model version in {registry.root}")
+        self._current: Tuple[str, Any, Dict[str, Any]] = self._load_version(version)
+        self._failed_version: Optional[str] = None
+        self._swap_lock = threading.Lock()
+
+        self._stopped = threading.Event()
+        self._watcher = None
+        if watch:
+            self._watcher = threading.Thread(target=self._watch, name="model-registry-watcher", daemon=True)
+            self._watcher.start()
+
+    @property
+    def version(self) -> str:
+        return self._current[0]
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._current[2]
+
+    @property
+    def threshold(self) -> float:
+        return float(self.metadata.get('threshold', DEFAULT_THRESHOLD))
+
+    @property
+    def input_shape(self):
+        return self._current[1].input_shape
+
+    @property
+    def precision(self) -> str:
+        return getattr(self._current[1], 'precision', 'float32')
+
+    def predict(self, x: np.ndarray, batch_size: int = None, verbose: int = 0) -> np.ndarray:
+        """Score a batch on whichever version is active when the call starts."""
+        _, model, _ = self._current
+        return model.predict(x, batch_size=batch_size, verbose=verbose)
+
+    def explain(self, x: np.ndarray, threshold: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Score a batch with Grad-CAM maps on whichever version is active when the call starts.
+
+        Without an explicit ``threshold`` the maps explain the class picked by
+        that version's own threshold.
+        """
+        _, model, metadata = self._current
+        if threshold is None:
+            threshold = float(metadata.get('threshold', DEFAULT_THRESHOLD))
+        return model.explain(x, threshold)
+
+    def reload(self) -> bool:
+        """Load and swap in the registry's active version if it differs from the served one.
+
+        Returns:
+            bool: True if a new version was swapped in
+        """
+        version = self.registry.active_version()
+        if version is None or version == self.version or version == self._failed_version:
+            return False
+
+        with self._swap_lock:
+            if version == self.version:
+                return False
+            start = time.perf_counter()
+            try:
+                loaded = self._load_version(version)
+            except Exception as e:
+                # Keep serving the current version and do not retry this one every poll
+                self._failed_version = version
+                logger.error("Could not load model version %s, still serving %s: %s",
+                             version, self.version, str(e))
+                return False
+
+            previous = self.version
+            # Single reference assignment: new requests see the new model, running ones keep the old
+            self._current = loaded
+            self._failed_version = None
+        logger.info("Swapped model %s -> %s (loaded and warmed in %.2fs)",
+                    previous, version, time.perf_counter() - start)
+        return True
+
+    def stop(self):
+        """Stop watching the registry."""
+        self._stopped.set()
+
+    def _load_version(self, version: str) -> Tuple[str, Any, Dict[str, Any]]:
+        """Load one version and check it fits the app's preprocessing."""
+        metadata = self.registry.read_metadata(version)
+        input_size = tuple(metadata.get('input_size', MODEL_INPUT_SIZE))
+        if input_size != tuple(MODEL_INPUT_SIZE):
+            raise ValueError(f"Version {version} expects input size {input_size}, "
+                             f"but the app preprocesses to {tuple(MODEL_INPUT_SIZE)}")
+        model = self.loader(self.registry.model_path(version))
+        return version, model, metadata
+
+    def _watch(self):
+        """Watcher loop: poll the active-version pointer and reload on change."""
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error("Model registry watcher error: %s", str(e))
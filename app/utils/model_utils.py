@@ -1,241 +1,573 @@
-"""Model utility functions for the Smart Plant Care application."""
+"""Model utility functions for the Smart Plant Care application.
+
+TensorFlow and OpenCV are imported lazily so that importing this module does
+not delay the first render of the UI; the model itself is loaded and warmed
+on a background thread by ``preload_model``. Streamlit is optional: errors are
+logged and only shown in the UI when called from a Streamlit script run, so
+headless tools can reuse these functions.
+"""
 import os
-import streamlit as st
-import tensorflow as tf
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from PIL import Image, ImageFile
-import io
 import numpy as np
-import cv2
-import imghdr
-import tempfile
-from typing import Union, BinaryIO, Optional, Tuple
+from typing import Dict, Union, BinaryIO, Optional, Tuple, List, Sequence
+
+from .timing import span
+from .decoding import decode_image, ImageDecodeError
+from .upload import Upload
+from .inference_gate import InferenceBusyError
+
+logger = logging.getLogger(__name__)
+
+# Reference point for the startup timings reported in the logs
+_IMPORT_TIME = time.perf_counter()
 
 # Allow loading truncated images
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
-@st.cache_resource
-def load_model():
-    """Load the trained model from disk."""
-    model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                             'model', 'plant_health_model.h5')
-    if not os.path.exists(model_path):
-        st.error("Model file not found! Please ensure the model is properly trained.")
-        return None
-    try:
-        model = tf.keras.models.load_model(model_path)
-        return model
-    except Exception as e:
-        st.error(f"Error loading model: {str(e)}")
-        return None
+# Spatial input size expected by the trained model (width, height)
+MODEL_INPUT_SIZE = (224, 224)
+
+# Default number of images per forward pass in analyze_images
+DEFAULT_BATCH_SIZE = 32
+
+# Location of the trained model artifacts
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'model')
+MODEL_PATH = os.path.join(MODEL_DIR, 'plant_health_model.h5')
+TFLITE_MODEL_PATH = os.path.join(MODEL_DIR, 'plant_health_model_int8.tflite')
+ONNX_MODEL_PATH = os.path.join(MODEL_DIR, 'plant_health_model.onnx')
+# Fast-loading export of the Keras model: architecture JSON plus a memory-mapped flat weight file
+ARCHITECTURE_PATH = os.path.join(MODEL_DIR, 'plant_health_model.json')
+FLAT_WEIGHTS_PATH = os.path.join(MODEL_DIR, 'plant_health_model.weights.bin')
+# Same export with float16-stored weights, used by the 'float16' precision mode
+FP16_ARCHITECTURE_PATH = os.path.join(MODEL_DIR, 'plant_health_model.fp16.json')
+FP16_WEIGHTS_PATH = os.path.join(MODEL_DIR, 'plant_health_model.fp16.weights.bin')
+# Accuracy check results that gate the reduced-precision modes
+PRECISION_GATE_PATH = os.path.join(MODEL_DIR, 'precision_check.json')
+# Small student distilled from the main model by train_model.py --distill
+STUDENT_MODEL_PATH = os.path.join(MODEL_DIR, 'plant_health_student.h5')
+
+# Keras model files selectable with PLANT_CARE_MODEL when no registry version is active
+MODEL_VARIANTS = {'default': MODEL_PATH, 'student': STUDENT_MODEL_PATH}
+DEFAULT_MODEL_VARIANT = os.environ.get('PLANT_CARE_MODEL', 'default')
+
+# Export suffixes looked up next to a Keras model file: <stem>.json, <stem>.weights.bin, ...
+COMPANION_SUFFIXES = {
+    'architecture': '.json',
+    'weights': '.weights.bin',
+    'fp16_architecture': '.fp16.json',
+    'fp16_weights': '.fp16.weights.bin',
+}
+
+# Inference backends understood by load_model; override the default with PLANT_CARE_BACKEND
+SUPPORTED_BACKENDS = ('keras', 'tflite', 'onnx')
+DEFAULT_BACKEND = os.environ.get('PLANT_CARE_BACKEND', 'keras')
+
+# Keras precision: 'float32', 'bfloat16' or 'float16' (float16 is storage-only: weights are
+# stored at half size but computed in float32); override with PLANT_CARE_PRECISION
+DEFAULT_PRECISION = os.environ.get('PLANT_CARE_PRECISION', 'float32')
+
+def get_model_path(backend: Optional[str] = None) -> str:
+    """Return the artifact path used by the given (or default) backend.
+
+    For the Keras backend the active version of the model registry takes
+    precedence over the PLANT_CARE_MODEL variant once a version has been
+    published.
+    """
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend == 'keras':
+        from .model_registry import active_model_path
+        return active_model_path() or MODEL_VARIANTS.get(DEFAULT_MODEL_VARIANT, MODEL_PATH)
+    return {'tflite': TFLITE_MODEL_PATH, 'onnx': ONNX_MODEL_PATH}.get(backend, MODEL_PATH)
+
+def companion_paths(model_path: str) -> Dict[str, str]:
+    """Return the export artifacts belonging to a Keras model file, keyed like ``COMPANION_SUFFIXES``."""
+    stem = os.path.splitext(model_path)[0]
+    return {name: stem + suffix for name, suffix in COMPANION_SUFFIXES.items()}
 
-def load_image_multiple_methods(image_data: Union[str, Image.Image, BinaryIO]) -> Optional[Image.Image]:
-    """Try multiple methods to load an image.
+def _report(level: str, message: str):
+    """Log a message and, when running inside a Streamlit script, show it in the UI.
 
     Args:
-        image_data: PIL Image object, file-like object, or path to image file
+        level: 'error' or 'warning'
+        message: Text to report
+    """
+    getattr(logger, level)(message)
+    # Never import Streamlit here; only use it if the host application already did
+    if 'streamlit' not in sys.modules:
+        return
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    if get_script_run_ctx() is not None:
+        import streamlit as st
+        getattr(st, level)(message)
+
+def _env_threads(name: str) -> Optional[int]:
+    """Read a thread count from the environment; unset or 0 keeps the runtime default."""
+    return int(os.environ.get(name, '0') or 0) or None
+
+# Thread counts applied when the model runtime is loaded; None keeps the runtime default.
+# Override with PLANT_CARE_INTRA_OP_THREADS and PLANT_CARE_INTER_OP_THREADS.
+_thread_config: Dict[str, Optional[int]] = {'intra_op': _env_threads('PLANT_CARE_INTRA_OP_THREADS'),
+                                            'inter_op': _env_threads('PLANT_CARE_INTER_OP_THREADS')}
+
+def set_inference_threads(intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+    """Configure runtime thread pools; must be called before the model is loaded.
 
-    Returns:
-        Optional[Image.Image]: A loaded PIL Image or None if all methods fail
+    Args:
+        intra_op: Threads used inside a single op (TFLite/ONNX use this as their thread count)
+        inter_op: Threads used to run independent ops concurrently (TensorFlow only)
     """
-    image = None
-    errors = []
+    _thread_config['intra_op'] = intra_op
+    _thread_config['inter_op'] = inter_op
 
-    # Method 1: Direct PIL approach
+def _apply_tensorflow_threads(tf):
+    """Apply the configured thread counts to TensorFlow before it creates its thread pools."""
     try:
-        if isinstance(image_data, str):
-            # Load from file path
-            image = Image.open(image_data)
-            image.load()  # Force load to verify image is valid
-        elif isinstance(image_data, Image.Image):
-            # Already a PIL Image, make a copy
-            image = image_data.copy()
-            image.load()  # Force load to verify image is valid
+        if _thread_config['intra_op']:
+            tf.config.threading.set_intra_op_parallelism_threads(_thread_config['intra_op'])
+        if _thread_config['inter_op']:
+            tf.config.threading.set_inter_op_parallelism_threads(_thread_config['inter_op'])
+        logger.info("TensorFlow threads: intra-op %s, inter-op %s",
+                    tf.config.threading.get_intra_op_parallelism_threads() or 'default',
+                    tf.config.threading.get_inter_op_parallelism_threads() or 'default')
+    except RuntimeError as e:
+        # TensorFlow refuses once its runtime has been initialized
+        logger.warning("Could not apply TensorFlow thread settings: %s", str(e))
+
+# Background loading state shared by every session in the process
+_preload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-preload")
+_preload_futures: Dict[Tuple[str, str], Future] = {}
+_preload_lock = threading.Lock()
+
+def _load_model_from_disk(backend: str, precision: str = 'float32', tier: str = ''):
+    """Import the runtime, load the model for ``backend`` (or a family ``tier``) and warm it up.
+
+    Raises:
+        ValueError: If the backend or tier is unknown
+        FileNotFoundError: If the model artifact does not exist
+    """
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}'. Choose one of: {', '.join(SUPPORTED_BACKENDS)}")
+    if DEFAULT_MODEL_VARIANT not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{DEFAULT_MODEL_VARIANT}'. "
+                         f"Choose one of: {', '.join(MODEL_VARIANTS)}")
+
+    if tier:
+        from .model_family import tier_model_path
+        if backend != 'keras':
+            raise ValueError(f"Model tiers are only available with the keras backend, not '{backend}'")
+        model_path = tier_model_path(tier)
+    else:
+        model_path = get_model_path(backend)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError("Model file not found! Please ensure the model is properly trained.")
+
+    start = time.perf_counter()
+    if tier:
+        model = _load_keras_model(model_path, precision)
+        logger.info("Serving the '%s' tier from %s", tier, model_path)
+    elif backend == 'tflite':
+        from .backends import TFLiteModel
+        model = TFLiteModel(model_path, num_threads=_thread_config['intra_op'])
+    elif backend == 'onnx':
+        from .backends import OnnxModel
+        model = OnnxModel(model_path, num_threads=_thread_config['intra_op'])
+    else:
+        from .model_registry import ModelRegistry, HotSwapModel, REGISTRY_DIR
+        registry = ModelRegistry(REGISTRY_DIR)
+        if registry.active_version():
+            # Follow the registry: new versions are loaded and swapped in without a restart
+            model = HotSwapModel(registry, loader=lambda path: _load_keras_model(path, precision))
+            logger.info("Serving model version %s from %s", model.version, registry.root)
         else:
-            # Assume file-like object
-            if hasattr(image_data, 'seek'):
-                image_data.seek(0)
+            model = _load_keras_model(model_path, precision)
 
-            # Try to get file extension or type
-            file_type = None
-            if hasattr(image_data, 'name') and '.' in image_data.name:
-                file_type = image_data.name.split('.')[-1].lower()
+    # Bound concurrent forward passes across every session sharing this model
+    from .inference_gate import GatedModel, get_inference_gate
+    gate = get_inference_gate()
+    if gate is not None:
+        model = GatedModel(model, gate)
 
-            # Read bytes
-            if hasattr(image_data, 'read'):
-                image_bytes = image_data.read()
-                if hasattr(image_data, 'seek'):
-                    image_data.seek(0)
-            else:
-                # If we can't read, return None
-                return None
+    logger.info("Model (%s backend) ready in %.2fs, %.2fs after startup",
+                backend, time.perf_counter() - start, time.perf_counter() - _IMPORT_TIME)
+    return model
+
+def _load_keras_model(model_path: str, precision: str = 'float32'):
+    """Load a Keras model file, preferring its memory-mapped export, and wrap it for fast inference.
+
+    Companion artifacts (flat weights, float16 weights) are looked up next to
+    ``model_path`` under the same file stem; precision check results are read
+    from the same directory.
+    """
+    start = time.perf_counter()
+    import tensorflow as tf
+    logger.info("TensorFlow imported in %.2fs", time.perf_counter() - start)
+    _apply_tensorflow_threads(tf)
+
+    from .backends import CompiledKerasModel, load_flat_weights
+    from .precision import resolve_precision, precision_gate_passed, build_precision_model
+
+    companions = companion_paths(model_path)
+    architecture_path, weights_path = companions['architecture'], companions['weights']
+    fp16_architecture_path, fp16_weights_path = companions['fp16_architecture'], companions['fp16_weights']
+    gate_path = os.path.join(os.path.dirname(model_path), os.path.basename(PRECISION_GATE_PATH))
+
+    precision = resolve_precision(precision)
+    if not precision_gate_passed(gate_path, model_path, precision):
+        _report('warning', f"{precision} mode has not passed the accuracy check for this model "
+                           f"(run train_model.py --check-precision); using float32")
+        precision = 'float32'
+
+    precision_applied = precision == 'float32'
+    load_start = time.perf_counter()
+    if precision == 'float16' and _has_fresh_flat_weights(model_path, fp16_architecture_path, fp16_weights_path):
+        # Weights are already float16-rounded in the artifact and upcast by set_weights
+        keras_model = load_flat_weights(fp16_architecture_path, fp16_weights_path)
+        logger.info("Keras model loaded from memory-mapped float16 weights in %.2fs", time.perf_counter() - load_start)
+        precision_applied = True
+    elif _has_fresh_flat_weights(model_path, architecture_path, weights_path):
+        keras_model = load_flat_weights(architecture_path, weights_path)
+        logger.info("Keras model loaded from memory-mapped weights in %.2fs", time.perf_counter() - load_start)
+    else:
+        keras_model = tf.keras.models.load_model(model_path, compile=False)
+        logger.info("Keras model deserialized from HDF5 in %.2fs", time.perf_counter() - load_start)
+
+    if not precision_applied:
+        keras_model = build_precision_model(keras_model, precision)
+    if precision == 'float16':
+        logger.info("Serving Keras model from float16-stored weights, computing in float32")
+    else:
+        logger.info("Serving Keras model in %s precision", precision)
+
+    warm_start = time.perf_counter()
+    model = CompiledKerasModel(keras_model, precision)
+    logger.info("Inference functions traced and warmed up in %.2fs", time.perf_counter() - warm_start)
+    return model
+
+def _has_fresh_flat_weights(model_path: str, architecture_path: str, weights_path: str) -> bool:
+    """Return True if a memory-mappable export exists and is not older than the HDF5 model."""
+    try:
+        export_mtime = min(os.path.getmtime(architecture_path), os.path.getmtime(weights_path))
+    except OSError:
+        return False
+    return export_mtime >= os.path.getmtime(model_path)
 
-            # Try to identify image format
-            img_format = imghdr.what(None, h=image_bytes)
+def preload_model(backend: Optional[str] = None, precision: Optional[str] = None,
+                  tier: Optional[str] = None) -> Future:
+    """Start loading and warming the model on a background thread.
 
-            # Create BytesIO object
-            image_buffer = io.BytesIO(image_bytes)
-            image = Image.open(image_buffer)
-            image.load()  # Force load to verify image is valid
+    Calling this repeatedly is cheap: the load is only started once per
+    backend/precision/tier and process, and the same Future is returned afterwards.
 
-        # Test if image is valid
-        if image.width == 0 or image.height == 0:
-            raise ValueError("Image has invalid dimensions")
+    Args:
+        backend: Backend to load, defaults to PLANT_CARE_BACKEND or 'keras'
+        precision: Keras compute precision, defaults to PLANT_CARE_PRECISION or 'float32'
+        tier: 'fast' or 'accurate' member of the model family, defaults to
+            PLANT_CARE_TIER; None serves the main model
 
-        return image
-    except Exception as e:
-        errors.append(f"PIL direct method failed: {str(e)}")
+    Returns:
+        Future: Resolves to the loaded model
+    """
+    key = _model_key(backend, precision, tier)
+    with _preload_lock:
+        future = _preload_futures.get(key)
+        if future is None:
+            future = _preload_executor.submit(_load_model_from_disk, *key)
+            _preload_futures[key] = future
+    return future
+
+def _resolve_tier(tier: Optional[str]) -> str:
+    """Return the requested tier, else PLANT_CARE_TIER, else '' for the main model (also for MAIN_MODEL)."""
+    from .model_family import DEFAULT_TIER, MAIN_MODEL
+    if tier == MAIN_MODEL:
+        return ''
+    return (tier or DEFAULT_TIER or '').lower()
+
+def _model_key(backend: Optional[str], precision: Optional[str], tier: Optional[str] = None) -> Tuple[str, str, str]:
+    """Normalize backend/precision/tier arguments into the key of the preload cache."""
+    tier = _resolve_tier(tier)
+    # Family members are Keras models
+    backend = 'keras' if tier else (backend or DEFAULT_BACKEND).lower()
+    # Reduced precision only applies to the Keras backend
+    precision = (precision or DEFAULT_PRECISION).lower() if backend == 'keras' else 'float32'
+    return backend, precision, tier
+
+def is_model_ready(backend: Optional[str] = None, precision: Optional[str] = None,
+                   tier: Optional[str] = None) -> bool:
+    """Return True once the model for ``backend`` has finished loading successfully."""
+    future = preload_model(backend, precision, tier)
+    return future.done() and future.exception() is None
+
+def model_input_size(model) -> Tuple[int, int]:
+    """Return the (width, height) a model expects, from its ``input_shape``."""
+    shape = getattr(model, 'input_shape', None)
+    if shape is not None and len(shape) == 4 and shape[1] and shape[2]:
+        return int(shape[2]), int(shape[1])
+    return MODEL_INPUT_SIZE
+
+def load_model(backend: Optional[str] = None, precision: Optional[str] = None, tier: Optional[str] = None):
+    """Load the trained model from disk.
+
+    The model is loaded once per process on a background thread (see
+    ``preload_model``); this call only blocks if it is not ready yet.
 
-    # Method 2: Via temporary file with PIL
-    try:
-        if isinstance(image_data, str):
-            # Already a file path, just open it
-            image = Image.open(image_data)
-            image.load()
-            return image
-
-        # Get image bytes
-        if isinstance(image_data, Image.Image):
-            # Convert PIL image to bytes
-            byte_arr = io.BytesIO()
-            image_data.save(byte_arr, format='PNG')
-            image_bytes = byte_arr.getvalue()
-        elif hasattr(image_data, 'read'):
-            if hasattr(image_data, 'seek'):
-                image_data.seek(0)
-            image_bytes = image_data.read()
-            if hasattr(image_data, 'seek'):
-                image_data.seek(0)
-        else:
-            return None
-
-        # Try to detect image type
-        img_format = imghdr.what(None, h=image_bytes)
-        file_ext = f'.{img_format}' if img_format else '.png'
-
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-            tmp_file.write(image_bytes)
-            tmp_file.flush()
-
-            # Try to open with PIL
-            for mode in ['RGB', 'RGBA', 'L', 'P', '1']:
-                try:
-                    img = Image.open(tmp_file.name)
-                    img.load()  # Force load
-
-                    # Convert to requested mode
-                    if img.mode != mode:
-                        img = img.convert(mode)
-
-                    # Clean up
-                    os.unlink(tmp_file.name)
-                    return img
-                except Exception:
-                    continue
-
-            # Clean up if all modes failed
-            os.unlink(tmp_file.name)
-    except Exception as e:
-        errors.append(f"Temporary file with PIL method failed: {str(e)}")
+    Args:
+        backend: 'keras' for the float32 HDF5 model, 'tflite' for the int8
+            TFLite export or 'onnx' for the onnxruntime export. Defaults to
+            the PLANT_CARE_BACKEND environment variable, falling back to 'keras'.
+        precision: 'float32', 'bfloat16' (float16-stored weights on CPUs
+            without bfloat16 support) or 'float16' for the Keras backend.
+            Reduced precision is only used if it passed the accuracy check.
+            Defaults to PLANT_CARE_PRECISION, falling back to 'float32'.
+        tier: 'fast' or 'accurate' to serve a member of the multi-resolution
+            family (Keras only; see ``model_family``). Defaults to
+            PLANT_CARE_TIER; None serves the main model. Use
+            ``model_input_size`` to preprocess for the returned model.
 
-    # Method 3: Try OpenCV
+    Returns:
+        A model exposing a Keras-style ``predict`` method, or None on failure.
+        Keras models are wrapped in a pre-warmed ``CompiledKerasModel``.
+    """
+    key = _model_key(backend, precision, tier)
+    future = preload_model(*key)
     try:
-        # Get image bytes
-        if isinstance(image_data, str):
-            # Read image with OpenCV directly
-            img_cv = cv2.imread(image_data)
-            if img_cv is not None and img_cv.size > 0:
-                # Convert from BGR to RGB
-                img_cv = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-                # Convert to PIL
-                return Image.fromarray(img_cv)
-        elif isinstance(image_data, Image.Image):
-            # Already have a PIL image
-            return image_data
-        else:
-            # Get bytes from file-like object
-            if hasattr(image_data, 'seek'):
-                image_data.seek(0)
-
-            if hasattr(image_data, 'read'):
-                image_bytes = image_data.read()
-                if hasattr(image_data, 'seek'):
-                    image_data.seek(0)
-            else:
-                return None
-
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                tmp_file.write(image_bytes)
-                tmp_file.flush()
-
-                # Read with OpenCV
-                img_cv = cv2.imread(tmp_file.name)
-                os.unlink(tmp_file.name)
-
-                if img_cv is not None and img_cv.size > 0:
-                    # Convert from BGR to RGB
-                    img_cv = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-                    # Convert to PIL
-                    return Image.fromarray(img_cv)
+        return future.result()
+    except (FileNotFoundError, ValueError) as e:
+        _report('error', str(e))
     except Exception as e:
-        errors.append(f"OpenCV method failed: {str(e)}")
+        _report('error', f"Error loading model: {str(e)}")
 
-    # If we got here, all methods failed
-    if errors:
-        st.error(f"All image loading methods failed:\n" + "\n".join(errors))
+    # Forget the failed attempt so the next call retries the load
+    with _preload_lock:
+        if _preload_futures.get(key) is future:
+            del _preload_futures[key]
     return None
 
-def analyze_image(image_data: Union[str, Image.Image, BinaryIO]) -> Tuple[Optional[bool], Optional[float]]:
-    """Analyze an image using the trained model.
+def load_image_multiple_methods(image_data: Union[str, Image.Image, BinaryIO, Upload],
+                                min_size: Optional[Tuple[int, int]] = None) -> Optional[Image.Image]:
+    """Decode an image from memory, trying PIL and then OpenCV.
 
     Args:
-        image_data: PIL Image object, file-like object, or path to image file
+        image_data: PIL Image object, file-like object, path to image file, or Upload
+        min_size: (width, height) the image will be resized to; large JPEGs are
+            then decoded at a reduced scale that still covers it
 
     Returns:
-        tuple: (health_status: bool, confidence: float)
+        Optional[Image.Image]: The decoded RGB PIL Image, or None if every decoder fails
     """
     try:
-        # Load the model
-        model = load_model()
-        if model is None:
-            return None, None
+        if isinstance(image_data, Upload):
+            # Reuse the upload's decode when it already covers min_size
+            return image_data.image(min_size)
+        return decode_image(image_data, min_size).image
+    except (ImageDecodeError, TypeError, OSError) as e:
+        _report('error', f"All image loading methods failed: {str(e)}")
+        return None
+
+def prepare_image_array(image_data: Union[str, Image.Image, BinaryIO],
+                        input_size: Tuple[int, int] = MODEL_INPUT_SIZE) -> np.ndarray:
+    """Load, resize and normalize a single image for the model.
+
+    Args:
+        image_data: PIL Image object, file-like object, or path to image file
+        input_size: (width, height) to resize to; see ``model_input_size``
 
-        # Try multiple methods to load the image
-        image = load_image_multiple_methods(image_data)
+    Returns:
+        np.ndarray: float32 array of shape (height, width, 3) scaled to [0, 1]
 
+    Raises:
+        ValueError: If the image could not be loaded with any method
+    """
+    # Decode at the smallest JPEG scale that still covers the model input
+    # (decode time is recorded by the decoder, so reused decodes add no sample)
+    image = load_image_multiple_methods(image_data, tuple(input_size))
+
+    with span('validation'):
         # Verify image was loaded successfully
         if image is None:
-            st.error("Failed to load image with any method")
-            return None, None
+            raise ValueError("Failed to load image with any method")
 
         # Convert to RGB if needed
         if image.mode != 'RGB':
             image = image.convert('RGB')
 
-        # Resize image to match model's expected input size
-        image = image.resize((224, 224))
+    # Resize image to match model's expected input size
+    with span('resize'):
+        image = image.resize(tuple(input_size))
+
+    # Convert to numpy array and normalize
+    with span('normalize'):
+        img_array = np.asarray(image, dtype=np.float32)
+        img_array /= 255.0
+    return img_array
 
-        # Convert to numpy array and normalize
-        img_array = np.array(image)
-        img_array = img_array.astype('float32') / 255.0
+def prediction_to_result(prediction_value: float, threshold: float = 0.5) -> Tuple[bool, float]:
+    """Convert a raw sigmoid output into (health_status, confidence)."""
+    health_status = prediction_value > threshold
+    confidence = prediction_value if health_status else 1 - prediction_value
+    return health_status, confidence
+
+def decision_threshold(model) -> float:
+    """Return the healthy/unhealthy cut-off for a model (from registry metadata, else 0.5)."""
+    return float(getattr(model, 'threshold', 0.5))
+
+def analyze_image(image_data: Union[str, Image.Image, BinaryIO], return_gradcam: bool = False,
+                  tier: Optional[str] = None):
+    """Analyze an image using the trained model.
+
+    Args:
+        image_data: PIL Image object, file-like object, or path to image file
+        return_gradcam: Also return a Grad-CAM map of the regions that drove
+            the verdict, computed in the same forward+backward pass as the
+            prediction. Only Keras models can explain; other backends return
+            None for the map.
+        tier: 'fast' or 'accurate' family member to use instead of the main
+            model (see ``load_model``)
+
+    Returns:
+        tuple: (health_status: bool, confidence: float), or with
+        ``return_gradcam`` (health_status, confidence, gradcam) where gradcam
+        is a float32 array in [0, 1] at the last conv layer's resolution, or
+        None when the cascade stage answered without running the CNN
+    """
+    failed = (None, None, None) if return_gradcam else (None, None)
+    tier = _resolve_tier(tier)
+    try:
+        model = load_model(tier=tier)
+        if model is None:
+            return failed
+        # Family members each expect their own resolution
+        input_size = model_input_size(model)
+
+        try:
+            img_array = prepare_image_array(image_data, input_size)
+        except ValueError as e:
+            _report('error', str(e))
+            return failed
 
         # Add batch dimension
         img_array = np.expand_dims(img_array, axis=0)
 
-        # Make prediction
-        prediction = model.predict(img_array, verbose=0)
+        # Let the cheap cascade stage answer obvious images without running the CNN; it is
+        # tuned against the main model, so tiers always run their own model
+        if not tier:
+            from .cascade import answer_confident
+            answered = answer_confident(img_array, decision_threshold(model))[0]
+            if answered is not None:
+                return answered + (None,) if return_gradcam else answered
+
+        # Make prediction, with the explanation from the same pass when requested
+        with span('inference'):
+            if return_gradcam and hasattr(model, 'explain'):
+                prediction, gradcams = model.explain(img_array, decision_threshold(model))
+                gradcam = gradcams[0]
+            else:
+                prediction = model.predict(img_array, verbose=0)
+                gradcam = None
 
         # Get health status and confidence
-        prediction_value = float(prediction[0][0])
-        health_status = prediction_value > 0.5
-        confidence = prediction_value if health_status else 1 - prediction_value
-
-        return health_status, confidence
+        result = prediction_to_result(float(prediction[0][0]), decision_threshold(model))
+        return result + (gradcam,) if return_gradcam else result
 
     except Exception as e:
-        st.error(f"Error analyzing image: {str(e)}")
+        _report('error', f"Error analyzing image: {str(e)}")
         # Reset file pointer if there's an error and it's a file-like object
         if not isinstance(image_data, (str, Image.Image)) and hasattr(image_data, 'seek'):
             image_data.seek(0)
-        return None, None
+        return failed
+
+def analyze_images(images: Sequence[Union[str, Image.Image, BinaryIO]],
+                   batch_size: int = DEFAULT_BATCH_SIZE,
+                   return_errors: bool = False,
+                   tier: Optional[str] = None):
+    """Analyze several images with a single batched forward pass.
+
+    Every image is decoded and preprocessed into one stacked float32 tensor,
+    which is then scored by one ``model.predict`` call. Images that fail to
+    load are reported individually and do not abort the rest of the batch.
+
+    Args:
+        images: Sequence of PIL Images, file-like objects, or image file paths
+        batch_size: Number of images per forward pass inside ``model.predict``
+        return_errors: Also return the per-image error messages
+        tier: 'fast' or 'accurate' family member to use instead of the main
+            model (see ``load_model``)
+
+    Returns:
+        list: One (health_status, confidence) tuple per input image, in input
+        order. Images that could not be analyzed yield (None, None). With
+        ``return_errors`` a (results, errors) tuple is returned instead, where
+        errors holds one message or None per input image.
+
+    Raises:
+        InferenceBusyError: If the inference gate had no free slot for the forward pass
+    """
+    results: List[Tuple[Optional[bool], Optional[float]]] = [(None, None)] * len(images)
+    errors: List[Optional[str]] = [None] * len(images)
+
+    def finish():
+        return (results, errors) if return_errors else results
+
+    if not images:
+        return finish()
+
+    tier = _resolve_tier(tier)
+    model = load_model(tier=tier)
+    if model is None:
+        errors = ["Model is not available"] * len(images)
+        return finish()
+    input_size = model_input_size(model)
+
+    # Decode and preprocess straight into one preallocated batch tensor
+    batch = np.empty((len(images), input_size[1], input_size[0], 3), dtype=np.float32)
+    valid_indices = []
+    for index, image_data in enumerate(images):
+        try:
+            batch[len(valid_indices)] = prepare_image_array(image_data, input_size)
+            valid_indices.append(index)
+        except Exception as e:
+            errors[index] = str(e)
+            if not isinstance(image_data, (str, Image.Image)) and hasattr(image_data, 'seek'):
+                image_data.seek(0)
+
+    failed = [f"Image {index + 1}: {error}" for index, error in enumerate(errors) if error]
+    if failed:
+        _report('warning', "Some images could not be analyzed:\n" + "\n".join(failed))
+
+    if not valid_indices:
+        return finish()
+    batch = batch[:len(valid_indices)]
+
+    # Answer obvious images with the cheap cascade stage and only send the rest to the CNN
+    if not tier:
+        from .cascade import answer_confident
+        answered = answer_confident(batch, decision_threshold(model))
+        for index, result in zip(valid_indices, answered):
+            if result is not None:
+                results[index] = result
+        escalated = np.array([result is None for result in answered], dtype=bool)
+        valid_indices = [index for index, is_escalated in zip(valid_indices, escalated) if is_escalated]
+        batch = batch[escalated]
+        if not valid_indices:
+            return finish()
+
+    try:
+        with span('inference'):
+            predictions = model.predict(batch, batch_size=max(1, batch_size), verbose=0)
+    except InferenceBusyError:
+        # Let servers turn a full inference gate into "busy, retry" instead of per-image errors
+        raise
+    except Exception as e:
+        _report('error', f"Error analyzing images: {str(e)}")
+        for index in valid_indices:
+            errors[index] = str(e)
+        return finish()
+
+    for index, prediction in zip(valid_indices, predictions):
+        results[index] = prediction_to_result(float(prediction[0]), decision_threshold(model))
+
+    return finish()
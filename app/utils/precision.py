@@ -0,0 +1,149 @@
+"""Reduced-precision serving modes for the Keras model.
+
+``bfloat16`` stores the weights and runs the Conv2D/Dense stack in bfloat16,
+which halves weight memory and bandwidth and uses the AVX512_BF16/AMX units on
+CPUs that have them. On other CPUs ``float16`` is used instead. That mode is
+storage-only compression: the exported weight file is half size, but the
+weights are upcast to float32 when loaded and the model computes in float32,
+so it saves disk and load I/O, not runtime memory or compute. Either mode is
+only enabled if it passed the accuracy check recorded by
+``train_model.py --check-precision`` for the current model file, which runs
+on the held-out split.
+"""
+import json
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_PRECISIONS = ('float32', 'bfloat16', 'float16')
+
+# How each mode is shown to users; float16 only changes how the weights are stored
+PRECISION_LABELS = {
+    'float32': 'float32',
+    'bfloat16': 'bfloat16',
+    'float16': 'float16 storage-only, computed in float32',
+}
+
+# Gate thresholds: reduced-precision labels must agree with float32 on nearly every image
+MIN_LABEL_AGREEMENT = 0.99
+MAX_ACCURACY_DROP = 0.01
+
+def cpu_supports_bfloat16() -> bool:
+    """Return True if the CPU advertises native bfloat16 instructions (Linux only)."""
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    flags = set(line.split(':', 1)[1].split())
+                    return bool(flags & {'avx512_bf16', 'amx_bf16'})
+    except OSError:
+        pass
+    return False
+
+def resolve_precision(requested: Optional[str]) -> str:
+    """Map a requested precision to the one this machine should actually run.
+
+    Raises:
+        ValueError: If the precision is unknown
+    """
+    precision = (requested or 'float32').lower()
+    if precision not in SUPPORTED_PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'. Choose one of: {', '.join(SUPPORTED_PRECISIONS)}")
+    if precision == 'bfloat16' and not cpu_supports_bfloat16():
+        logger.info("CPU has no native bfloat16 support; using float16 storage-only compression "
+                    "(weights computed in float32) instead")
+        return 'float16'
+    return precision
+
+def to_bfloat16(model):
+    """Clone a Keras model with bfloat16 weights and compute, keeping the output layer in float32."""
+    import tensorflow as tf
+
+    output_layer = model.layers[-1]
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        config['dtype'] = 'float32' if layer is output_layer else 'bfloat16'
+        return layer.__class__.from_config(config)
+
+    clone = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    clone.set_weights(model.get_weights())
+    return clone
+
+def round_weights_to_float16(model):
+    """Round a model's weights through float16 in place, matching a float16-stored artifact."""
+    model.set_weights([weight.astype(np.float16).astype(weight.dtype) for weight in model.get_weights()])
+    return model
+
+def build_precision_model(model, precision: str):
+    """Return the serving variant of ``model`` for the given precision.
+
+    ``float16`` only rounds the weights through float16 (matching the
+    half-size artifact); the returned model still holds and computes in float32.
+    """
+    if precision == 'bfloat16':
+        return to_bfloat16(model)
+    if precision == 'float16':
+        import tensorflow as tf
+        clone = tf.keras.models.clone_model(model)
+        clone.set_weights(model.get_weights())
+        return round_weights_to_float16(clone)
+    return model
+
+def file_fingerprint(path: str) -> str:
+    """Return a short content hash identifying a model file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def run_precision_check(model, X: np.ndarray, y: np.ndarray, precision: str) -> Dict[str, Any]:
+    """Compare a reduced-precision variant against float32 on labelled images.
+
+    Args:
+        model: Trained float32 Keras model
+        X: Normalized float32 held-out images (never the training images)
+        y: Binary labels (1 = healthy)
+        precision: 'bfloat16' or 'float16'
+
+    Returns:
+        dict: Agreement and accuracy figures plus a ``passed`` flag
+    """
+    reference = model.predict(X, verbose=0)[:, 0]
+    reduced = build_precision_model(model, precision).predict(X, verbose=0)[:, 0].astype(np.float32)
+
+    reference_accuracy = float(np.mean((reference > 0.5) == y))
+    reduced_accuracy = float(np.mean((reduced > 0.5) == y))
+    agreement = float(np.mean((reference > 0.5) == (reduced > 0.5)))
+    return {
+        'precision': precision,
+        'images': int(len(X)),
+        'label_agreement': agreement,
+        'max_abs_diff': float(np.max(np.abs(reference - reduced))),
+        'float32_accuracy': reference_accuracy,
+        'accuracy': reduced_accuracy,
+        'passed': agreement >= MIN_LABEL_AGREEMENT and reference_accuracy - reduced_accuracy <= MAX_ACCURACY_DROP,
+    }
+
+def save_precision_gate(gate_path: str, model_path: str, results: Dict[str, Dict[str, Any]]):
+    """Record precision check results for the current model file."""
+    with open(gate_path, 'w') as f:
+        json.dump({'model_fingerprint': file_fingerprint(model_path), 'checks': results}, f, indent=2)
+
+def precision_gate_passed(gate_path: str, model_path: str, precision: str) -> bool:
+    """Return True if ``precision`` passed its accuracy check for this exact model file."""
+    if precision == 'float32':
+        return True
+    try:
+        with open(gate_path, 'r') as f:
+            gate = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if gate.get('model_fingerprint') != file_fingerprint(model_path):
+        return False
+    return bool(gate.get('checks', {}).get(precision, {}).get('passed'))
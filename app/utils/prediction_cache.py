@@ -0,0 +1,299 @@
+"""Content-addressed cache of model predictions keyed on raw upload bytes."""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+import streamlit as st
+
+from .model_utils import DEFAULT_BACKEND, DEFAULT_PRECISION, get_model_path
+from .model_registry import REGISTRY_DIR, STATE_FILENAME, active_threshold
+from .upload import Upload
+
+# Optional directory for the on-disk tier; leave unset to keep the cache in memory only
+CACHE_DIR = os.environ.get('PLANT_CARE_CACHE_DIR')
+
+# Subdirectory of the disk directory the cache owns; nothing outside it is ever deleted
+CACHE_SUBDIR = 'plant_care_predictions'
+
+# Names of the per-fingerprint entry directories the cache creates (see ``model_fingerprint``)
+_FINGERPRINT_NAME = re.compile(r'[0-9a-f]{16}')
+
+def hash_bytes(data: bytes) -> str:
+    """Return the SHA-256 hex digest of raw image bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+def _cache_key(image: Union[bytes, Upload]) -> str:
+    """Key for raw bytes, reusing an Upload's digest so it is computed once per upload."""
+    return image.hash if isinstance(image, Upload) else hash_bytes(image)
+
+def _stat_key(path: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """(size, mtime, inode) of a file, or None when it does not exist."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+class PredictionCache:
+    """Two-tier (memory LRU + optional disk) cache of (health_status, confidence) results.
+
+    Entries are keyed by the SHA-256 of the upload bytes and namespaced by a
+    fingerprint of everything that decides the answer: the model file, its
+    decision threshold, the backend and precision it runs at and the cascade
+    stage in front of it. Changing any of them invalidates every cached
+    prediction automatically. A Grad-CAM map computed with a prediction can
+    be stored alongside it under the same key.
+
+    The fingerprint is cached. Lookups only stat the files it is derived
+    from (the model, the registry state file and the cascade stage file) and
+    compare the backend and precision, so a registry swap, a retrained model
+    or a backend/precision change is picked up without reading the registry
+    on every ``get`` and ``put``.
+
+    The disk tier lives in a ``plant_care_predictions`` subdirectory of
+    ``disk_dir``, and pruning only removes the fingerprint-named directories
+    the cache created there.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[str] = None,
+                 model_path: Optional[str] = None, backend: Optional[str] = None,
+                 precision: Optional[str] = None):
+        """
+        Args:
+            max_entries: Capacity of the memory tier
+            disk_dir: Directory for the disk tier, or None to cache in memory only
+            model_path: Model file the results come from. None follows
+                ``get_model_path()`` (the registry's active version when there
+                is one) and includes the cascade stage in the fingerprint.
+            backend: Backend the results are computed with; defaults to PLANT_CARE_BACKEND
+            precision: Precision the results are computed at; defaults to PLANT_CARE_PRECISION
+        """
+        self.max_entries = max(1, max_entries)
+        self.disk_dir = os.path.join(disk_dir, CACHE_SUBDIR) if disk_dir else None
+        self.model_path = model_path
+        self.backend = (backend or DEFAULT_BACKEND).lower()
+        # Reduced precision only applies to the Keras backend
+        self.precision = (precision or DEFAULT_PRECISION).lower() if self.backend == 'keras' else 'float32'
+
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        self._gradcams: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._model_stat = None
+        self._fingerprint = None
+        self._resolved_path: Optional[str] = None
+        self._watch_key = None
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    def _resolution_key(self) -> Tuple:
+        """Stat-only signature of what decides which model, threshold and stage are served."""
+        key = (self.backend, self.precision)
+        if self.model_path is None:
+            from .cascade import CASCADE_PATH
+            key += (_stat_key(os.path.join(REGISTRY_DIR, STATE_FILENAME)), _stat_key(CASCADE_PATH))
+        return key
+
+    def model_fingerprint(self) -> Optional[str]:
+        """Return a hash of everything that decides a prediction, recomputed only when it changes."""
+        # Taken before resolving, so a swap that lands mid-resolution is seen on the next call
+        resolution_key = self._resolution_key()
+        with self._lock:
+            resolved_path, watched, fingerprint = self._resolved_path, self._watch_key, self._fingerprint
+        if (resolution_key, _stat_key(resolved_path)) == watched:
+            return fingerprint
+
+        model_path = self.model_path or get_model_path(self.backend)
+        try:
+            stat = os.stat(model_path)
+        except OSError:
+            return None
+
+        # Cached labels also depend on the decision threshold stored with a registry version,
+        # and images the cascade stage answers get its verdict instead of the CNN's
+        stage = None
+        if self.model_path is None:
+            from .cascade import get_cascade_stage
+            stage = get_cascade_stage()
+        threshold = active_threshold() if self.model_path is None else 0.5
+        watch_key = (resolution_key, (stat.st_size, stat.st_mtime_ns, stat.st_ino))
+        stat_key = watch_key[1] + (threshold, id(stage), self.backend, self.precision)
+        with self._lock:
+            if stat_key == self._model_stat:
+                self._resolved_path = model_path
+                self._watch_key = watch_key
+                return self._fingerprint
+
+        digest = hashlib.sha256()
+        with open(model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(repr((threshold, self.backend, self.precision)).encode())
+        stage_config = None if stage is None else {key: value for key, value in stage.to_dict().items()
+                                                   if key != 'validation'}
+        digest.update(json.dumps(stage_config, sort_keys=True).encode())
+        fingerprint = digest.hexdigest()[:16]
+
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                # Model changed: drop every in-memory prediction made by the old one
+                self._entries.clear()
+                self._gradcams.clear()
+            self._model_stat = stat_key
+            self._fingerprint = fingerprint
+            self._resolved_path = model_path
+            self._watch_key = watch_key
+        self._prune_disk(fingerprint)
+        return fingerprint
+
+    def get(self, image_bytes: Union[bytes, Upload]) -> Optional[Tuple[bool, float]]:
+        """Look up a cached prediction for the given upload bytes (or Upload)."""
+        fingerprint = self.model_fingerprint()
+        if fingerprint is None:
+            return None
+
+        key = _cache_key(image_bytes)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return result
+
+        result = self._read_disk(fingerprint, key)
+        with self._lock:
+            if result is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._store(key, result)
+        return result
+
+    def get_gradcam(self, image_bytes: Union[bytes, Upload]) -> Optional[np.ndarray]:
+        """Look up the Grad-CAM map cached with the prediction for the given upload bytes."""
+        fingerprint = self.model_fingerprint()
+        if fingerprint is None:
+            return None
+
+        key = _cache_key(image_bytes)
+        with self._lock:
+            gradcam = self._gradcams.get(key)
+            if gradcam is not None or key not in self._entries or not self.disk_dir:
+                return gradcam
+
+        try:
+            gradcam = np.load(self._disk_path(fingerprint, key, '.gradcam.npy'))
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._gradcams[key] = gradcam
+        return gradcam
+
+    def put(self, image_bytes: Union[bytes, Upload], result: Tuple[bool, float],
+            gradcam: Optional[np.ndarray] = None):
+        """Cache a prediction, and optionally its Grad-CAM map, for the given upload bytes."""
+        fingerprint = self.model_fingerprint()
+        if fingerprint is None:
+            return
+
+        key = _cache_key(image_bytes)
+        result = (bool(result[0]), float(result[1]))
+        if gradcam is not None:
+            gradcam = np.asarray(gradcam, dtype=np.float32)
+        with self._lock:
+            self._store(key, result)
+            if gradcam is not None:
+                self._gradcams[key] = gradcam
+        self._write_disk(fingerprint, key, result)
+        if gradcam is not None:
+            self._write_gradcam(fingerprint, key, gradcam)
+
+    def clear(self):
+        """Drop every cached prediction from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._gradcams.clear()
+        self._prune_disk(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current memory-tier size."""
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "model_fingerprint": self._fingerprint,
+            }
+
+    def _store(self, key: str, result: Tuple[bool, float]):
+        """Insert into the memory tier, evicting the least recently used entry. Caller holds the lock."""
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._gradcams.pop(evicted, None)
+
+    def _disk_path(self, fingerprint: str, key: str, suffix: str = '.json') -> str:
+        return os.path.join(self.disk_dir, fingerprint, key[:2], f"{key}{suffix}")
+
+    def _read_disk(self, fingerprint: str, key: str) -> Optional[Tuple[bool, float]]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(fingerprint, key), 'r') as f:
+                entry = json.load(f)
+            return bool(entry["health_status"]), float(entry["confidence"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, fingerprint: str, key: str, result: Tuple[bool, float]):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(fingerprint, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial entry
+            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), delete=False, suffix='.tmp') as tmp_file:
+                json.dump({"health_status": result[0], "confidence": result[1]}, tmp_file)
+            os.replace(tmp_file.name, path)
+        except OSError:
+            pass
+
+    def _write_gradcam(self, fingerprint: str, key: str, gradcam: np.ndarray):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(fingerprint, key, '.gradcam.npy')
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(path), delete=False, suffix='.tmp') as tmp_file:
+                np.save(tmp_file, gradcam)
+            os.replace(tmp_file.name, path)
+        except OSError:
+            pass
+
+    def _prune_disk(self, fingerprint: Optional[str]):
+        """Remove on-disk entries written under other fingerprints (all of them for None)."""
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            # Only touch entry directories this cache created
+            if name != fingerprint and _FINGERPRINT_NAME.fullmatch(name) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+@st.cache_resource
+def get_prediction_cache(max_entries: int = 256) -> PredictionCache:
+    """Return the process-wide prediction cache shared by every Streamlit session."""
+    return PredictionCache(max_entries=max_entries, disk_dir=CACHE_DIR)
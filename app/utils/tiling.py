@@ -0,0 +1,174 @@
+"""Tiled sliding-window inference for high-resolution photos.
+
+Instead of squashing a large photo down to the model's input size (224x224
+for the main model), the full-resolution image is cut into overlapping tiles
+of that size which are scored
+in large batches. The image-level verdict comes from the most unhealthy tiles
+(so a small lesion is not averaged away by healthy leaf area), and the
+per-tile scores form an unhealthy heatmap that can be overlaid on the photo.
+The tile count is capped: larger images are downscaled just enough for the
+grid to fit, which keeps latency bounded.
+"""
+import math
+import logging
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from .timing import span
+from .model_utils import (MODEL_INPUT_SIZE, DEFAULT_BATCH_SIZE, load_model, load_image_multiple_methods,
+                          model_input_size, prediction_to_result, decision_threshold, _report)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TILE_STRIDE = 112
+DEFAULT_MAX_TILES = 64
+
+# Fraction of the most unhealthy tiles averaged into the image-level score
+TOP_TILE_FRACTION = 0.1
+
+# Heatmaps are stored at 1/HEATMAP_DOWNSAMPLE of the tiled image resolution
+HEATMAP_DOWNSAMPLE = 8
+
+def _positions(length: int, tile: int, stride: int) -> List[int]:
+    """Tile offsets along one axis, always including a tile flush with the far edge."""
+    positions = list(range(0, length - tile + 1, stride))
+    if positions[-1] != length - tile:
+        positions.append(length - tile)
+    return positions
+
+def plan_tiles(width: int, height: int, stride: int = DEFAULT_TILE_STRIDE,
+               max_tiles: int = DEFAULT_MAX_TILES,
+               tile_size: Tuple[int, int] = MODEL_INPUT_SIZE) -> Tuple[float, List[int], List[int]]:
+    """Choose a scale and the tile grid for an image.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        stride: Pixels between neighbouring tiles (smaller means more overlap)
+        max_tiles: Upper bound on the number of tiles
+        tile_size: (width, height) of one tile, i.e. the model input size
+
+    Returns:
+        tuple: (scale, x_offsets, y_offsets) where the offsets apply to the
+        image after resizing it by ``scale``
+    """
+    tile_w, tile_h = tile_size
+    stride = max(1, min(stride, tile_w, tile_h))
+    max_tiles = max(1, max_tiles)
+
+    # Never tile below the model input size
+    scale = max(tile_w / width, tile_h / height, 1.0) if min(width, height) < min(tile_w, tile_h) else 1.0
+    while True:
+        scaled_w = max(tile_w, round(width * scale))
+        scaled_h = max(tile_h, round(height * scale))
+        xs, ys = _positions(scaled_w, tile_w, stride), _positions(scaled_h, tile_h, stride)
+        if len(xs) * len(ys) <= max_tiles or (scaled_w == tile_w and scaled_h == tile_h):
+            return scale, xs, ys
+        # Shrink just enough for the grid to fit; the loop handles rounding and edge tiles
+        scale *= min(0.95, math.sqrt(max_tiles / (len(xs) * len(ys))))
+
+def analyze_image_tiled(image_data: Union[str, Image.Image, BinaryIO],
+                        stride: int = DEFAULT_TILE_STRIDE,
+                        max_tiles: int = DEFAULT_MAX_TILES,
+                        batch_size: int = DEFAULT_BATCH_SIZE,
+                        model=None,
+                        tier: Optional[str] = None) -> Tuple[Optional[bool], Optional[float], Optional[np.ndarray]]:
+    """Analyze a high-resolution image tile by tile.
+
+    Args:
+        image_data: PIL Image object, file-like object, or path to image file
+        stride: Pixels between neighbouring tiles
+        max_tiles: Cap on the number of tiles; larger images are downscaled to fit
+        batch_size: Tiles per forward pass
+        model: Model with a Keras-style ``predict``; defaults to ``load_model(tier=tier)``
+        tier: 'fast' or 'accurate' family member to use when ``model`` is not
+            given; tiles are cut at that member's input size
+
+    Returns:
+        tuple: (health_status: bool, confidence: float, heatmap: np.ndarray),
+        where heatmap holds the mean unhealthy probability of the tiles
+        covering each region of the image, or (None, None, None) on failure
+    """
+    # No cascade here: its whole-image color summary is exactly what misses the small
+    # lesions tiling is for, so every tile reaches the CNN
+    try:
+        model = model or load_model(tier=tier)
+        if model is None:
+            return None, None, None
+        tile_w, tile_h = model_input_size(model)
+
+        image = load_image_multiple_methods(image_data)
+        with span('validation'):
+            if image is None:
+                raise ValueError("Failed to load image with any method")
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+
+        scale, xs, ys = plan_tiles(image.width, image.height, stride, max_tiles, (tile_w, tile_h))
+        if scale != 1.0:
+            with span('resize'):
+                image = image.resize((max(tile_w, round(image.width * scale)),
+                                      max(tile_h, round(image.height * scale))), Image.BILINEAR)
+        pixels = np.asarray(image)
+
+        # Cut every tile straight into one preallocated, normalized batch
+        offsets = [(x, y) for y in ys for x in xs]
+        with span('normalize'):
+            tiles = np.empty((len(offsets), tile_h, tile_w, 3), dtype=np.float32)
+            for index, (x, y) in enumerate(offsets):
+                tiles[index] = pixels[y:y + tile_h, x:x + tile_w]
+            tiles /= 255.0
+
+        with span('inference'):
+            healthy = model.predict(tiles, batch_size=max(1, batch_size), verbose=0)[:, 0]
+        unhealthy = 1.0 - healthy
+
+        # Image-level score: mean of the most unhealthy tiles, so small lesions still count
+        top_count = max(1, math.ceil(len(unhealthy) * TOP_TILE_FRACTION))
+        image_unhealthy = float(np.mean(np.sort(unhealthy)[-top_count:]))
+        health_status, confidence = prediction_to_result(1.0 - image_unhealthy, decision_threshold(model))
+
+        # Average overlapping tile scores into a coarse heatmap
+        heat_h = -(-pixels.shape[0] // HEATMAP_DOWNSAMPLE)
+        heat_w = -(-pixels.shape[1] // HEATMAP_DOWNSAMPLE)
+        heat_sum = np.zeros((heat_h, heat_w), dtype=np.float32)
+        heat_count = np.zeros((heat_h, heat_w), dtype=np.float32)
+        for (x, y), score in zip(offsets, unhealthy):
+            top, left = y // HEATMAP_DOWNSAMPLE, x // HEATMAP_DOWNSAMPLE
+            bottom = -(-(y + tile_h) // HEATMAP_DOWNSAMPLE)
+            right = -(-(x + tile_w) // HEATMAP_DOWNSAMPLE)
+            heat_sum[top:bottom, left:right] += score
+            heat_count[top:bottom, left:right] += 1
+        heatmap = heat_sum / np.maximum(heat_count, 1)
+
+        logger.info("Scored %d tiles (%dx%d grid, scale %.2f)", len(offsets), len(xs), len(ys), scale)
+        return health_status, confidence, heatmap
+    except Exception as e:
+        _report('error', f"Error analyzing image: {str(e)}")
+        if not isinstance(image_data, (str, Image.Image)) and hasattr(image_data, 'seek'):
+            image_data.seek(0)
+        return None, None, None
+
+def heatmap_overlay(image: Union[Image.Image, np.ndarray], heatmap: np.ndarray,
+                    opacity: float = 0.55) -> Image.Image:
+    """Blend an unhealthy heatmap over an image, from transparent (healthy) to red (unhealthy).
+
+    Args:
+        image: Image the heatmap was computed for
+        heatmap: Values in [0, 1], any resolution; it is stretched over the image
+        opacity: Blend strength where the heatmap is 1
+
+    Returns:
+        Image.Image: RGB overlay at the image's resolution
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(np.asarray(image))
+    image = image.convert('RGB')
+
+    heat = Image.fromarray(np.clip(heatmap * 255, 0, 255).astype(np.uint8)).resize(image.size, Image.BILINEAR)
+    alpha = (np.asarray(heat, dtype=np.float32) / 255.0 * opacity)[..., None]
+    red = np.array([220, 38, 38], dtype=np.float32)
+    blended = np.asarray(image, dtype=np.float32) * (1 - alpha) + red * alpha
+    return Image.fromarray(blended.astype(np.uint8))
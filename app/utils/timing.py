@@ -0,0 +1,161 @@
+"""Lightweight per-stage latency spans for the upload-to-result hot path.
+
+Wrap a stage in ``with span('decode'):`` (or call ``record`` with a measured
+duration) and its latency is added to a per-stage histogram. Snapshots give
+count, mean and p50/p95/p99 per stage, as a dict or as Prometheus text.
+
+Timing is off unless PLANT_CARE_TIMING=1 (or ``enable()`` is called). While
+off, ``span`` returns one shared no-op context manager and ``record`` returns
+immediately, so instrumented code pays only a flag check.
+"""
+import os
+import time
+import bisect
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# Stages instrumented along the hot path, in pipeline order
+STAGES = ('decode', 'validation', 'resize', 'normalize', 'cascade', 'queue_wait', 'inference',
+          'render')
+
+# Recent samples kept per stage for percentile estimates
+RESERVOIR_SIZE = 2048
+
+# Cumulative histogram buckets in seconds for the Prometheus output
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get('PLANT_CARE_TIMING', '0') == '1'
+
+class LatencyHistogram:
+    """Thread-safe latency record for one stage: buckets, totals and recent samples."""
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE):
+        self._lock = threading.Lock()
+        self._bucket_counts = [0] * (len(BUCKETS) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._recent: Deque[float] = deque(maxlen=reservoir_size)
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._bucket_counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+            self._count += 1
+            self._sum += seconds
+            self._max = max(self._max, seconds)
+            self._recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return count, sum, mean, max, p50/p95/p99 (seconds) and cumulative bucket counts."""
+        with self._lock:
+            recent = sorted(self._recent)
+            bucket_counts = list(self._bucket_counts)
+            count, total, maximum = self._count, self._sum, self._max
+
+        def percentile(fraction):
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(round(fraction * (len(recent) - 1))))]
+
+        cumulative, running = [], 0
+        for bucket_count in bucket_counts:
+            running += bucket_count
+            cumulative.append(running)
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'max': maximum,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'buckets': dict(zip([str(bound) for bound in BUCKETS] + ['+Inf'], cumulative)),
+        }
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+def enable(enabled: bool = True):
+    """Turn timing on or off at runtime."""
+    global _enabled
+    _enabled = enabled
+
+def is_enabled() -> bool:
+    return _enabled
+
+def record(stage: str, seconds: float):
+    """Add one measured duration to a stage's histogram (no-op while timing is off)."""
+    if not _enabled:
+        return
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(stage, LatencyHistogram())
+    histogram.observe(seconds)
+
+class _Span:
+    """Context manager timing one stage."""
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+class _NoopSpan:
+    """Shared do-nothing span returned while timing is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(stage: str):
+    """Time the enclosed block as ``stage``.
+
+    Example:
+        with span('inference'):
+            predictions = model.predict(batch)
+    """
+    return _Span(stage) if _enabled else _NOOP_SPAN
+
+def snapshot(stage: Optional[str] = None) -> Dict[str, Any]:
+    """Return per-stage latency statistics, or those of a single stage."""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    if stage is not None:
+        return histograms[stage].snapshot() if stage in histograms else LatencyHistogram().snapshot()
+    return {name: histogram.snapshot() for name, histogram in sorted(histograms.items())}
+
+def reset():
+    """Drop every recorded sample."""
+    with _histograms_lock:
+        _histograms.clear()
+
+def prometheus_text(metric: str = 'plant_care_stage_latency_seconds') -> str:
+    """Render all stage histograms in the Prometheus text exposition format."""
+    lines = [f"# HELP {metric} Latency of each stage of the upload-to-result path.",
+             f"# TYPE {metric} histogram"]
+    quantile_lines = [f"# HELP {metric}_quantile Recent p50/p95/p99 latency of each stage.",
+                      f"# TYPE {metric}_quantile gauge"]
+    for stage, stats in snapshot().items():
+        for bound, count in stats['buckets'].items():
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'{metric}_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+        lines.append(f'{metric}_count{{stage="{stage}"}} {stats["count"]}')
+        for name, quantile in (('p50', '0.5'), ('p95', '0.95'), ('p99', '0.99')):
+            quantile_lines.append(f'{metric}_quantile{{stage="{stage}",quantile="{quantile}"}} {stats[name]:.6f}')
+    return "\n".join(lines + quantile_lines) + "\n"
@@ -0,0 +1,123 @@
+"""Test-time augmentation (TTA) for more stable predictions on borderline images.
+
+One upload is expanded into K views (flips, small crops and small rotations)
+that are scored together in a single batched forward pass. The mean
+probability is used as the prediction and the standard deviation across the
+views is reported as its spread: a large spread means the result depends on
+framing and should be trusted less.
+"""
+from typing import BinaryIO, Callable, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from .timing import span
+from .model_utils import (load_model, model_input_size, prepare_image_array, prediction_to_result,
+                          decision_threshold, _report)
+
+DEFAULT_TTA_VIEWS = 8
+
+# Fraction of each side kept by the crop views and angle of the rotation views
+CROP_FRACTION = 0.9
+ROTATION_DEGREES = 10.0
+
+def _crop(img_array: np.ndarray, anchor: str) -> np.ndarray:
+    """Crop CROP_FRACTION of the image at ``anchor`` and resize back to the input size."""
+    import cv2
+
+    height, width = img_array.shape[:2]
+    crop_h, crop_w = int(height * CROP_FRACTION), int(width * CROP_FRACTION)
+    if anchor == 'center':
+        top, left = (height - crop_h) // 2, (width - crop_w) // 2
+    elif anchor == 'top_left':
+        top, left = 0, 0
+    else:
+        top, left = height - crop_h, width - crop_w
+    crop = np.ascontiguousarray(img_array[top:top + crop_h, left:left + crop_w])
+    return cv2.resize(crop, (width, height), interpolation=cv2.INTER_LINEAR)
+
+def _rotate(img_array: np.ndarray, degrees: float) -> np.ndarray:
+    """Rotate around the center, reflecting the border so no black corners appear."""
+    import cv2
+
+    height, width = img_array.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), degrees, 1.0)
+    return cv2.warpAffine(img_array, matrix, (width, height),
+                          flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT_101)
+
+# Views in the order they are used; the first K are taken for K views
+VIEW_TRANSFORMS: List[Tuple[str, Callable[[np.ndarray], np.ndarray]]] = [
+    ('original', lambda x: x),
+    ('horizontal_flip', lambda x: x[:, ::-1]),
+    ('center_crop', lambda x: _crop(x, 'center')),
+    ('rotate_left', lambda x: _rotate(x, ROTATION_DEGREES)),
+    ('rotate_right', lambda x: _rotate(x, -ROTATION_DEGREES)),
+    ('vertical_flip', lambda x: x[::-1]),
+    ('top_left_crop', lambda x: _crop(x, 'top_left')),
+    ('bottom_right_crop', lambda x: _crop(x, 'bottom_right')),
+    ('flipped_center_crop', lambda x: _crop(x[:, ::-1], 'center')),
+    ('flipped_rotate_left', lambda x: _rotate(np.ascontiguousarray(x[:, ::-1]), ROTATION_DEGREES)),
+]
+
+MAX_TTA_VIEWS = len(VIEW_TRANSFORMS)
+
+def make_views(img_array: np.ndarray, num_views: int = DEFAULT_TTA_VIEWS) -> np.ndarray:
+    """Build a batch of augmented views of one preprocessed image.
+
+    Args:
+        img_array: float32 array of shape (H, W, 3) from ``prepare_image_array``
+        num_views: Number of views, between 1 and MAX_TTA_VIEWS
+
+    Returns:
+        np.ndarray: float32 array of shape (num_views, H, W, 3)
+
+    Raises:
+        ValueError: If num_views is out of range
+    """
+    if not 1 <= num_views <= MAX_TTA_VIEWS:
+        raise ValueError(f"num_views must be between 1 and {MAX_TTA_VIEWS}")
+
+    views = np.empty((num_views,) + img_array.shape, dtype=np.float32)
+    for index, (_, transform) in enumerate(VIEW_TRANSFORMS[:num_views]):
+        views[index] = transform(img_array)
+    return views
+
+def aggregate_predictions(probabilities: np.ndarray, threshold: float = 0.5) -> Tuple[bool, float, float]:
+    """Combine per-view probabilities into (health_status, confidence, spread)."""
+    probabilities = np.asarray(probabilities, dtype=np.float32).reshape(-1)
+    health_status, confidence = prediction_to_result(float(np.mean(probabilities)), threshold)
+    return health_status, confidence, float(np.std(probabilities))
+
+def analyze_image_tta(image_data: Union[str, Image.Image, BinaryIO],
+                      num_views: int = DEFAULT_TTA_VIEWS,
+                      model=None,
+                      tier: Optional[str] = None) -> Tuple[Optional[bool], Optional[float], Optional[float]]:
+    """Analyze an image with test-time augmentation in one batched forward pass.
+
+    Args:
+        image_data: PIL Image object, file-like object, or path to image file
+        num_views: Number of augmented views to score (1 disables augmentation)
+        model: Model with a Keras-style ``predict``; defaults to ``load_model(tier=tier)``
+        tier: 'fast' or 'accurate' family member to use when ``model`` is not
+            given; views are built at that member's input size
+
+    Returns:
+        tuple: (health_status: bool, confidence: float, spread: float), where
+        spread is the standard deviation of the healthy probability across
+        views, or (None, None, None) if the image could not be analyzed
+    """
+    # No cascade here: TTA is the opt-in path for borderline photos, so every view reaches the CNN
+    try:
+        model = model or load_model(tier=tier)
+        if model is None:
+            return None, None, None
+
+        views = make_views(prepare_image_array(image_data, model_input_size(model)), num_views)
+        with span('inference'):
+            predictions = model.predict(views, batch_size=num_views, verbose=0)
+        return aggregate_predictions(predictions[:, 0], decision_threshold(model))
+    except Exception as e:
+        _report('error', f"Error analyzing image: {str(e)}")
+        if not isinstance(image_data, (str, Image.Image)) and hasattr(image_data, 'seek'):
+            image_data.seek(0)
+        return None, None, None
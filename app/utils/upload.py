@@ -0,0 +1,111 @@
+"""One uploaded image, decoded at most once and shared by every consumer.
+
+An ``Upload`` carries the raw bytes and computes each derived form lazily,
+at most once: the SHA-256 used by the prediction cache, the decoded image
+and, only if something goes wrong, the diagnostics report. The app, the
+prediction cache, ``analyze_image`` (and everything built on
+``prepare_image_array``) and the diagnostics tool all accept it directly, so
+one request never decodes or hashes the same bytes twice.
+"""
+import hashlib
+import threading
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+from .decoding import DecodedImage, ImageDecodeError, decode_image, read_image_bytes
+
+class Upload:
+    """Raw upload bytes plus lazily computed, cached derivatives.
+
+    Decodes are cached by the size they were requested for. A cached decode
+    serves any later request it covers (a full decode covers everything), so
+    decoding for the preview and then for the model input costs one decode.
+    A failed decode is cached too and raised again without retrying.
+    """
+
+    def __init__(self, data: bytes, name: Optional[str] = None, mime_type: Optional[str] = None):
+        """
+        Args:
+            data: Encoded image bytes
+            name: Original file name, for messages
+            mime_type: Content type reported by the client, if any
+        """
+        self.data = data
+        self.name = name
+        self.mime_type = mime_type
+        self._lock = threading.Lock()
+        self._hash: Optional[str] = None
+        self._decoded: Dict[Optional[Tuple[int, int]], DecodedImage] = {}
+        self._decode_error: Optional[ImageDecodeError] = None
+        self._diagnostics: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_file(cls, file: Union[str, BinaryIO]) -> 'Upload':
+        """Read an upload from a path or a file-like object such as a Streamlit UploadedFile."""
+        if isinstance(file, str):
+            return cls(read_image_bytes(file), name=file)
+        return cls(read_image_bytes(file), name=getattr(file, 'name', None),
+                   mime_type=getattr(file, 'type', None))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def hash(self) -> str:
+        """SHA-256 hex digest of the raw bytes (the prediction cache key)."""
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.data).hexdigest()
+        return self._hash
+
+    def decoded(self, min_size: Optional[Tuple[int, int]] = None) -> DecodedImage:
+        """Return the decoded image, decoding only if no cached decode covers ``min_size``.
+
+        Args:
+            min_size: (width, height) the caller will resize to, or None for full resolution
+
+        Raises:
+            ImageDecodeError: If the bytes cannot be decoded
+        """
+        min_size = tuple(min_size) if min_size else None
+        with self._lock:
+            if self._decode_error is not None:
+                raise self._decode_error
+            cached = self._covering_decode(min_size)
+            if cached is not None:
+                return cached
+            try:
+                decoded = decode_image(self.data, min_size)
+            except ImageDecodeError as e:
+                self._decode_error = e
+                raise
+            self._decoded[min_size] = decoded
+            return decoded
+
+    def _covering_decode(self, min_size: Optional[Tuple[int, int]]) -> Optional[DecodedImage]:
+        if min_size in self._decoded:
+            return self._decoded[min_size]
+        for decoded in self._decoded.values():
+            if decoded.reduction == 1:
+                return decoded
+            if min_size is not None:
+                width, height = decoded.size
+                if width >= min_size[0] and height >= min_size[1]:
+                    return decoded
+        return None
+
+    def image(self, min_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Return the decoded RGB PIL image (see ``decoded``)."""
+        return self.decoded(min_size).image
+
+    @property
+    def diagnostics(self) -> Dict[str, Any]:
+        """The ``diagnose_image`` report for these bytes, computed on first access."""
+        if self._diagnostics is None:
+            from .image_diagnostics import diagnose_image
+            self._diagnostics = diagnose_image(self)
+        return self._diagnostics
+
+    def __repr__(self):
+        return f"Upload(name={self.name!r}, size_bytes={self.size_bytes})"
@@ -0,0 +1,189 @@
+"""Multi-process inference with one model replica per worker process.
+
+A single Python process serializes image decoding under the GIL. This pool
+starts ``num_workers`` spawned processes, each loading the model once with
+its share of the CPU cores as intra-op threads, and spreads images across
+them. It can be used directly by batch scripts or, through its Keras-style
+``predict`` method, as the model behind the Streamlit micro-batch dispatcher.
+"""
+import io
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from . import model_utils, model_registry
+from .upload import Upload
+
+# Number of worker processes for the shared pool; 0 disables it
+POOL_WORKERS = int(os.environ.get('PLANT_CARE_WORKERS', '0'))
+
+_BatchResult = Tuple[List[Tuple[Optional[bool], Optional[float]]], List[Optional[str]]]
+
+def _init_worker(backend: Optional[str], intra_op_threads: int):
+    """Process initializer: pin thread counts, then load and warm this worker's model replica."""
+    # Cap OpenMP/oneDNN pools before TensorFlow is imported in this process
+    os.environ['OMP_NUM_THREADS'] = str(intra_op_threads)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(intra_op_threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    model_utils.set_inference_threads(intra_op=intra_op_threads, inter_op=1)
+    if model_utils.load_model(backend) is None:
+        raise RuntimeError("Worker could not load the model")
+
+def _worker_analyze(images: list, backend: Optional[str], batch_size: int) -> _BatchResult:
+    """Decode and score a chunk of images inside a worker process."""
+    images = [io.BytesIO(image) if isinstance(image, bytes) else image for image in images]
+    model = model_utils.load_model(backend)
+    if model is None:
+        return [(None, None)] * len(images), ["Model is not available"] * len(images)
+    return model_utils.analyze_images(images, batch_size=batch_size, return_errors=True)
+
+def _worker_predict(batch: np.ndarray, backend: Optional[str]) -> np.ndarray:
+    """Run the model on an already preprocessed array inside a worker process."""
+    model = model_utils.load_model(backend)
+    if model is None:
+        raise RuntimeError("Model is not available")
+    return model.predict(batch, verbose=0)
+
+def _to_picklable(image_data):
+    """Convert file-like uploads to bytes so they can be sent to another process."""
+    if isinstance(image_data, (str, bytes, Image.Image)):
+        return image_data
+    if isinstance(image_data, Upload):
+        # Workers decode in their own process, so only the raw bytes travel
+        return image_data.data
+    if hasattr(image_data, 'read'):
+        if hasattr(image_data, 'seek'):
+            image_data.seek(0)
+        data = image_data.read()
+        if hasattr(image_data, 'seek'):
+            image_data.seek(0)
+        return data
+    return image_data
+
+class InferencePool:
+    """Pool of worker processes that each hold their own model replica."""
+
+    def __init__(self, num_workers: Optional[int] = None, backend: Optional[str] = None,
+                 threads_per_worker: Optional[int] = None,
+                 batch_size: int = model_utils.DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            num_workers: Number of worker processes (default: CPU count)
+            backend: Model backend each worker loads (default: PLANT_CARE_BACKEND or 'keras')
+            threads_per_worker: Intra-op threads per worker; by default the
+                CPU cores are split evenly so workers do not oversubscribe them
+            batch_size: Images per forward pass inside each worker
+        """
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = max(1, num_workers or cpu_count)
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.backend = backend
+        self.batch_size = batch_size
+
+        # Spawn rather than fork: forking after TensorFlow has started is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(backend, self.threads_per_worker))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    @property
+    def input_shape(self):
+        width, height = model_utils.MODEL_INPUT_SIZE
+        tier = model_utils._resolve_tier(None)
+        if tier:
+            # Workers serve the PLANT_CARE_TIER family member, which has its own resolution
+            from .model_family import tier_metadata
+            width = height = tier_metadata(tier)['input_size']
+        return (None, height, width, 3)
+
+    @property
+    def threshold(self) -> float:
+        """Decision threshold of the model version the workers serve."""
+        if (self.backend or model_utils.DEFAULT_BACKEND).lower() != 'keras':
+            return 0.5
+        return model_registry.active_threshold()
+
+    def submit(self, images: Sequence) -> Future:
+        """Send one chunk of images to a worker; resolves to (results, errors)."""
+        return self._executor.submit(_worker_analyze, [_to_picklable(image) for image in images],
+                                     self.backend, self.batch_size)
+
+    def analyze_images(self, images: Sequence) -> List[Tuple[Optional[bool], Optional[float]]]:
+        """Analyze images across all workers and return results in input order."""
+        results = []
+        for chunk_results, _ in self.imap_batches(self._split(list(images))):
+            results.extend(chunk_results)
+        return results
+
+    def analyze_image(self, image_data) -> Tuple[Optional[bool], Optional[float]]:
+        """Analyze a single image on one of the workers."""
+        results, _ = self.submit([image_data]).result()
+        return results[0]
+
+    def imap_batches(self, batches: Iterable[Sequence], max_pending: Optional[int] = None) -> Iterator[_BatchResult]:
+        """Score an iterable of image chunks, yielding (results, errors) per chunk in order.
+
+        At most ``max_pending`` chunks (default: twice the worker count) are
+        in flight, so memory stays bounded for arbitrarily long inputs.
+        """
+        max_pending = max_pending or 2 * self.num_workers
+        pending: deque = deque()
+        for batch in batches:
+            pending.append(self.submit(batch))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def predict(self, x: np.ndarray, batch_size: int = None, verbose: int = 0) -> np.ndarray:
+        """Keras-style predict that splits a preprocessed batch across the workers."""
+        x = np.asarray(x, dtype=np.float32)
+        if not len(x):
+            return np.empty((0, 1), dtype=np.float32)
+        chunks = self._split(x)
+        futures = [self._executor.submit(_worker_predict, chunk, self.backend) for chunk in chunks]
+        return np.concatenate([future.result() for future in futures])
+
+    def shutdown(self, wait: bool = True):
+        """Stop all worker processes."""
+        self._executor.shutdown(wait=wait)
+
+    def _split(self, items):
+        """Split a list or array into at most num_workers contiguous, non-empty chunks."""
+        if not len(items):
+            return []
+        chunk_count = min(self.num_workers, len(items))
+        chunk_size = -(-len(items) // chunk_count)
+        return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+_shared_pool: Optional[InferencePool] = None
+_shared_pool_lock = threading.Lock()
+
+def get_shared_pool(num_workers: Optional[int] = None) -> Optional[InferencePool]:
+    """Return the process-wide pool, creating it on first use.
+
+    Args:
+        num_workers: Worker count; defaults to PLANT_CARE_WORKERS. Returns
+            None when neither is set, meaning in-process inference is used.
+    """
+    global _shared_pool
+    num_workers = num_workers or POOL_WORKERS
+    if not num_workers:
+        return None
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = InferencePool(num_workers=num_workers)
+        return _shared_pool
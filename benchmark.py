@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Performance benchmarks for the Smart Plant Care model.
+
+Usage:
+    python benchmark.py load      # model load time and RSS: HDF5 vs memory-mapped weights
+    python benchmark.py tta       # test-time augmentation latency as the number of views grows
+    python benchmark.py gradcam   # cost of Grad-CAM explanations on top of a prediction
+    python benchmark.py decode    # JPEG decode latency and peak memory, full vs reduced scale
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import numpy as np
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def current_rss_mb() -> float:
+    """Return the resident set size of this process in megabytes."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS; it is a peak, not current, value
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _reset_peak_rss():
+    """Reset the kernel's peak-RSS counter for this process where supported (Linux)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in megabytes."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _measure_load(artifact: str) -> dict:
+    """Load the model once in this (fresh) process and report time and RSS growth."""
+    import time
+    import tensorflow as tf
+    from app.utils import model_utils
+    from app.utils.backends import load_flat_weights
+
+    # Import and initialize TensorFlow first so only the model load itself is measured
+    tf.constant(0)
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    if artifact == 'h5':
+        model = tf.keras.models.load_model(model_utils.MODEL_PATH, compile=False)
+    else:
+        model = load_flat_weights(model_utils.ARCHITECTURE_PATH, model_utils.FLAT_WEIGHTS_PATH)
+    elapsed = time.perf_counter() - start
+    return {'artifact': artifact, 'load_seconds': elapsed,
+            'rss_delta_mb': current_rss_mb() - rss_before, 'parameters': int(model.count_params())}
+
+def benchmark_load(args):
+    """Compare HDF5 and memory-mapped loading, each in a fresh interpreter."""
+    print(f"{'Artifact':<10} {'Load (s)':>10} {'RSS delta (MB)':>16}")
+    for artifact in ('h5', 'mmap'):
+        samples = []
+        for _ in range(args.repeats):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '_load-child', artifact],
+                capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        load_seconds = sorted(sample['load_seconds'] for sample in samples)[len(samples) // 2]
+        rss_delta = sorted(sample['rss_delta_mb'] for sample in samples)[len(samples) // 2]
+        print(f"{artifact:<10} {load_seconds:>10.3f} {rss_delta:>16.1f}")
+
+def _median_ms(fn, repeats: int) -> float:
+    """Run ``fn`` ``repeats`` times and return the median wall time in milliseconds."""
+    import time
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+def _sample_image_path() -> str:
+    """Return the first bundled sample image."""
+    for folder in ('data/healthy', 'data/unhealthy'):
+        folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), folder)
+        for filename in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            if not filename.startswith('.'):
+                return os.path.join(folder, filename)
+    sys.exit("No sample image found; pass --image")
+
+def benchmark_tta(args):
+    """Measure how TTA latency grows with the number of views K.
+
+    ``forward`` times only the model on prebuilt views, batched vs K separate
+    calls. ``end-to-end`` times a whole upload (decode, preprocess, views,
+    forward) with TTA vs scoring the upload K times without it.
+    """
+    import io
+    from app.utils.model_utils import load_model, prepare_image_array, analyze_image
+    from app.utils.tta import make_views, analyze_image_tta, MAX_TTA_VIEWS
+
+    model = load_model()
+    if model is None:
+        sys.exit("Could not load the model")
+
+    with open(args.image or _sample_image_path(), 'rb') as f:
+        image_bytes = f.read()
+    image = prepare_image_array(io.BytesIO(image_bytes))
+    views_list = [views for views in args.views if 1 <= views <= MAX_TTA_VIEWS]
+
+    print(f"{'Views':>5} | {'forward batched':>15} {'separate':>9} | {'end-to-end TTA':>14} {'K uploads':>10}  (ms)")
+    forward_base = end_to_end_base = None
+    for num_views in views_list:
+        views = make_views(image, num_views)
+        # Warm up any new input shape before timing
+        model.predict(views, batch_size=num_views, verbose=0)
+        batched = _median_ms(lambda: model.predict(views, batch_size=num_views, verbose=0), args.repeats)
+        separate = _median_ms(lambda: [model.predict(views[i:i + 1], verbose=0) for i in range(num_views)],
+                              args.repeats)
+        tta = _median_ms(lambda: analyze_image_tta(io.BytesIO(image_bytes), num_views, model=model), args.repeats)
+        uploads = _median_ms(lambda: [analyze_image(io.BytesIO(image_bytes)) for _ in range(num_views)],
+                             args.repeats)
+        forward_base = forward_base or batched
+        end_to_end_base = end_to_end_base or tta
+        print(f"{num_views:>5} | {batched:>7.1f} ({batched / forward_base:>4.1f}x) {separate:>9.1f} | "
+              f"{tta:>6.1f} ({tta / end_to_end_base:>4.1f}x) {uploads:>10.1f}")
+    print(f"\nCPU cores: {os.cpu_count()}. Batched forward cost is sub-linear in K only while spare cores "
+          f"absorb the extra views; the decode is always paid once.")
+
+def benchmark_gradcam(args):
+    """Compare a plain prediction, the fused predict+Grad-CAM pass and a naive second pass."""
+    from app.utils.model_utils import load_model, prepare_image_array
+
+    model = load_model()
+    if model is None or not hasattr(model, 'explain'):
+        sys.exit("Grad-CAM needs the Keras backend")
+
+    image = prepare_image_array(args.image or _sample_image_path())[np.newaxis]
+    # Trace the Grad-CAM function before timing
+    model.explain(image)
+
+    predict = _median_ms(lambda: model.predict(image, verbose=0), args.repeats)
+    fused = _median_ms(lambda: model.explain(image), args.repeats)
+    naive = _median_ms(lambda: (model.predict(image, verbose=0), model.explain(image)), args.repeats)
+
+    print(f"{'Mode':<32} {'Latency (ms)':>12} {'Overhead':>9}")
+    print(f"{'predict only':<32} {predict:>12.1f} {'':>9}")
+    print(f"{'predict + Grad-CAM, one pass':<32} {fused:>12.1f} {fused / predict - 1:>8.0%}")
+    print(f"{'predict, then Grad-CAM pass':<32} {naive:>12.1f} {naive / predict - 1:>8.0%}")
+
+def _synthetic_jpeg(path: str, megapixels: float, quality: int = 90):
+    """Write a 4:3 photo-like JPEG (smooth colour fields plus grain) of the given size."""
+    from PIL import Image
+
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(width * 3 / 4))
+    rng = np.random.default_rng(0)
+    # Upsample a small random field so the encoder sees photo-like gradients, not pure noise
+    base = Image.fromarray(rng.integers(0, 256, (24, 32, 3), dtype=np.uint8)).resize((width, height), Image.BICUBIC)
+    pixels = np.asarray(base, dtype=np.int16) + rng.integers(-12, 13, (height, width, 1), dtype=np.int16)
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, quality=quality)
+    return width, height
+
+def _measure_decode(path: str, mode: str, repeats: int) -> dict:
+    """Decode one file in this (fresh) process and report latency and peak RSS growth."""
+    import time
+    from app.utils.decoding import decode_image
+    from app.utils.model_utils import MODEL_INPUT_SIZE
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    min_size = MODEL_INPUT_SIZE if mode == 'reduced' else None
+
+    def decode():
+        decoded = decode_image(data, min_size)
+        decoded.image.resize(MODEL_INPUT_SIZE)
+        return decoded
+
+    rss_before = current_rss_mb()
+    _reset_peak_rss()
+    decoded = decode()
+    # The peak is taken after the first decode, before repeats can only match it
+    peak_mb = _peak_rss_mb()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        decode()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'mode': mode, 'decode_ms': sorted(samples)[len(samples) // 2],
+            'peak_rss_delta_mb': max(0.0, peak_mb - rss_before), 'decoded_size': list(decoded.size),
+            'reduction': decoded.reduction}
+
+def benchmark_decode(args):
+    """Compare full-resolution and reduced-scale JPEG decoding by photo size, each in a fresh interpreter."""
+    import tempfile
+
+    print(f"{'Photo':>14} {'MP':>5} | {'Mode':<8} {'Decoded as':>11} {'Decode+resize (ms)':>19} {'Peak RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for megapixels in args.megapixels:
+            path = os.path.join(tmp_dir, f'{megapixels:g}mp.jpg')
+            width, height = _synthetic_jpeg(path, megapixels)
+            results = {}
+            for mode in ('full', 'reduced'):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '_decode-child', path, mode,
+                     '--repeats', str(args.repeats)],
+                    capture_output=True, text=True, check=True).stdout
+                results[mode] = json.loads(output.strip().splitlines()[-1])
+            for mode, result in results.items():
+                decoded_as = "x".join(str(side) for side in result['decoded_size'])
+                speedup = (f" ({results['full']['decode_ms'] / result['decode_ms']:.1f}x)"
+                           if mode == 'reduced' else "")
+                print(f"{width:>6}x{height:<7} {megapixels:>5g} | {mode:<8} {decoded_as:>11} "
+                      f"{result['decode_ms']:>11.1f}{speedup:<8} {result['peak_rss_delta_mb']:>14.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Smart Plant Care performance benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help="Model load time and RSS: HDF5 vs memory-mapped weights")
+    load_parser.add_argument("--repeats", type=int, default=3, help="Fresh processes per artifact (median reported)")
+    load_parser.set_defaults(func=benchmark_load)
+
+    tta_parser = subparsers.add_parser('tta', help="Test-time augmentation latency as the number of views grows")
+    tta_parser.add_argument("--views", type=int, nargs="+", default=[1, 2, 4, 8, 10], help="View counts to measure")
+    tta_parser.add_argument("--image", help="Image file to augment (default: first bundled sample)")
+    tta_parser.add_argument("--repeats", type=int, default=20, help="Timed runs per view count (median reported)")
+    tta_parser.set_defaults(func=benchmark_tta)
+
+    gradcam_parser = subparsers.add_parser('gradcam', help="Cost of Grad-CAM explanations on top of a prediction")
+    gradcam_parser.add_argument("--image", help="Image file to explain (default: first bundled sample)")
+    gradcam_parser.add_argument("--repeats", type=int, default=50, help="Timed runs per mode (median reported)")
+    gradcam_parser.set_defaults(func=benchmark_gradcam)
+
+    decode_parser = subparsers.add_parser('decode', help="JPEG decode latency and peak memory, full vs reduced scale")
+    decode_parser.add_argument("--megapixels", type=float, nargs="+", default=[2, 12, 24, 48],
+                               help="Synthetic photo sizes to measure")
+    decode_parser.add_argument("--repeats", type=int, default=5, help="Timed decodes per size and mode (median reported)")
+    decode_parser.set_defaults(func=benchmark_decode)
+
+    # Internal: run one measurement in a fresh interpreter
+    child_parser = subparsers.add_parser('_load-child')
+    child_parser.add_argument("artifact", choices=['h5', 'mmap'])
+    child_parser.set_defaults(func=lambda args: print(json.dumps(_measure_load(args.artifact))))
+    decode_child_parser = subparsers.add_parser('_decode-child')
+    decode_child_parser.add_argument("path")
+    decode_child_parser.add_argument("mode", choices=['full', 'reduced'])
+    decode_child_parser.add_argument("--repeats", type=int, default=5)
+    decode_child_parser.set_defaults(
+        func=lambda args: print(json.dumps(_measure_decode(args.path, args.mode, args.repeats))))
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
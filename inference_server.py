@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Headless HTTP inference service for the Smart Plant Care model.
+
+Loads the model once through ``app.utils.model_utils`` and scores raw image
+bytes over HTTP without Streamlit:
+
+    GET  /health          -> {"status": "ok", "model_ready": true, "cascade": {...} or null, "gate": {...}}
+    POST /predict         body: raw image bytes
+                          -> {"health_status": true, "status": "Healthy", "confidence": 0.93}
+    POST /predict/batch   body: multipart/form-data with one part per image
+                          -> {"results": [{...}, ...]}
+    Append ?tier=fast or ?tier=accurate to either POST to use a member of the
+    multi-resolution model family instead of the main model.
+    GET  /metrics         -> per-stage latency histograms in Prometheus text format
+    GET  /metrics.json    -> {"decode": {"count": ..., "p50": ..., "p95": ..., "p99": ...}, ...}
+
+Connections are kept alive (HTTP/1.1) and the number of concurrent model
+calls is bounded by --workers. Requests beyond that queue fairly per client
+address and get a 503 after --queue-timeout seconds.
+"""
+import os
+import sys
+import io
+import json
+import logging
+import argparse
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.model_utils import DEFAULT_BATCH_SIZE, analyze_images, load_model, is_model_ready, preload_model
+from app.utils.cascade import get_cascade_stage
+from app.utils.model_family import TIERS
+from app.utils import timing
+from app.utils.inference_gate import (QUEUE_TIMEOUT, InferenceBusyError, configure_inference_gate,
+                                      get_inference_gate, session_scope)
+
+logger = logging.getLogger("inference_server")
+
+def _result_to_json(health_status, confidence, error=None):
+    """Shape one analyze_image-style result as a JSON-serializable dict."""
+    if health_status is None:
+        return {"health_status": None, "status": None, "confidence": None,
+                "error": error or "Could not analyze image"}
+    return {
+        "health_status": bool(health_status),
+        "status": "Healthy" if health_status else "Unhealthy",
+        "confidence": float(confidence),
+    }
+
+def _split_multipart(content_type: str, body: bytes) -> list:
+    """Return the payload bytes of every part of a multipart/form-data body."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+    if not message.is_multipart():
+        raise ValueError("Expected a multipart/form-data body")
+    return [part.get_payload(decode=True) or b'' for part in message.iter_parts()]
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """Handle scoring requests; the server instance carries the shared settings."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "SmartPlantCare/1.0"
+
+    def do_GET(self):
+        if self.path == '/health':
+            stage = get_cascade_stage()
+            self._send_json(200, {"status": "ok", "model_ready": is_model_ready(),
+                                  "cascade": stage.stats() if stage is not None else None,
+                                  "gate": get_inference_gate().stats()})
+        elif self.path == '/metrics':
+            self._send_bytes(200, timing.prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4')
+        elif self.path == '/metrics.json':
+            self._send_json(200, timing.snapshot())
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ('/predict', '/predict/batch'):
+            self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+            return
+
+        tier = parse_qs(url.query).get('tier', [None])[0]
+        if tier is not None and tier not in TIERS:
+            self._send_json(400, {"error": f"Unknown tier '{tier}'. Choose one of: {', '.join(TIERS)}"})
+            return
+
+        body = self._read_body()
+        if body is None:
+            return
+
+        if url.path == '/predict':
+            images = [body]
+        else:
+            try:
+                images = _split_multipart(self.headers.get('Content-Type', ''), body)
+            except Exception as e:
+                self._send_json(400, {"error": f"Invalid multipart body: {str(e)}"})
+                return
+            if len(images) > self.server.max_batch_images:
+                self._send_json(413, {"error": f"At most {self.server.max_batch_images} images per batch"})
+                return
+
+        if not images or not any(images):
+            self._send_json(400, {"error": "Request body contains no image data"})
+            return
+
+        # The gated model takes an inference slot only around the forward pass, so decoding
+        # and preprocessing slow uploads never hold model capacity; queueing is fair per client
+        try:
+            with session_scope(self.client_address[0]):
+                results, errors = analyze_images([io.BytesIO(image) for image in images],
+                                                 batch_size=self.server.batch_size, return_errors=True, tier=tier)
+        except InferenceBusyError as e:
+            self._send_json(503, {"error": str(e)})
+            return
+
+        payload = [_result_to_json(status, confidence, error)
+                   for (status, confidence), error in zip(results, errors)]
+        if url.path == '/predict':
+            self._send_json(200 if payload[0].get("error") is None else 422, payload[0])
+        else:
+            self._send_json(200, {"results": payload})
+
+    def _read_body(self):
+        """Read the request body, answering with an error and returning None if it is unusable."""
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self._send_json(411, {"error": "Content-Length header is required"})
+            return None
+        if length > self.server.max_body_bytes:
+            self._send_json(413, {"error": "Request body too large"})
+            self.close_connection = True
+            return None
+        return self.rfile.read(length)
+
+    def _send_json(self, status: int, payload: dict):
+        self._send_bytes(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _send_bytes(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+class InferenceServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the shared concurrency and size limits."""
+
+    daemon_threads = True
+
+    def __init__(self, address, batch_size: int, max_body_mb: float, max_batch_images: int):
+        super().__init__(address, InferenceRequestHandler)
+        self.batch_size = batch_size
+        self.max_body_bytes = int(max_body_mb * 1024 * 1024)
+        self.max_batch_images = max_batch_images
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Smart Plant Care model over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8500, help="Port to listen on (default: 8500)")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Maximum number of concurrent model calls (default: 2)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Images per forward pass for batch requests (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--max-body-mb", type=float, default=50.0,
+                        help="Maximum request body size in megabytes (default: 50)")
+    parser.add_argument("--max-batch-images", type=int, default=256,
+                        help="Maximum number of images per batch request (default: 256)")
+    parser.add_argument("--queue-timeout", type=float, default=QUEUE_TIMEOUT,
+                        help=f"Seconds a request waits for a free worker before a 503 (default: {QUEUE_TIMEOUT:.0f})")
+    parser.add_argument("--timing", action="store_true",
+                        help="Record per-stage latency for /metrics (same as PLANT_CARE_TIMING=1)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+    if args.timing:
+        timing.enable()
+
+    # Size the shared inference gate before the model is loaded and wrapped by it
+    configure_inference_gate(args.workers, args.queue_timeout)
+
+    # Load and warm the model before accepting traffic
+    preload_model()
+    if load_model() is None:
+        sys.exit("Could not load the model; see the log above for details")
+
+    server = InferenceServer((args.host, args.port), args.batch_size, args.max_body_mb, args.max_batch_images)
+    logger.info("Serving on http://%s:%d with %d inference workers", args.host, args.port, args.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
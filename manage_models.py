@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Manage versions in the Smart Plant Care model registry.
+
+Running apps follow the registry's active version and swap to it in the
+background, so publishing, activating or rolling back needs no restart.
+
+Usage:
+    python manage_models.py list
+    python manage_models.py publish model/plant_health_model.h5 --threshold 0.5
+    python manage_models.py activate v2
+    python manage_models.py rollback
+"""
+import os
+import sys
+import json
+import argparse
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.model_registry import ModelRegistry, REGISTRY_DIR
+
+def list_versions(registry, args):
+    """Print every version with its metrics, marking the active one."""
+    active = registry.active_version()
+    versions = registry.list_versions()
+    if not versions:
+        print(f"No versions in {registry.root}")
+        return
+    for version in versions:
+        metadata = registry.read_metadata(version)
+        marker = '*' if version == active else ' '
+        print(f"{marker} {version:<6} {metadata.get('created_at', ''):<26} "
+              f"threshold={metadata.get('threshold')} metrics={json.dumps(metadata.get('metrics', {}))}")
+
+def publish(registry, args):
+    """Publish a model file as a new version."""
+    metadata = {'threshold': args.threshold, 'metrics': json.loads(args.metrics) if args.metrics else {}}
+    if args.notes:
+        metadata['notes'] = args.notes
+    version = registry.publish(args.model_path, metadata, activate=not args.no_activate)
+    print(f"Published {args.model_path} as {version}{'' if args.no_activate else ' (active)'}")
+
+def activate(registry, args):
+    registry.activate(args.version)
+    print(f"Activated {args.version}")
+
+def rollback(registry, args):
+    print(f"Rolled back to {registry.rollback()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Smart Plant Care model registry")
+    parser.add_argument("--registry", default=REGISTRY_DIR, help=f"Registry directory (default: {REGISTRY_DIR})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help="List published versions").set_defaults(func=list_versions)
+
+    publish_parser = subparsers.add_parser('publish', help="Publish a trained model as a new version")
+    publish_parser.add_argument("model_path", help="Keras .h5 model file")
+    publish_parser.add_argument("--threshold", type=float, default=0.5,
+                                help="Probability above which a plant is healthy (default: 0.5)")
+    publish_parser.add_argument("--metrics", help='Training metrics as JSON, e.g. \'{"val_accuracy": 0.97}\'')
+    publish_parser.add_argument("--notes", help="Free-form description of the version")
+    publish_parser.add_argument("--no-activate", action="store_true", help="Publish without serving it yet")
+    publish_parser.set_defaults(func=publish)
+
+    activate_parser = subparsers.add_parser('activate', help="Serve a specific version")
+    activate_parser.add_argument("version")
+    activate_parser.set_defaults(func=activate)
+
+    subparsers.add_parser('rollback', help="Go back to the previously active version").set_defaults(func=rollback)
+
+    args = parser.parse_args()
+    try:
+        args.func(ModelRegistry(args.registry), args)
+    except ValueError as e:
+        sys.exit(str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""Bulk-score every image under a directory tree with the Smart Plant Care model.
+
+The tree is walked lazily in a deterministic order, images are decoded on a
+thread pool while the previous batch is being scored (or, with --workers,
+decoded and scored in parallel worker processes), and results are
+streamed to a JSONL or CSV file as they are produced. A checkpoint file next
+to the output records how many images have been written and the output size
+at that point, so an interrupted run resumes where it stopped when started
+again with the same arguments: rows written after the last checkpoint are
+truncated away and scored again rather than duplicated.
+
+Example:
+    python score_directory.py /data/greenhouse-walk --output results.jsonl
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.model_utils import (DEFAULT_BATCH_SIZE, load_model, model_input_size, prepare_image_array,
+                                   prediction_to_result, decision_threshold)
+from app.utils.worker_pool import InferencePool
+from app.utils.cascade import answer_confident, get_cascade_stage
+from app.utils.model_family import TIERS
+from app.utils.timing import span
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+OUTPUT_FIELDS = ['path', 'health_status', 'status', 'confidence', 'error']
+
+def iter_image_paths(root):
+    """Yield image paths under ``root`` depth-first, sorted within each directory.
+
+    Only one directory listing is held in memory at a time per level, so
+    memory stays flat no matter how many files the tree contains.
+    """
+    try:
+        with os.scandir(root) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        print(f"⚠️ Skipping {root}: {str(e)}", file=sys.stderr)
+        return
+
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_image_paths(entry.path)
+        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            yield entry.path
+
+def load_checkpoint(checkpoint_path):
+    """Return the saved checkpoint dict, or an empty one if there is none."""
+    if not os.path.exists(checkpoint_path):
+        return {}
+    with open(checkpoint_path, 'r') as f:
+        return json.load(f)
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """Atomically replace the checkpoint file."""
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+class ResultWriter:
+    """Append scoring results to a JSONL or CSV file."""
+
+    def __init__(self, output_path, output_format, resume_offset=None):
+        """
+        Args:
+            output_path: File to write
+            output_format: 'jsonl' or 'csv'
+            resume_offset: Output size in bytes recorded by the last checkpoint. The file is
+                truncated to it and appended to; None starts a new file.
+        """
+        self.output_format = output_format
+        append = resume_offset is not None and os.path.exists(output_path)
+        if append:
+            # Drop rows written after the last checkpoint; their images are scored again
+            os.truncate(output_path, min(resume_offset, os.path.getsize(output_path)))
+        has_rows = append and os.path.getsize(output_path) > 0
+        write_header = output_format == 'csv' and not has_rows
+        self._file = open(output_path, 'a' if append else 'w', newline='')
+        if output_format == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+            if write_header:
+                self._csv.writeheader()
+
+    def write(self, row):
+        if self.output_format == 'csv':
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(row) + '\n')
+
+    def flush(self) -> int:
+        """Push written rows to disk so the checkpoint never gets ahead of the output.
+
+        Returns:
+            int: Size of the output file in bytes, to record in the checkpoint
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return os.fstat(self._file.fileno()).st_size
+
+    def close(self):
+        self._file.close()
+
+def _decode(path, input_size):
+    """Decode one image, returning (array, None) or (None, error message)."""
+    try:
+        return prepare_image_array(path, input_size), None
+    except Exception as e:
+        return None, str(e)
+
+def _decode_batch(executor, paths, input_size):
+    """Start decoding a batch of paths in parallel; returns the list of futures."""
+    return [executor.submit(_decode, path, input_size) for path in paths]
+
+def score_batch(model, paths, decoded, root, batch_size, use_cascade=True):
+    """Score one decoded batch and return the output rows in path order."""
+    rows = []
+    arrays = []
+    valid_rows = []
+    for path, (array, error) in zip(paths, decoded):
+        row = {'path': os.path.relpath(path, root), 'health_status': None,
+               'status': None, 'confidence': None, 'error': error}
+        rows.append(row)
+        if array is not None:
+            arrays.append(array)
+            valid_rows.append(row)
+
+    if not arrays:
+        return rows
+    batch = np.stack(arrays)
+
+    # Obvious images are answered by the cheap cascade stage; only the rest reach the CNN
+    threshold = decision_threshold(model)
+    if use_cascade:
+        answered = answer_confident(batch, threshold)
+        for row, result in zip(valid_rows, answered):
+            if result is not None:
+                _set_result(row, *result)
+        escalated = np.array([result is None for result in answered], dtype=bool)
+        valid_rows = [row for row, is_escalated in zip(valid_rows, escalated) if is_escalated]
+        batch = batch[escalated]
+
+    if valid_rows:
+        try:
+            with span('inference'):
+                predictions = model.predict(batch, batch_size=batch_size, verbose=0)
+            for row, prediction in zip(valid_rows, predictions):
+                _set_result(row, *prediction_to_result(float(prediction[0]), threshold))
+        except Exception as e:
+            for row in valid_rows:
+                row['error'] = f"Prediction failed: {str(e)}"
+    return rows
+
+def _set_result(row, health_status, confidence):
+    row.update(health_status=bool(health_status),
+               status='Healthy' if health_status else 'Unhealthy',
+               confidence=round(float(confidence), 6))
+
+def _iter_chunks(paths, size):
+    """Split a path iterator into lists of at most ``size`` paths."""
+    while True:
+        chunk = list(itertools.islice(paths, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_scored_batches(model, paths, root, batch_size, decode_workers, use_cascade=True):
+    """Score batches in this process, decoding the next batch while the current one runs."""
+    input_size = model_input_size(model)
+    with ThreadPoolExecutor(max_workers=max(1, decode_workers)) as executor:
+        chunks = _iter_chunks(paths, batch_size)
+        current_paths = next(chunks, [])
+        current = _decode_batch(executor, current_paths, input_size)
+        while current_paths:
+            # Start decoding the next batch while this one is scored
+            next_paths = next(chunks, [])
+            upcoming = _decode_batch(executor, next_paths, input_size)
+            yield score_batch(model, current_paths, [future.result() for future in current], root, batch_size,
+                              use_cascade)
+            current_paths, current = next_paths, upcoming
+
+def iter_scored_batches_pool(pool, paths, root, batch_size):
+    """Score batches on a multi-process worker pool, which decodes and predicts in each worker."""
+    submitted = deque()
+
+    def tracked_chunks():
+        for chunk in _iter_chunks(paths, batch_size):
+            submitted.append(chunk)
+            yield chunk
+
+    for results, errors in pool.imap_batches(tracked_chunks()):
+        rows = []
+        for path, (health_status, confidence), error in zip(submitted.popleft(), results, errors):
+            row = {'path': os.path.relpath(path, root), 'health_status': None,
+                   'status': None, 'confidence': None, 'error': error}
+            if health_status is not None:
+                _set_result(row, health_status, confidence)
+            rows.append(row)
+        yield rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-score a directory tree of plant images")
+    parser.add_argument("root", help="Directory to scan recursively for images")
+    parser.add_argument("--output", required=True, help="Output file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="Output format (default: inferred from the output extension)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Images per forward pass (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--decode-workers", type=int, default=os.cpu_count() or 4,
+                        help="Threads used to decode images in parallel (default: CPU count)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes, each with its own model replica (default: 1, in-process)")
+    parser.add_argument("--tier", choices=TIERS,
+                        help="Score with the 'fast' or 'accurate' member of the model family instead of the main model")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore any existing checkpoint and start from scratch")
+    parser.add_argument("--report-every", type=float, default=10.0,
+                        help="Seconds between progress reports (default: 10)")
+    args = parser.parse_args()
+
+    output_format = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    checkpoint_path = args.output + '.checkpoint'
+    root = os.path.abspath(args.root)
+    batch_size = max(1, args.batch_size)
+
+    checkpoint = {} if args.restart else load_checkpoint(checkpoint_path)
+    if checkpoint and checkpoint.get('root') != root:
+        sys.exit(f"Checkpoint {checkpoint_path} belongs to {checkpoint.get('root')}; use --restart to overwrite it")
+    already_done = checkpoint.get('processed', 0)
+    resume_offset = checkpoint.get('output_bytes') if already_done else None
+    if already_done and resume_offset is None:
+        # Checkpoints from older versions lack the offset; keep the output as it is
+        resume_offset = os.path.getsize(args.output) if os.path.exists(args.output) else 0
+        print("⚠️ Checkpoint has no output offset; rows written after it may appear twice", file=sys.stderr)
+
+    if args.tier:
+        # Spawned pool workers pick the tier up from the environment
+        os.environ['PLANT_CARE_TIER'] = args.tier
+
+    pool = None
+    if args.workers > 1:
+        pool = InferencePool(num_workers=args.workers, batch_size=batch_size)
+    else:
+        model = load_model(tier=args.tier)
+        if model is None:
+            sys.exit("Could not load the model")
+
+    paths = iter_image_paths(root)
+    if already_done:
+        print(f"Resuming after {already_done} already scored images")
+        skipped = list(itertools.islice(paths, already_done - 1, already_done))
+        if checkpoint.get('last_path') and skipped and os.path.relpath(skipped[0], root) != checkpoint['last_path']:
+            print("⚠️ The directory tree changed since the checkpoint was written; "
+                  "some images may be skipped or scored twice", file=sys.stderr)
+
+    writer = ResultWriter(args.output, output_format, resume_offset)
+    processed = already_done
+    run_count = 0
+    start = time.perf_counter()
+    last_report = start
+
+    if pool is not None:
+        scored_batches = iter_scored_batches_pool(pool, paths, root, batch_size)
+    else:
+        scored_batches = iter_scored_batches(model, paths, root, batch_size, args.decode_workers,
+                                             use_cascade=not args.tier)
+
+    try:
+        for rows in scored_batches:
+            for row in rows:
+                writer.write(row)
+            output_bytes = writer.flush()
+
+            processed += len(rows)
+            run_count += len(rows)
+            # Rows past output_bytes (an interrupt before this save) are truncated on resume
+            save_checkpoint(checkpoint_path, {'root': root, 'processed': processed,
+                                              'last_path': rows[-1]['path'], 'output_bytes': output_bytes})
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                print(f"Scored {processed} images ({run_count / (now - start):.1f} images/sec)")
+                last_report = now
+    except KeyboardInterrupt:
+        print(f"\nInterrupted after {processed} images; run the same command again to resume")
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    rate = run_count / elapsed if elapsed > 0 else 0.0
+    print(f"Done: {run_count} images scored this run, {processed} total, {rate:.1f} images/sec")
+    stage = get_cascade_stage()
+    if pool is None and stage is not None and stage.stats()['images']:
+        cascade_stats = stage.stats()
+        print(f"Cascade: {cascade_stats['stage1_answered']} images answered by the color stage "
+              f"({cascade_stats['stage1_hit_rate']:.1%}), {cascade_stats['escalated_to_cnn']} escalated to the CNN")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
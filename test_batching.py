@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Regression tests: concurrent single-image requests share one batched forward pass."""
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import cascade
+from app.utils.batching import MicroBatchDispatcher
+
+class CountingModel:
+    """Stand-in model that records the size of every batch it scores."""
+
+    input_shape = (None, 224, 224, 3)
+    threshold = 0.5
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, x, batch_size=None, verbose=0):
+        self.batch_sizes.append(len(x))
+        # Score each image by its red channel so results can be matched to their callers
+        return x[:, :1, 0, 0].astype(np.float32)
+
+@pytest.fixture(autouse=True)
+def no_cascade(monkeypatch):
+    monkeypatch.setattr(cascade, 'CASCADE_ENABLED', False)
+
+def _leaf(red):
+    return Image.new('RGB', (224, 224), color=(red, 150, 50))
+
+def test_concurrent_submits_share_one_predict_call():
+    model = CountingModel()
+    # A long wait lets every caller join the first batch
+    dispatcher = MicroBatchDispatcher(model_loader=lambda: model, max_batch_size=8, max_wait_ms=2000)
+    reds = [25, 75, 125, 175, 225, 250, 200, 100]
+    results = [None] * len(reds)
+    start = threading.Barrier(len(reds))
+
+    def caller(index):
+        start.wait()
+        results[index] = dispatcher.analyze_image(_leaf(reds[index]), timeout=10)
+
+    threads = [threading.Thread(target=caller, args=(index,)) for index in range(len(reds))]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        dispatcher.shutdown()
+
+    assert model.batch_sizes == [8]
+    for red, (status, confidence) in zip(reds, results):
+        probability = red / 255.0
+        assert status == (probability > 0.5)
+        assert confidence == pytest.approx(max(probability, 1 - probability), abs=1e-5)
+
+    stats = dispatcher.stats()
+    assert stats['requests'] == 8 and stats['batches'] == 1 and stats['max_batch_size_seen'] == 8
+
+def test_batches_never_exceed_the_maximum_size():
+    model = CountingModel()
+    dispatcher = MicroBatchDispatcher(model_loader=lambda: model, max_batch_size=3, max_wait_ms=50)
+    try:
+        futures = [dispatcher.submit(_leaf(red)) for red in range(10, 80, 10)]
+        for future in futures:
+            future.result(timeout=10)
+    finally:
+        dispatcher.shutdown()
+
+    assert sum(model.batch_sizes) == 7
+    assert max(model.batch_sizes) <= 3
+
+def test_a_failed_batch_fails_every_caller():
+    class BrokenModel(CountingModel):
+        def predict(self, x, batch_size=None, verbose=0):
+            raise RuntimeError("out of memory")
+
+    dispatcher = MicroBatchDispatcher(model_loader=BrokenModel, max_wait_ms=0)
+    try:
+        future = dispatcher.submit(_leaf(100))
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(timeout=10)
+    finally:
+        dispatcher.shutdown()
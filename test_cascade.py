@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Regression tests: every analysis path agrees with the cascade and the CNN."""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import cascade, model_utils, tiling, tta
+from app.utils.batching import MicroBatchDispatcher
+from app.utils.cascade import CascadeStage, answer_confident, tune_band
+
+FEATURES = 23  # HUE_BINS + 2 * LEVEL_BINS + 3
+
+class ConstantModel:
+    """Stand-in CNN that gives every image the same healthy probability."""
+
+    input_shape = (None, 224, 224, 3)
+
+    def __init__(self, probability, threshold):
+        self.probability = probability
+        self.threshold = threshold
+        self.calls = 0
+
+    def predict(self, x, batch_size=None, verbose=0):
+        self.calls += 1
+        return np.full((len(x), 1), self.probability, dtype=np.float32)
+
+    def explain(self, x, threshold=None):
+        return self.predict(x), np.zeros((len(x), 7, 7), dtype=np.float32)
+
+def _stage(probability, low, high):
+    """A stage that scores every image at ``probability``."""
+    bias = float(np.log(probability / (1.0 - probability)))
+    return CascadeStage(np.zeros(FEATURES), bias, np.zeros(FEATURES), np.ones(FEATURES), low, high)
+
+@pytest.fixture
+def leaf():
+    return Image.new('RGB', (448, 448), color=(40, 150, 50))
+
+def _use(monkeypatch, model, stage):
+    for module in (model_utils, tta, tiling):
+        monkeypatch.setattr(module, 'load_model', lambda *args, **kwargs: model)
+    monkeypatch.setattr(cascade, 'get_cascade_stage', lambda: stage)
+
+def _verdicts(model, leaf):
+    """Verdicts of the whole-image paths, which all consult the cascade."""
+    dispatcher = MicroBatchDispatcher(model_loader=lambda: model, max_wait_ms=0)
+    try:
+        return {
+            'single': model_utils.analyze_image(leaf),
+            'gradcam': model_utils.analyze_image(leaf, return_gradcam=True)[:2],
+            'batch': model_utils.analyze_images([leaf])[0],
+            'dispatcher': dispatcher.analyze_image(leaf),
+        }
+    finally:
+        dispatcher.shutdown()
+
+def test_confident_images_get_the_stage_verdict_on_every_whole_image_path(monkeypatch, leaf):
+    model = ConstantModel(probability=0.3, threshold=0.5)
+    _use(monkeypatch, model, _stage(0.9, low=0.2, high=0.8))
+
+    verdicts = _verdicts(model, leaf)
+    assert {status for status, _ in verdicts.values()} == {True}, verdicts
+    assert model.calls == 0
+
+def test_escalated_images_get_the_cnn_verdict_on_every_whole_image_path(monkeypatch, leaf):
+    model = ConstantModel(probability=0.3, threshold=0.5)
+    _use(monkeypatch, model, _stage(0.9, low=0.0, high=1.0))
+
+    verdicts = _verdicts(model, leaf)
+    assert {status for status, _ in verdicts.values()} == {False}, verdicts
+
+def test_tta_and_tiling_always_run_the_cnn(monkeypatch, leaf):
+    # Even a stage confident about the whole image must not skip the views or tiles
+    model = ConstantModel(probability=0.3, threshold=0.5)
+    _use(monkeypatch, model, _stage(0.9, low=0.2, high=0.8))
+
+    status, _, spread = tta.analyze_image_tta(leaf)
+    assert status is False and spread is not None
+
+    status, _, heatmap = tiling.analyze_image_tiled(leaf)
+    assert status is False and heatmap is not None
+    assert model.calls == 2
+
+def test_stage_answers_use_the_model_threshold(monkeypatch):
+    monkeypatch.setattr(cascade, 'get_cascade_stage', lambda: _stage(0.75, low=0.2, high=0.7))
+    batch = np.zeros((1, 224, 224, 3), dtype=np.float32)
+
+    assert answer_confident(batch, threshold=0.5)[0][0]
+    assert not answer_confident(batch, threshold=0.8)[0][0]
+
+def test_no_stage_escalates_everything(monkeypatch):
+    monkeypatch.setattr(cascade, 'get_cascade_stage', lambda: None)
+    assert answer_confident(np.zeros((3, 8, 8, 3), dtype=np.float32)) == [None, None, None]
+
+def test_tune_band_respects_the_accuracy_budget():
+    labels = np.array([1, 1, 0, 0, 1, 0])
+    cnn = np.array([0.9, 0.8, 0.1, 0.2, 0.7, 0.3])
+    # Stage 1 is sure and right about the first four, wrong about the last two
+    stage = np.array([0.95, 0.9, 0.05, 0.1, 0.3, 0.6])
+
+    band = tune_band(stage, cnn, labels, max_accuracy_loss=0.0)
+    assert band['cascade_accuracy'] == band['cnn_accuracy'] == 1.0
+    assert band['stage1_hit_rate'] > 0
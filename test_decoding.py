@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Regression tests for in-memory decoding, its PIL to OpenCV fallback and JPEG draft reduction."""
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import decoding
+from app.utils.decoding import ImageDecodeError, decode_image, jpeg_reduction
+
+def _encode(image, format_name, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format_name, **params)
+    return buffer.getvalue()
+
+@pytest.fixture
+def png_bytes():
+    return _encode(Image.new('RGBA', (40, 30), color=(30, 160, 60, 255)), 'PNG')
+
+def test_pil_decodes_to_rgb_and_records_the_attempt(png_bytes):
+    decoded = decode_image(png_bytes)
+
+    assert decoded.decoder == 'PIL' and decoded.format == 'PNG'
+    assert decoded.source_mode == 'RGBA' and decoded.image.mode == 'RGB'
+    assert decoded.size == (40, 30) and decoded.array.shape == (30, 40, 3)
+    assert decoded.attempts == {'PIL': None}
+
+def test_files_pil_rejects_fall_back_to_opencv(monkeypatch, png_bytes):
+    def reject(*args, **kwargs):
+        raise OSError("broken PNG file")
+
+    monkeypatch.setattr(decoding, '_decode_pil', reject)
+    decoded = decode_image(io.BytesIO(png_bytes))
+
+    assert decoded.decoder == 'OpenCV'
+    assert list(decoded.attempts) == ['PIL', 'OpenCV']
+    assert decoded.attempts == {'PIL': "broken PNG file", 'OpenCV': None}
+    # OpenCV decodes BGR; the result must still be RGB
+    assert tuple(decoded.array[0, 0]) == (30, 160, 60)
+    assert decoded.image.size == (40, 30)
+
+def test_undecodable_bytes_report_every_decoder():
+    with pytest.raises(ImageDecodeError) as error:
+        decode_image(b'\x89PNG\r\n\x1a\n' + b'\x00' * 64)
+    assert list(error.value.attempts) == ['PIL', 'OpenCV']
+    assert all(error.value.attempts.values())
+
+    with pytest.raises(ImageDecodeError):
+        decode_image(b'')
+
+@pytest.fixture
+def large_jpeg():
+    return _encode(Image.new('RGB', (2000, 1600), color=(90, 140, 60)), 'JPEG', quality=90)
+
+def test_jpeg_reduction_keeps_the_target_covered():
+    assert jpeg_reduction((4000, 3000), (224, 224)) == 8
+    assert jpeg_reduction((2000, 1600), (224, 224)) == 4
+    assert jpeg_reduction((300, 300), (224, 224)) == 1
+    assert jpeg_reduction((4000, 3000), None) == 1
+
+@pytest.mark.parametrize('pil_fails', [False, True])
+def test_large_jpegs_are_decoded_at_reduced_scale(monkeypatch, large_jpeg, pil_fails):
+    def reject(*args, **kwargs):
+        raise OSError("broken JPEG file")
+
+    if pil_fails:
+        monkeypatch.setattr(decoding, '_decode_pil', reject)
+    decoded = decode_image(large_jpeg, min_size=(224, 224))
+
+    assert decoded.decoder == ('OpenCV' if pil_fails else 'PIL')
+    assert decoded.reduction == 4
+    assert decoded.size == (500, 400)
+    assert decoded.source_size == (2000, 1600)
+
+def test_full_decodes_and_other_formats_are_not_reduced(large_jpeg):
+    assert decode_image(large_jpeg).size == (2000, 1600)
+    png = _encode(Image.new('RGB', (2000, 1600)), 'PNG')
+    decoded = decode_image(png, min_size=(224, 224))
+    assert decoded.reduction == 1 and decoded.size == (2000, 1600)
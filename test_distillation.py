@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Sanity test for distilling the teacher into a small student model."""
+import json
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import train_model
+
+def _teacher():
+    """A fixed teacher that calls green images healthy and red ones unhealthy."""
+    teacher = tf.keras.Sequential([
+        tf.keras.layers.Input((224, 224, 3)),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(1, activation='sigmoid'),
+    ])
+    teacher.layers[-1].set_weights([np.array([[-8.0], [8.0], [0.0]], dtype=np.float32),
+                                    np.zeros(1, dtype=np.float32)])
+    return teacher
+
+def _images(count):
+    rng = np.random.default_rng(0)
+    labels = np.arange(count) % 2
+    colors = np.where(labels[:, None] == 1, [0.2, 0.6, 0.2], [0.6, 0.3, 0.1])
+    images = colors[:, None, None, :] + rng.normal(0, 0.05, (count, 224, 224, 3))
+    return np.clip(images, 0, 1).astype(np.float32), labels
+
+def test_student_is_saved_with_a_comparison_report(tmp_path):
+    X, y = _images(16)
+    output_path = str(tmp_path / 'student.h5')
+
+    profiles = train_model.distill_student(_teacher(), X[:12], y[:12], X[12:], y[12:],
+                                           architecture='separable', epochs=1, output_path=output_path)
+
+    assert [profile['architecture'] for profile in profiles] == ['teacher', 'student']
+    assert profiles[0]['val_accuracy'] == 1.0
+    assert 0.0 <= profiles[1]['teacher_agreement'] <= 1.0
+    assert profiles[1]['student_architecture'] == 'separable'
+    assert all(profile['images_per_minute'] > 0 for profile in profiles)
+
+    student = tf.keras.models.load_model(output_path, compile=False)
+    assert student.input_shape == (None, 224, 224, 3)
+    with open(str(tmp_path / 'student.report.json')) as f:
+        assert json.load(f) == profiles
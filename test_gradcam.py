@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Regression tests: Grad-CAM explains the class picked by the model's own threshold."""
+import os
+import sys
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.backends import CompiledKerasModel
+from app.utils.inference_gate import GatedModel, InferenceGate
+
+@pytest.fixture(scope='module')
+def model():
+    tf.random.set_seed(0)
+    keras_model = tf.keras.Sequential([
+        tf.keras.layers.Input((32, 32, 3)),
+        tf.keras.layers.Conv2D(4, 3, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(1, activation='sigmoid'),
+    ])
+    return CompiledKerasModel(keras_model)
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).random((1, 32, 32, 3), dtype=np.float32)
+
+def test_threshold_picks_the_explained_class(model, image):
+    healthy = float(model.predict(image)[0, 0])
+    _, below = model.explain(image, threshold=healthy - 0.01)
+    _, above = model.explain(image, threshold=healthy + 0.01)
+
+    # Opposite classes back-propagate opposite gradients, so the maps never overlap
+    assert not np.allclose(below, above)
+    assert np.all(np.minimum(below, above) < 1e-6)
+
+def test_default_threshold_matches_an_explicit_half(model, image):
+    predictions, default = model.explain(image)
+    _, explicit = model.explain(image, threshold=0.5)
+
+    np.testing.assert_allclose(predictions, model.predict(image), rtol=1e-5)
+    np.testing.assert_allclose(default, explicit)
+
+def test_gated_model_forwards_the_threshold(model, image):
+    gated = GatedModel(model, InferenceGate(max_concurrent=1))
+    healthy = float(model.predict(image)[0, 0])
+
+    np.testing.assert_allclose(gated.explain(image, healthy + 0.01)[1],
+                               model.explain(image, threshold=healthy + 0.01)[1])
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Regression tests for repairing uploads the regular decoders reject."""
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.decoding import ImageDecodeError, decode_image, salvage_image
+from app.utils.image_diagnostics import repair_image
+from app.utils.upload import Upload
+
+def _jpeg_bytes(size=(320, 240)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=(30, 140, 40)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+def test_corrupt_jpeg_signature_is_repaired_after_cached_failure():
+    # The SOI marker is overwritten, so neither PIL nor OpenCV recognise the file
+    corrupt = b'\x00' * 4 + _jpeg_bytes()[4:]
+    upload = Upload(corrupt, name='corrupt.jpg')
+    with pytest.raises(ImageDecodeError):
+        upload.image()
+
+    # The upload now holds a cached decode failure; repair must not just re-raise it
+    repaired = repair_image(upload)
+    assert repaired is not None
+    assert repaired.size == (320, 240)
+    assert salvage_image(corrupt).decoder == 'signature'
+
+def test_jpeg_behind_leading_junk_is_repaired():
+    data = b'--boundary\r\nContent-Type: image/jpeg\r\n\r\n' + _jpeg_bytes()
+    with pytest.raises(ImageDecodeError):
+        decode_image(data)
+
+    salvaged = salvage_image(data)
+    assert salvaged.decoder == 'embedded'
+    assert salvaged.size == (320, 240)
+
+def test_truncated_jpeg_still_yields_an_image():
+    data = _jpeg_bytes()
+    truncated = data[:len(data) // 2]
+
+    repaired = repair_image(Upload(truncated, name='truncated.jpg'))
+    assert repaired is not None
+    assert repaired.size == (320, 240)
+
+def test_unrecoverable_bytes_return_none():
+    assert repair_image(Upload(b'not an image at all', name='notes.txt')) is None
+    with pytest.raises(ImageDecodeError):
+        salvage_image(b'not an image at all')
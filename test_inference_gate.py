@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Regression tests for session-fair admission to the shared model."""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import cascade
+from app.utils.batching import MicroBatchDispatcher
+from app.utils.inference_gate import InferenceBusyError, InferenceGate, current_session_id, session_scope
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the test condition"
+        time.sleep(0.005)
+
+def test_freed_slots_go_round_robin_between_sessions():
+    gate = InferenceGate(max_concurrent=1, timeout=5)
+    order = []
+
+    def request(session_id):
+        with gate.slot(session_id):
+            order.append(session_id)
+
+    threads = []
+    with gate.slot('holder'):
+        # Three requests from one session queue up before a single one from another
+        for session_id in ('alice', 'alice', 'alice', 'bob'):
+            thread = threading.Thread(target=request, args=(session_id,))
+            thread.start()
+            threads.append(thread)
+            _wait_until(lambda: gate.stats()['queued_now'] == len(threads))
+    for thread in threads:
+        thread.join()
+
+    assert order == ['alice', 'bob', 'alice', 'alice']
+
+def test_waiting_past_the_timeout_raises_busy():
+    gate = InferenceGate(max_concurrent=1, timeout=0.05)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold():
+        with gate.slot('holder'):
+            holding.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holding.wait()
+    try:
+        with pytest.raises(InferenceBusyError):
+            with gate.slot('late'):
+                pass
+    finally:
+        release.set()
+        holder.join()
+
+    stats = gate.stats()
+    assert stats['timed_out'] == 1 and stats['queued_now'] == 0 and stats['in_flight'] == 0
+
+class RecordingModel:
+    """Stand-in model that blocks its first call and records who each forward pass runs for."""
+
+    input_shape = (None, 224, 224, 3)
+    threshold = 0.5
+
+    def __init__(self):
+        self.sessions = []
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def predict(self, x, batch_size=None, verbose=0):
+        self.sessions.append(current_session_id())
+        self.batches.append(np.round(x[:, 0, 0, 0] * 255).astype(int).tolist())
+        self.entered.set()
+        self.release.wait()
+        return np.full((len(x), 1), 0.2, dtype=np.float32)
+
+def _leaf(red):
+    return Image.new('RGB', (224, 224), color=(red, 150, 50))
+
+def test_dispatcher_serves_sessions_in_turn_and_queues_as_the_caller(monkeypatch):
+    monkeypatch.setattr(cascade, 'CASCADE_ENABLED', False)
+    model = RecordingModel()
+    dispatcher = MicroBatchDispatcher(model_loader=lambda: model, max_batch_size=2, max_wait_ms=0)
+
+    def submit(session_id, red):
+        with session_scope(session_id):
+            return dispatcher.submit(_leaf(red))
+
+    try:
+        futures = [submit('alice', 10)]
+        model.entered.wait()
+        # While the first batch is in flight, one session floods the queue and another asks once
+        futures += [submit('alice', red) for red in (20, 30, 40)]
+        futures.append(submit('bob', 200))
+        model.release.set()
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        model.release.set()
+        dispatcher.shutdown()
+
+    assert model.batches == [[10], [20, 200], [30, 40]]
+    assert model.sessions == ['alice', 'alice', 'alice']
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Regression tests for the headless HTTP inference service."""
+import http.client
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import inference_server
+from app.utils.inference_gate import InferenceBusyError, InferenceGate
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replace the model with one that reads each body's first byte as its healthy probability."""
+    calls = []
+
+    def fake_analyze_images(images, batch_size=None, return_errors=False, tier=None):
+        payloads = [image.read() for image in images]
+        calls.append({'count': len(payloads), 'tier': tier})
+        if payloads[0] == b'busy':
+            raise InferenceBusyError("No inference slot became free within 0.1s")
+        results = [(None, None) if payload == b'bad' else (payload[0] > 127, max(payload[0], 255 - payload[0]) / 255)
+                   for payload in payloads]
+        errors = ["Could not decode the image" if payload == b'bad' else None for payload in payloads]
+        return results, errors
+
+    monkeypatch.setattr(inference_server, 'analyze_images', fake_analyze_images)
+    monkeypatch.setattr(inference_server, 'is_model_ready', lambda: True)
+    monkeypatch.setattr(inference_server, 'get_cascade_stage', lambda: None)
+    gate = InferenceGate(max_concurrent=2)
+    monkeypatch.setattr(inference_server, 'get_inference_gate', lambda: gate)
+    return calls
+
+@pytest.fixture
+def server(calls):
+    server = inference_server.InferenceServer(('127.0.0.1', 0), batch_size=8, max_body_mb=1, max_batch_images=3)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+def _multipart(parts):
+    boundary = 'plantcareboundary'
+    body = b''.join(f'--{boundary}\r\nContent-Disposition: form-data; name="image{index}"\r\n'
+                    f'Content-Type: application/octet-stream\r\n\r\n'.encode() + part + b'\r\n'
+                    for index, part in enumerate(parts))
+    return body + f'--{boundary}--\r\n'.encode(), {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+def test_health_reports_readiness_and_the_gate(server):
+    status, payload = _request(server, 'GET', '/health')
+    assert status == 200
+    assert payload['status'] == 'ok' and payload['model_ready'] is True
+    assert payload['gate']['max_concurrent'] == 2
+
+def test_predict_scores_the_raw_body(server, calls):
+    status, payload = _request(server, 'POST', '/predict?tier=fast', body=bytes([230]))
+    assert status == 200
+    assert payload['health_status'] is True and payload['status'] == 'Healthy'
+    assert payload['confidence'] == pytest.approx(230 / 255)
+    assert calls == [{'count': 1, 'tier': 'fast'}]
+
+def test_batch_scores_every_part_in_one_call(server, calls):
+    body, headers = _multipart([bytes([10]), b'bad', bytes([200])])
+    status, payload = _request(server, 'POST', '/predict/batch', body=body, headers=headers)
+
+    assert status == 200
+    assert [result['health_status'] for result in payload['results']] == [False, None, True]
+    assert payload['results'][1]['error'] == "Could not decode the image"
+    assert calls == [{'count': 3, 'tier': None}]
+
+def test_busy_gate_answers_503(server):
+    status, payload = _request(server, 'POST', '/predict', body=b'busy')
+    assert status == 503
+    assert payload['error'].startswith("No inference slot became free")
+
+def test_rejected_requests_never_reach_the_model(server, calls):
+    assert _request(server, 'POST', '/predict?tier=huge', body=b'x')[0] == 400
+    assert _request(server, 'POST', '/predict', body=b'')[0] == 400
+    assert _request(server, 'POST', '/predict', body=b'bad')[0] == 422
+    body, headers = _multipart([b'a', b'b', b'c', b'd'])
+    assert _request(server, 'POST', '/predict/batch', body=body, headers=headers)[0] == 413
+    assert _request(server, 'GET', '/unknown')[0] == 404
+    assert calls == [{'count': 1, 'tier': None}]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Regression tests for the model family tiers and their non-224 input sizes."""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import model_utils, tiling, tta
+from app.utils.model_family import MAIN_MODEL, choose_tiers
+
+class SizedModel:
+    """Stand-in family member that rejects inputs of any other size, like a Keras signature."""
+
+    def __init__(self, size):
+        self.input_shape = (None, size, size, 3)
+        self.threshold = 0.5
+
+    def predict(self, x, batch_size=None, verbose=0):
+        assert x.shape[1:] == self.input_shape[1:], f"got {x.shape[1:]}, expected {self.input_shape[1:]}"
+        return np.full((len(x), 1), 0.2, dtype=np.float32)
+
+@pytest.fixture
+def tiered(monkeypatch):
+    requested = []
+
+    def fake_load_model(backend=None, precision=None, tier=None):
+        requested.append(tier)
+        return SizedModel(160) if tier == 'accurate' else SizedModel(224)
+
+    for module in (model_utils, tta, tiling):
+        monkeypatch.setattr(module, 'load_model', fake_load_model)
+    return requested
+
+@pytest.fixture
+def photo():
+    return Image.new('RGB', (640, 480), color=(60, 140, 50))
+
+def test_tta_runs_at_the_tier_input_size(tiered, photo):
+    status, confidence, spread = tta.analyze_image_tta(photo, num_views=4, tier='accurate')
+
+    assert status is False and confidence == pytest.approx(0.8)
+    assert spread is not None
+    assert tiered == ['accurate']
+
+def test_tiling_cuts_tiles_at_the_tier_input_size(tiered, photo):
+    status, confidence, heatmap = tiling.analyze_image_tiled(photo, tier='accurate')
+
+    assert status is False and confidence == pytest.approx(0.8)
+    assert heatmap is not None
+    assert tiered == ['accurate']
+
+def test_plan_tiles_uses_the_tile_size():
+    scale, xs, ys = tiling.plan_tiles(640, 480, stride=80, max_tiles=64, tile_size=(160, 160))
+    assert scale == 1.0
+    assert xs[-1] + 160 == 640 and ys[-1] + 160 == 480
+
+def test_main_model_sentinel_overrides_the_default_tier(monkeypatch):
+    from app.utils import model_family
+    monkeypatch.setattr(model_family, 'DEFAULT_TIER', 'fast')
+
+    assert model_utils._resolve_tier(None) == 'fast'
+    assert model_utils._resolve_tier(MAIN_MODEL) == ''
+
+def test_tiers_never_share_a_member():
+    members = [{'input_size': 160, 'cpu_latency_ms': 1.9, 'val_accuracy': 0.67},
+               {'input_size': 224, 'cpu_latency_ms': 3.2, 'val_accuracy': 0.67},
+               {'input_size': 96, 'cpu_latency_ms': 1.0, 'val_accuracy': 0.33}]
+    assert choose_tiers(members, max_accuracy_loss=0.02) == {'accurate': members[0]}
+
+    tiers = choose_tiers(members, max_accuracy_loss=0.5)
+    assert tiers['accurate']['input_size'] == 160 and tiers['fast']['input_size'] == 96
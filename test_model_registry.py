@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Regression tests for publishing, activating and rolling back model versions."""
+import os
+import sys
+
+import pytest
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.model_registry import HotSwapModel, ModelRegistry, active_model_path, active_threshold
+
+class FileModel:
+    """Stand-in model that remembers which file it was loaded from."""
+
+    input_shape = (None, 224, 224, 3)
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.content = f.read()
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    for index, threshold in enumerate((0.5, 0.6, 0.7), start=1):
+        source = tmp_path / f'model_{index}.h5'
+        source.write_bytes(f'weights-{index}'.encode())
+        registry.publish(str(source), {'threshold': threshold})
+    return registry
+
+def test_publish_activates_the_newest_version(registry):
+    assert registry.list_versions() == ['v1', 'v2', 'v3']
+    assert registry.active_version() == 'v3'
+    assert active_threshold(registry.root) == 0.7
+
+def test_rollback_walks_back_through_history(registry):
+    assert registry.rollback() == 'v2'
+    assert registry.active_version() == 'v2'
+    assert active_threshold(registry.root) == 0.6
+    assert active_model_path(registry.root) == registry.model_path('v2')
+
+    assert registry.rollback() == 'v1'
+    with pytest.raises(ValueError):
+        registry.rollback()
+    assert registry.active_version() == 'v1'
+
+def test_rollback_after_reactivating_an_old_version(registry):
+    registry.activate('v1')
+    assert registry.rollback() == 'v3'
+
+def test_activate_rejects_unknown_versions(registry):
+    with pytest.raises(ValueError):
+        registry.activate('v9')
+    assert registry.active_version() == 'v3'
+
+def test_hot_swap_model_follows_a_rollback(registry):
+    model = HotSwapModel(registry, FileModel, watch=False)
+    assert model.version == 'v3'
+    assert model.threshold == 0.7
+
+    registry.rollback()
+    assert model.reload()
+    assert model.version == 'v2'
+    assert model.threshold == 0.6
+    assert not model.reload()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Regression tests for the prediction cache key and its invalidation."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import cascade, prediction_cache
+from app.utils.cascade import CascadeStage
+from app.utils.prediction_cache import CACHE_SUBDIR, PredictionCache, hash_bytes
+from app.utils.upload import Upload
+
+IMAGE = b'\xff\xd8\xff\xe0 not really a jpeg, only the bytes matter'
+
+def _model_file(tmp_path, content=b'weights-v1'):
+    path = tmp_path / 'model.h5'
+    path.write_bytes(content)
+    return str(path)
+
+def _stage(high):
+    return CascadeStage(np.zeros(23), 0.0, np.zeros(23), np.ones(23), 0.2, high)
+
+def test_upload_and_raw_bytes_share_a_key(tmp_path):
+    cache = PredictionCache(model_path=_model_file(tmp_path))
+    cache.put(IMAGE, (True, 0.9))
+
+    assert Upload(IMAGE).hash == hash_bytes(IMAGE)
+    assert cache.get(Upload(IMAGE)) == (True, 0.9)
+    assert cache.get(IMAGE + b'x') is None
+
+def test_replacing_the_model_invalidates_memory_and_disk(tmp_path):
+    model_path = _model_file(tmp_path)
+    cache = PredictionCache(disk_dir=str(tmp_path / 'cache'), model_path=model_path)
+    cache.put(IMAGE, (True, 0.9))
+    old_fingerprint = cache.model_fingerprint()
+
+    with open(model_path, 'wb') as f:
+        f.write(b'weights-v2')
+    os.utime(model_path, ns=(1, 1))
+
+    assert cache.get(IMAGE) is None
+    assert cache.model_fingerprint() != old_fingerprint
+    assert old_fingerprint not in os.listdir(os.path.join(tmp_path, 'cache', CACHE_SUBDIR))
+
+def test_disk_tier_survives_a_new_cache_instance(tmp_path):
+    model_path = _model_file(tmp_path)
+    PredictionCache(disk_dir=str(tmp_path / 'cache'), model_path=model_path).put(IMAGE, (False, 0.7))
+
+    fresh = PredictionCache(disk_dir=str(tmp_path / 'cache'), model_path=model_path)
+    assert fresh.get(IMAGE) == (False, 0.7)
+    assert fresh.stats()['disk_hits'] == 1
+
+def test_backend_and_precision_are_part_of_the_fingerprint(tmp_path):
+    model_path = _model_file(tmp_path)
+    float32 = PredictionCache(model_path=model_path, backend='keras', precision='float32')
+    float16 = PredictionCache(model_path=model_path, backend='keras', precision='float16')
+    onnx = PredictionCache(model_path=model_path, backend='onnx')
+
+    fingerprints = {float32.model_fingerprint(), float16.model_fingerprint(), onnx.model_fingerprint()}
+    assert len(fingerprints) == 3
+
+@pytest.fixture
+def followed(tmp_path, monkeypatch):
+    """A cache following the served model, with the registry state and cascade stage in tmp_path."""
+    model_path = _model_file(tmp_path)
+    registry_dir = tmp_path / 'registry'
+    registry_dir.mkdir()
+    monkeypatch.setattr(prediction_cache, 'REGISTRY_DIR', str(registry_dir))
+    monkeypatch.setattr(cascade, 'CASCADE_PATH', str(tmp_path / 'cascade_stage.json'))
+    monkeypatch.setattr(prediction_cache, 'get_model_path', lambda backend=None: model_path)
+    state = {'stage': _stage(0.8), 'threshold': 0.5, 'reads': 0}
+
+    def active_threshold():
+        state['reads'] += 1
+        return state['threshold']
+
+    monkeypatch.setattr(prediction_cache, 'active_threshold', active_threshold)
+    monkeypatch.setattr(cascade, 'get_cascade_stage', lambda: state['stage'])
+    return state
+
+def _touch(path, content):
+    """Rewrite a file with a new mtime so stat-based change checks see it."""
+    path.write_text(content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+def test_changing_the_cascade_stage_invalidates_results(tmp_path, followed):
+    cache = PredictionCache()
+    cache.put(IMAGE, (True, 0.9))
+    assert cache.get(IMAGE) == (True, 0.9)
+
+    followed['stage'] = _stage(0.9)
+    _touch(tmp_path / 'cascade_stage.json', 'retuned')
+    assert cache.get(IMAGE) is None
+
+    followed['stage'] = None
+    os.remove(tmp_path / 'cascade_stage.json')
+    assert cache.get(IMAGE) is None
+
+def test_lookups_reuse_the_fingerprint_until_the_registry_swaps(tmp_path, followed):
+    cache = PredictionCache()
+    cache.put(IMAGE, (True, 0.9))
+    reads = followed['reads']
+    for _ in range(20):
+        assert cache.get(IMAGE) == (True, 0.9)
+    assert followed['reads'] == reads
+
+    followed['threshold'] = 0.7
+    _touch(tmp_path / 'registry' / 'state.json', '{"active": "v2"}')
+    assert cache.get(IMAGE) is None
+    assert followed['reads'] > reads
+
+def test_changing_backend_or_precision_invalidates_results(tmp_path):
+    cache = PredictionCache(model_path=_model_file(tmp_path), backend='keras', precision='float32')
+    cache.put(IMAGE, (True, 0.9))
+
+    cache.precision = 'float16'
+    assert cache.get(IMAGE) is None
+    cache.put(IMAGE, (True, 0.8))
+    cache.backend, cache.precision = 'onnx', 'float32'
+    assert cache.get(IMAGE) is None
+
+def test_clear_only_removes_directories_the_cache_created(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    (cache_dir / 'other_app').mkdir(parents=True)
+    (cache_dir / 'other_app' / 'keep.txt').write_text('not ours')
+
+    cache = PredictionCache(disk_dir=str(cache_dir), model_path=_model_file(tmp_path))
+    cache.put(IMAGE, (True, 0.9))
+    owned = cache_dir / CACHE_SUBDIR
+    (owned / 'notes').mkdir()
+
+    cache.clear()
+    assert (cache_dir / 'other_app' / 'keep.txt').exists()
+    assert sorted(os.listdir(owned)) == ['notes']
+    assert cache.get(IMAGE) is None
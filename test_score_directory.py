@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Regression tests: an interrupted score_directory.py run resumes without duplicate rows."""
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import score_directory
+from app.utils import cascade
+
+class ConstantModel:
+    input_shape = (None, 224, 224, 3)
+
+    def predict(self, x, batch_size=None, verbose=0):
+        return np.full((len(x), 1), 0.8, dtype=np.float32)
+
+@pytest.fixture
+def image_tree(tmp_path):
+    root = tmp_path / 'images'
+    for folder in ('bed_a', 'bed_b'):
+        (root / folder).mkdir(parents=True)
+        for index in range(5):
+            Image.new('RGB', (64, 64), color=(20 * index, 150, 40)).save(root / folder / f'leaf_{index}.png')
+    return root
+
+@pytest.fixture(autouse=True)
+def fake_model(monkeypatch):
+    monkeypatch.setattr(score_directory, 'load_model', lambda *args, **kwargs: ConstantModel())
+    monkeypatch.setattr(cascade, 'CASCADE_ENABLED', False)
+
+def _run(monkeypatch, root, output):
+    monkeypatch.setattr(sys, 'argv', ['score_directory.py', str(root), '--output', str(output),
+                                      '--batch-size', '3', '--decode-workers', '1'])
+    score_directory.main()
+
+def _read_paths(output):
+    with open(output, newline='') as f:
+        if str(output).endswith('.csv'):
+            return [row['path'] for row in csv.DictReader(f)]
+        return [json.loads(line)['path'] for line in f]
+
+@pytest.mark.parametrize('name', ['results.jsonl', 'results.csv'])
+def test_interrupt_between_rows_and_checkpoint_does_not_duplicate(monkeypatch, image_tree, tmp_path, name):
+    output = tmp_path / name
+    real_save = score_directory.save_checkpoint
+    saves = []
+
+    def interrupted_save(path, checkpoint):
+        # The second batch reaches the output file, but the process dies before its checkpoint
+        if len(saves) == 1:
+            raise KeyboardInterrupt
+        saves.append(checkpoint)
+        real_save(path, checkpoint)
+
+    monkeypatch.setattr(score_directory, 'save_checkpoint', interrupted_save)
+    _run(monkeypatch, image_tree, output)
+    assert len(_read_paths(output)) == 6
+
+    monkeypatch.setattr(score_directory, 'save_checkpoint', real_save)
+    _run(monkeypatch, image_tree, output)
+
+    paths = _read_paths(output)
+    assert len(paths) == 10
+    assert len(set(paths)) == 10
+    with open(f"{output}.checkpoint") as f:
+        assert json.load(f)['output_bytes'] == os.path.getsize(output)
+
+def test_completed_run_resumes_to_nothing(monkeypatch, image_tree, tmp_path):
+    output = tmp_path / 'results.jsonl'
+    _run(monkeypatch, image_tree, output)
+    _run(monkeypatch, image_tree, output)
+
+    assert sorted(_read_paths(output)) == sorted(set(_read_paths(output)))
+    assert len(_read_paths(output)) == 10
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Regression tests for tiled analysis: tile planning, lesion localization and the heatmap."""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.tiling import HEATMAP_DOWNSAMPLE, analyze_image_tiled, heatmap_overlay, plan_tiles
+
+class LesionModel:
+    """Stand-in model that calls a tile unhealthy once a quarter of it is brown."""
+
+    input_shape = (None, 224, 224, 3)
+    threshold = 0.5
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, x, batch_size=None, verbose=0):
+        self.batch_sizes.append(len(x))
+        brown = (x[..., 0] - x[..., 1]) > 0.2
+        unhealthy = np.clip(brown.mean(axis=(1, 2)) * 4, 0, 1)
+        return (1.0 - unhealthy)[:, np.newaxis].astype(np.float32)
+
+@pytest.fixture
+def leaf_with_lesion():
+    image = Image.new('RGB', (896, 672), color=(40, 150, 50))
+    ImageDraw.Draw(image).rectangle((700, 500, 860, 640), fill=(150, 80, 30))
+    return image
+
+def test_tile_grid_covers_the_image_edge_to_edge():
+    scale, xs, ys = plan_tiles(1000, 600, stride=112, max_tiles=64)
+    assert scale == 1.0
+    assert xs[0] == 0 and xs[-1] + 224 == 1000
+    assert ys[0] == 0 and ys[-1] + 224 == 600
+    assert all(b - a <= 112 for a, b in zip(xs, xs[1:]))
+
+def test_large_images_are_downscaled_to_the_tile_budget():
+    scale, xs, ys = plan_tiles(6000, 4000, stride=112, max_tiles=16)
+    assert scale < 1.0
+    assert len(xs) * len(ys) <= 16
+
+def test_small_images_are_upscaled_to_one_tile():
+    scale, xs, ys = plan_tiles(100, 80, stride=112, max_tiles=16)
+    assert round(100 * scale) >= 224 and round(80 * scale) >= 224
+    assert xs[0] == 0 and ys[0] == 0
+
+def test_a_small_lesion_makes_the_leaf_unhealthy_and_lights_up_its_corner(leaf_with_lesion):
+    model = LesionModel()
+    status, confidence, heatmap = analyze_image_tiled(leaf_with_lesion, stride=112, model=model)
+
+    assert status is False and confidence > 0.5
+    assert sum(model.batch_sizes) == 7 * 5
+    assert heatmap.shape == (672 // HEATMAP_DOWNSAMPLE, 896 // HEATMAP_DOWNSAMPLE)
+    hottest = np.unravel_index(np.argmax(heatmap), heatmap.shape)
+    assert hottest[0] >= heatmap.shape[0] // 2 and hottest[1] >= heatmap.shape[1] // 2
+    assert heatmap[:10, :10].max() == 0.0
+
+def test_overlay_matches_the_image_and_reddens_hot_regions():
+    image = Image.new('RGB', (64, 32), color=(40, 150, 50))
+    heatmap = np.zeros((4, 8), dtype=np.float32)
+    heatmap[:, 4:] = 1.0
+
+    overlay = np.asarray(heatmap_overlay(image, heatmap))
+    assert overlay.shape == (32, 64, 3)
+    np.testing.assert_array_equal(overlay[:, :16], np.asarray(image)[:, :16])
+    assert overlay[:, -16:, 0].min() > 40
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Regression tests for per-stage latency percentiles and their export."""
+import os
+import random
+import sys
+
+import pytest
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import timing
+from app.utils.timing import LatencyHistogram
+
+@pytest.fixture
+def timing_on():
+    was_enabled = timing.is_enabled()
+    timing.reset()
+    timing.enable()
+    yield
+    timing.enable(was_enabled)
+    timing.reset()
+
+def test_percentiles_of_a_known_distribution():
+    histogram = LatencyHistogram()
+    samples = [index / 1000 for index in range(101)]
+    random.Random(0).shuffle(samples)
+    for seconds in samples:
+        histogram.observe(seconds)
+
+    stats = histogram.snapshot()
+    assert stats['count'] == 101
+    assert stats['p50'] == pytest.approx(0.050)
+    assert stats['p95'] == pytest.approx(0.095)
+    assert stats['p99'] == pytest.approx(0.099)
+    assert stats['mean'] == pytest.approx(0.050)
+    assert stats['max'] == pytest.approx(0.100)
+    # Buckets are cumulative and inclusive of their upper bound
+    assert stats['buckets']['0.01'] == 11
+    assert stats['buckets']['0.1'] == 101 and stats['buckets']['+Inf'] == 101
+
+def test_percentiles_follow_recent_samples_while_totals_cover_all():
+    histogram = LatencyHistogram(reservoir_size=4)
+    for seconds in (5.0, 5.0, 0.001, 0.002, 0.003, 0.004):
+        histogram.observe(seconds)
+
+    stats = histogram.snapshot()
+    assert stats['count'] == 6 and stats['max'] == 5.0
+    assert stats['p99'] == pytest.approx(0.004)
+
+def test_empty_histogram_reports_zeros():
+    stats = LatencyHistogram().snapshot()
+    assert stats['count'] == 0 and stats['mean'] == 0.0 and stats['p95'] == 0.0
+
+def test_spans_record_only_while_enabled(timing_on):
+    with timing.span('decode'):
+        pass
+    timing.record('inference', 0.02)
+    timing.enable(False)
+    with timing.span('decode'):
+        pass
+    timing.record('inference', 0.02)
+
+    stats = timing.snapshot()
+    assert stats['decode']['count'] == 1
+    assert stats['inference']['count'] == 1 and stats['inference']['p50'] == pytest.approx(0.02)
+
+def test_prometheus_text_exposes_buckets_and_quantiles(timing_on):
+    timing.record('resize', 0.003)
+    text = timing.prometheus_text()
+
+    assert 'plant_care_stage_latency_seconds_bucket{stage="resize",le="0.005"} 1' in text
+    assert 'plant_care_stage_latency_seconds_bucket{stage="resize",le="0.0025"} 0' in text
+    assert 'plant_care_stage_latency_seconds_count{stage="resize"} 1' in text
+    assert 'plant_care_stage_latency_seconds_quantile{stage="resize",quantile="0.95"} 0.003000' in text
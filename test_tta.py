@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Regression tests for test-time augmentation views and how their scores are combined."""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.tta import MAX_TTA_VIEWS, aggregate_predictions, analyze_image_tta, make_views
+
+@pytest.fixture
+def img_array():
+    # A left-to-right gradient, so flips and crops are distinguishable from the original
+    gradient = np.linspace(0.0, 1.0, 32, dtype=np.float32)
+    return np.repeat(np.tile(gradient, (32, 1))[:, :, np.newaxis], 3, axis=2)
+
+def test_views_start_with_the_original_and_its_flip(img_array):
+    views = make_views(img_array, 4)
+
+    assert views.shape == (4, 32, 32, 3) and views.dtype == np.float32
+    np.testing.assert_array_equal(views[0], img_array)
+    np.testing.assert_array_equal(views[1], img_array[:, ::-1])
+    assert not np.allclose(views[2], img_array)
+
+def test_view_count_is_bounded(img_array):
+    assert len(make_views(img_array, MAX_TTA_VIEWS)) == MAX_TTA_VIEWS
+    for num_views in (0, MAX_TTA_VIEWS + 1):
+        with pytest.raises(ValueError):
+            make_views(img_array, num_views)
+
+def test_aggregate_uses_the_mean_and_reports_the_spread():
+    status, confidence, spread = aggregate_predictions(np.array([[0.9], [0.7], [0.2], [0.6]]))
+    assert status is True
+    assert confidence == pytest.approx(0.6)
+    assert spread == pytest.approx(np.std([0.9, 0.7, 0.2, 0.6]))
+
+    # The mean is compared with the model's own threshold
+    status, confidence, _ = aggregate_predictions(np.array([0.6, 0.6]), threshold=0.65)
+    assert status is False and confidence == pytest.approx(0.4)
+
+class ViewCountingModel:
+    input_shape = (None, 224, 224, 3)
+    threshold = 0.5
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, x, batch_size=None, verbose=0):
+        self.batches.append(len(x))
+        return np.linspace(0.55, 0.95, len(x), dtype=np.float32)[:, np.newaxis]
+
+def test_all_views_are_scored_in_one_forward_pass():
+    model = ViewCountingModel()
+    status, confidence, spread = analyze_image_tta(Image.new('RGB', (300, 200), (40, 150, 50)), 6, model=model)
+
+    assert model.batches == [6]
+    assert status is True and confidence == pytest.approx(0.75)
+    assert spread > 0
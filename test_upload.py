@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Regression tests: one Upload is decoded and hashed at most once across its consumers."""
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import upload as upload_module
+from app.utils.decoding import ImageDecodeError
+from app.utils.model_utils import prepare_image_array
+from app.utils.upload import Upload
+
+def _jpeg(size):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=(60, 140, 50)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Count the real decodes Upload performs."""
+    calls = []
+    real_decode = upload_module.decode_image
+
+    def counting_decode(data, min_size=None):
+        calls.append(min_size)
+        return real_decode(data, min_size)
+
+    monkeypatch.setattr(upload_module, 'decode_image', counting_decode)
+    return calls
+
+def test_preview_decode_serves_the_model_input(decodes):
+    upload = Upload(_jpeg((1600, 1200)))
+    preview = upload.image()
+    array = prepare_image_array(upload, (224, 224))
+
+    assert preview.size == (1600, 1200)
+    assert array.shape == (224, 224, 3)
+    assert decodes == [None]
+
+def test_reduced_decode_is_reused_until_a_larger_one_is_needed(decodes):
+    upload = Upload(_jpeg((2000, 1600)))
+    reduced = upload.decoded((224, 224))
+    assert upload.decoded((224, 224)) is reduced
+    assert upload.decoded((200, 150)) is reduced
+    assert reduced.reduction > 1
+
+    assert upload.decoded().size == (2000, 1600)
+    assert upload.decoded((600, 600)).reduction == 1
+    assert decodes == [(224, 224), None]
+
+def test_failed_decode_is_not_retried(decodes):
+    upload = Upload(b'\xff\xd8\xff not a real jpeg')
+    for _ in range(3):
+        with pytest.raises(ImageDecodeError):
+            upload.decoded()
+    assert len(decodes) == 1
+
+def test_hash_matches_the_bytes_and_the_cache_key():
+    data = _jpeg((64, 64))
+    upload = Upload(data)
+    assert upload.hash == hashlib.sha256(data).hexdigest()
+    assert upload.hash is upload.hash
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Regression tests for splitting work across the inference pool and keeping input order."""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add app directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.worker_pool import InferencePool
+
+@pytest.fixture
+def pool():
+    # Worker processes are only spawned on the first submit, which these tests never reach
+    pool = InferencePool(num_workers=3)
+    yield pool
+    pool.shutdown()
+
+def test_split_of_nothing_is_empty(pool):
+    assert pool._split([]) == []
+
+def test_split_keeps_order_and_never_makes_empty_chunks(pool):
+    chunks = pool._split(list(range(7)))
+    assert [item for chunk in chunks for item in chunk] == list(range(7))
+    assert len(chunks) == 3 and all(chunks)
+    assert pool._split([1]) == [[1]]
+
+def test_empty_inputs_do_not_reach_the_workers(pool):
+    assert pool.analyze_images([]) == []
+    assert pool.predict([]).shape == (0, 1)
+
+def test_results_come_back_in_input_order(pool, monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=4)
+
+    def score(chunk):
+        # Earlier chunks finish last, so completion order is the reverse of input order
+        time.sleep(0.05 * (10 - chunk[0]) / 10)
+        return [(True, float(item)) for item in chunk], [None] * len(chunk)
+
+    monkeypatch.setattr(pool, 'submit', lambda chunk: executor.submit(score, list(chunk)))
+    try:
+        results = pool.analyze_images(list(range(10)))
+    finally:
+        executor.shutdown()
+    assert [confidence for _, confidence in results] == [float(item) for item in range(10)]
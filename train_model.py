@@ -2,6 +2,7 @@ import tensorflow as tf
 from tensorflow.keras import layers, models
 import numpy as np
 import os
+import argparse
 import cv2
 from sklearn.model_selection import train_test_split
 
@@ -9,7 +10,10 @@ from sklearn.model_selection import train_test_split
 tf.random.set_seed(42)
 np.random.seed(42)
 
-def load_images_from_folder(folder, label):
+def load_images_from_folder(folder, label, input_size=224):
+    # Decode the way the app does: large JPEGs at the smallest DCT scale covering input_size
+    from app.utils.decoding import decode_image
+
     images = []
     labels = []
     for filename in os.listdir(folder):
@@ -17,77 +21,652 @@ def load_images_from_folder(folder, label):
             continue
         img_path = os.path.join(folder, filename)
         try:
-            img = cv2.imread(img_path)
-            if img is not None:
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                img = cv2.resize(img, (224, 224))
-                images.append(img)
-                labels.append(label)
+            img = decode_image(img_path, min_size=(input_size, input_size)).array
+            img = cv2.resize(img, (input_size, input_size))
+            images.append(img)
+            labels.append(label)
         except Exception as e:
             print(f"Error loading {img_path}: {str(e)}")
     return images, labels
 
-def create_model():
-    model = models.Sequential([
-        layers.Conv2D(32, (3, 3), activation='relu', input_shape=(224, 224, 3)),
-        layers.MaxPooling2D((2, 2)),
-        layers.Conv2D(64, (3, 3), activation='relu'),
-        layers.MaxPooling2D((2, 2)),
-        layers.Conv2D(64, (3, 3), activation='relu'),
-        layers.MaxPooling2D((2, 2)),
-        layers.Conv2D(128, (3, 3), activation='relu'),
-        layers.MaxPooling2D((2, 2)),
-        layers.Flatten(),
-        layers.Dense(128, activation='relu'),
-        layers.Dropout(0.5),
-        layers.Dense(1, activation='sigmoid')
-    ])
-    return model
-
-def main():
-    print("Loading images...")
-    # Load data from directories
-    healthy_images, healthy_labels = load_images_from_folder('data/healthy', 1)
-    unhealthy_images, unhealthy_labels = load_images_from_folder('data/unhealthy', 0)
+# Architectures accepted by create_model and --architecture
+ARCHITECTURES = ('baseline', 'gap', 'separable')
 
-    print(f"Loaded {len(healthy_images)} healthy images and {len(unhealthy_images)} unhealthy images")
+def create_model(architecture='baseline', input_size=224):
+    """Build the classifier.
 
-    # Combine datasets
-    X = np.array(healthy_images + unhealthy_images)
-    y = np.array(healthy_labels + unhealthy_labels)
+    Args:
+        architecture: 'baseline' flattens the last feature map into Dense(128)
+            (about 2.4M of its parameters); 'gap' keeps the same conv trunk but
+            uses a global-average-pooling head; 'separable' pairs a strided
+            stem with depthwise-separable conv blocks and a GAP head for a
+            model with a fraction of the parameters and FLOPs
+        input_size: Side length in pixels of the square input images
+
+    Returns:
+        Uncompiled Keras model
+    """
+    if architecture == 'baseline':
+        return models.Sequential([
+            layers.Conv2D(32, (3, 3), activation='relu', input_shape=(input_size, input_size, 3)),
+            layers.MaxPooling2D((2, 2)),
+            layers.Conv2D(64, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.Conv2D(64, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.Conv2D(128, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.Flatten(),
+            layers.Dense(128, activation='relu'),
+            layers.Dropout(0.5),
+            layers.Dense(1, activation='sigmoid')
+        ])
+    if architecture == 'gap':
+        return models.Sequential([
+            layers.Conv2D(32, (3, 3), activation='relu', input_shape=(input_size, input_size, 3)),
+            layers.MaxPooling2D((2, 2)),
+            layers.Conv2D(64, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.Conv2D(64, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.Conv2D(128, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.GlobalAveragePooling2D(),
+            layers.Dense(64, activation='relu'),
+            layers.Dropout(0.3),
+            layers.Dense(1, activation='sigmoid')
+        ])
+    if architecture == 'separable':
+        return models.Sequential([
+            # A strided full convolution quarters the resolution before the separable blocks
+            layers.Conv2D(32, (3, 3), strides=2, activation='relu', input_shape=(input_size, input_size, 3)),
+            layers.SeparableConv2D(64, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.SeparableConv2D(128, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.SeparableConv2D(128, (3, 3), activation='relu'),
+            layers.MaxPooling2D((2, 2)),
+            layers.GlobalAveragePooling2D(),
+            layers.Dropout(0.3),
+            layers.Dense(1, activation='sigmoid')
+        ])
+    raise ValueError(f"Unknown architecture '{architecture}'. Choose one of: {', '.join(ARCHITECTURES)}")
+
+def count_flops(model):
+    """Count floating-point operations (2 per multiply-accumulate) for one image.
+
+    Only convolution and dense layers are counted; pooling and activations
+    are negligible next to them.
+    """
+    flops = 0
+    for layer in model.layers:
+        if isinstance(layer, layers.SeparableConv2D):
+            out_h, out_w, out_channels = layer.output_shape[1:]
+            in_channels = layer.input_shape[-1] * layer.depth_multiplier
+            kernel = layer.kernel_size[0] * layer.kernel_size[1]
+            flops += 2 * out_h * out_w * in_channels * (kernel + out_channels)
+        elif isinstance(layer, layers.Conv2D):
+            out_h, out_w, out_channels = layer.output_shape[1:]
+            kernel = layer.kernel_size[0] * layer.kernel_size[1]
+            flops += 2 * out_h * out_w * out_channels * layer.input_shape[-1] * kernel
+        elif isinstance(layer, layers.Dense):
+            flops += 2 * layer.input_shape[-1] * layer.units
+    return flops
+
+def measure_cpu_latency(model, repeats=30):
+    """Median single-image latency in milliseconds through the serving wrapper."""
+    import time
+    from app.utils.backends import CompiledKerasModel
+
+    serving_model = CompiledKerasModel(model)
+    image = np.random.rand(1, *model.input_shape[1:]).astype(np.float32)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        serving_model.predict(image, verbose=0)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+def profile_model(model, X_val, y_val, architecture):
+    """Report size, compute, CPU latency and validation accuracy of a trained model.
+
+    Returns:
+        dict: architecture, input_size, params, size_mb, mflops, cpu_latency_ms, val_accuracy
+    """
+    predictions = model.predict(X_val, verbose=0)[:, 0]
+    return {
+        'architecture': architecture,
+        'input_size': int(model.input_shape[1]),
+        'params': int(model.count_params()),
+        'size_mb': model.count_params() * 4 / (1024 * 1024),
+        'mflops': count_flops(model) / 1e6,
+        'cpu_latency_ms': measure_cpu_latency(model),
+        'val_accuracy': float(np.mean((predictions > 0.5) == y_val)),
+    }
+
+def print_profiles(profiles):
+    print(f"\n{'architecture':<12} {'input':>5} {'params':>10} {'size MB':>8} {'MFLOPs':>9} {'CPU ms':>8} "
+          f"{'val acc':>8}")
+    for profile in profiles:
+        print(f"{profile['architecture']:<12} {profile['input_size']:>5} {profile['params']:>10,} "
+              f"{profile['size_mb']:>8.2f} {profile['mflops']:>9.1f} {profile['cpu_latency_ms']:>8.1f} "
+              f"{profile['val_accuracy']:>8.4f}")
+
+def compare_architectures(X_train, y_train, X_val, y_val, epochs, output_path='model/architecture_report.json'):
+    """Train every architecture variant on the same split and report them side by side.
 
-    # Normalize pixel values
-    X = X.astype('float32') / 255.0
+    Returns:
+        list: One profile dict per architecture (see ``profile_model``)
+    """
+    import json
 
-    # Split data into train and test sets
+    profiles = []
+    for architecture in ARCHITECTURES:
+        print(f"\nTraining the '{architecture}' architecture...")
+        tf.random.set_seed(42)
+        model = create_model(architecture)
+        model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+        model.fit(X_train, y_train, epochs=epochs, batch_size=32, validation_data=(X_val, y_val), verbose=2)
+        profiles.append(profile_model(model, X_val, y_val, architecture))
+
+    print_profiles(profiles)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(profiles, f, indent=2)
+    print(f"\nArchitecture report saved to {output_path}")
+    return profiles
+
+def load_dataset(input_size=224):
+    """Load data/healthy and data/unhealthy at ``input_size`` and split them 80/20.
+
+    Returns:
+        tuple: (X, y, X_train, X_test, y_train, y_test) with images scaled to [0, 1]
+    """
+    healthy_images, healthy_labels = load_images_from_folder('data/healthy', 1, input_size)
+    unhealthy_images, unhealthy_labels = load_images_from_folder('data/unhealthy', 0, input_size)
+    print(f"Loaded {len(healthy_images)} healthy images and {len(unhealthy_images)} unhealthy images "
+          f"at {input_size}x{input_size}")
+
+    # Combine datasets and normalize pixel values
+    X = np.array(healthy_images + unhealthy_images).astype('float32') / 255.0
+    y = np.array(healthy_labels + unhealthy_labels)
+
+    # The fixed seed gives every resolution the same split
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    return X, y, X_train, X_test, y_train, y_test
+
+def train_model_family(input_sizes, architecture, epochs, max_accuracy_loss=0.02):
+    """Train one model per input resolution and assign the 'fast' and 'accurate' tiers.
+
+    Each member is saved to ``model/family/plant_health_<size>.h5``, and its
+    measured CPU latency and validation accuracy are written with the tier
+    assignment to the family manifest read by ``load_model(tier=...)``.
+
+    Args:
+        input_sizes: Square input resolutions in pixels, e.g. [96, 128, 160, 224]
+        architecture: Architecture shared by every member (see ``create_model``)
+        epochs: Training epochs per member
+        max_accuracy_loss: Accuracy the fast tier may give up versus the accurate tier
+
+    Returns:
+        dict: Tier name -> chosen member profile
+    """
+    from app.utils.model_family import FAMILY_DIR, MANIFEST_PATH, member_path, choose_tiers, save_manifest
+
+    os.makedirs(FAMILY_DIR, exist_ok=True)
+    members = []
+    for input_size in input_sizes:
+        print(f"\nTraining the {input_size}x{input_size} '{architecture}' model...")
+        _, _, X_train, X_test, y_train, y_test = load_dataset(input_size)
+        tf.random.set_seed(42)
+        model = create_model(architecture, input_size)
+        model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+        model.fit(X_train, y_train, epochs=epochs, batch_size=32, validation_data=(X_test, y_test), verbose=2)
+
+        path = member_path(input_size)
+        model.save(path)
+        profile = profile_model(model, X_test, y_test, architecture)
+        profile['model'] = os.path.basename(path)
+        members.append(profile)
+
+    print_profiles(members)
+    tiers = choose_tiers(members, max_accuracy_loss)
+    save_manifest(members, tiers, max_accuracy_loss)
+    if 'fast' not in tiers:
+        print(f"No member is quicker than the accurate one within {max_accuracy_loss:.2%} accuracy; "
+              f"only the 'accurate' tier is offered")
+    for tier, member in tiers.items():
+        print(f"{tier:>8} tier: {member['input_size']}px, {member['cpu_latency_ms']:.1f} ms, "
+              f"accuracy {member['val_accuracy']:.4f}")
+    print(f"\nModel family saved to {FAMILY_DIR} (manifest: {MANIFEST_PATH})")
+    return tiers
+
+def augment_batch(images):
+    """Cheap per-batch augmentations: flips plus small brightness and contrast shifts."""
+    images = tf.image.random_flip_left_right(images)
+    images = tf.image.random_flip_up_down(images)
+    images = tf.image.random_brightness(images, 0.1)
+    images = tf.image.random_contrast(images, 0.9, 1.1)
+    return tf.clip_by_value(images, 0.0, 1.0)
+
+def distill_student(teacher, X_train, y_train, X_val, y_val, architecture='separable', epochs=20,
+                    temperature=2.0, alpha=0.3, output_path='model/plant_health_student.h5'):
+    """Train a small student on the teacher's softened probabilities.
+
+    Every step augments a batch, scores it with the frozen teacher and fits
+    the student to ``alpha`` x hard-label loss plus ``1 - alpha`` x the
+    temperature-softened teacher loss (scaled by temperature squared).
+
+    Args:
+        teacher: Trained model whose probabilities are distilled
+        X_train: Normalized training images
+        y_train: Training labels (1 = healthy)
+        X_val: Held-out images for the comparison report
+        y_val: Held-out labels
+        architecture: Student architecture (see ``create_model``)
+        epochs: Passes over the training images
+        temperature: Softening applied to teacher and student logits
+        alpha: Weight of the hard-label loss
+        output_path: Where to save the student for ``model_utils.load_model``
+
+    Returns:
+        list: Teacher and student profiles (see ``profile_model``)
+    """
+    import json
+
+    def logits(probabilities):
+        probabilities = tf.clip_by_value(probabilities, 1e-6, 1.0 - 1e-6)
+        return tf.math.log(probabilities) - tf.math.log1p(-probabilities)
+
+    student = create_model(architecture)
+    optimizer = tf.keras.optimizers.Adam()
+
+    @tf.function
+    def train_step(images, labels):
+        images = augment_batch(images)
+        soft_targets = tf.sigmoid(logits(teacher(images, training=False)[:, 0]) / temperature)
+        with tf.GradientTape() as tape:
+            probabilities = student(images, training=True)[:, 0]
+            hard_loss = tf.keras.losses.binary_crossentropy(labels, probabilities)
+            soft_loss = tf.keras.losses.binary_crossentropy(
+                soft_targets, tf.sigmoid(logits(probabilities) / temperature))
+            loss = alpha * hard_loss + (1.0 - alpha) * soft_loss * temperature ** 2
+        optimizer.apply_gradients(zip(tape.gradient(loss, student.trainable_variables),
+                                      student.trainable_variables))
+        return loss
+
+    dataset = tf.data.Dataset.from_tensor_slices((X_train, y_train.astype(np.float32)))
+    dataset = dataset.shuffle(len(X_train), seed=42).batch(32)
+    for epoch in range(epochs):
+        losses = [float(train_step(images, labels)) for images, labels in dataset]
+        val_accuracy = np.mean((student.predict(X_val, verbose=0)[:, 0] > 0.5) == y_val)
+        print(f"Epoch {epoch + 1}/{epochs}: distillation loss {np.mean(losses):.4f}, "
+              f"val accuracy {val_accuracy:.4f}")
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    student.save(output_path)
+    print(f"\nStudent model saved to {output_path} (serve it with PLANT_CARE_MODEL=student)")
+
+    profiles = [profile_model(teacher, X_val, y_val, 'teacher'),
+                profile_model(student, X_val, y_val, 'student')]
+    teacher_labels = teacher.predict(X_val, verbose=0)[:, 0] > 0.5
+    profiles[1]['teacher_agreement'] = float(np.mean((student.predict(X_val, verbose=0)[:, 0] > 0.5) == teacher_labels))
+    profiles[1]['student_architecture'] = architecture
+    for profile in profiles:
+        # Single-core, batch-of-one throughput implied by the measured latency
+        profile['images_per_minute'] = 60000.0 / profile['cpu_latency_ms']
+
+    print_profiles(profiles)
+    print(f"Student agrees with the teacher on {profiles[1]['teacher_agreement']:.1%} of held-out images; "
+          f"{profiles[1]['images_per_minute']:,.0f} vs {profiles[0]['images_per_minute']:,.0f} images/minute "
+          f"at batch size 1")
+
+    report_path = os.path.splitext(output_path)[0] + '.report.json'
+    with open(report_path, 'w') as f:
+        json.dump(profiles, f, indent=2)
+    print(f"Distillation report saved to {report_path}")
+    return profiles
+
+def export_tflite(model, calibration_images, X_test, y_test,
+                  output_path='model/plant_health_model_int8.tflite', num_calibration=100):
+    """Export a post-training int8-quantized TFLite model and report its accuracy delta.
+
+    Args:
+        model: Trained Keras model
+        calibration_images: Normalized float32 images used to calibrate activation ranges
+        X_test: Held-out images for the accuracy comparison
+        y_test: Held-out labels
+        output_path: Where to write the .tflite file
+        num_calibration: Maximum number of calibration images
+
+    Returns:
+        Tuple of (keras_accuracy, tflite_accuracy)
+    """
+    from app.utils.backends import TFLiteModel
+
+    def representative_dataset():
+        for image in calibration_images[:num_calibration]:
+            yield [np.expand_dims(image, axis=0).astype('float32')]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    tflite_model = converter.convert()
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+
+    keras_predictions = model.predict(X_test, verbose=0)[:, 0]
+    tflite_predictions = TFLiteModel(output_path).predict(X_test)[:, 0]
+    keras_accuracy = float(np.mean((keras_predictions > 0.5) == y_test))
+    tflite_accuracy = float(np.mean((tflite_predictions > 0.5) == y_test))
+
+    print(f"\nTFLite int8 model saved to {output_path} ({len(tflite_model) / 1024:.1f} KB)")
+    print(f"Keras test accuracy:  {keras_accuracy:.4f}")
+    print(f"TFLite test accuracy: {tflite_accuracy:.4f}")
+    print(f"Accuracy delta:       {tflite_accuracy - keras_accuracy:+.4f}")
+    return keras_accuracy, tflite_accuracy
+
+def export_onnx(model, output_path='model/plant_health_model.onnx', opset=13):
+    """Convert the Keras model to ONNX for the onnxruntime backend.
+
+    Args:
+        model: Trained Keras model
+        output_path: Where to write the .onnx file
+        opset: ONNX opset version to target
+    """
+    import tf2onnx
+
+    # Export at the model's own resolution so family members and 224px models both convert
+    input_signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='input')]
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tf2onnx.convert.from_keras(model, input_signature=input_signature, opset=opset, output_path=output_path)
+    print(f"\nONNX model saved to {output_path} ({os.path.getsize(output_path) / 1024:.1f} KB)")
+
+def check_onnx_parity(model, onnx_path='model/plant_health_model.onnx', tolerance=1e-4):
+    """Compare ONNX Runtime outputs with Keras outputs on the bundled data/ images.
+
+    Args:
+        model: Keras model the ONNX file was exported from
+        onnx_path: Path to the exported .onnx file
+        tolerance: Maximum allowed absolute difference between probabilities
+
+    Returns:
+        bool: True if every output is within tolerance and all labels agree
+    """
+    from app.utils.backends import OnnxModel
+
+    healthy_images, _ = load_images_from_folder('data/healthy', 1)
+    unhealthy_images, _ = load_images_from_folder('data/unhealthy', 0)
+    X = np.array(healthy_images + unhealthy_images).astype('float32') / 255.0
+
+    keras_predictions = model.predict(X, verbose=0)[:, 0]
+    onnx_predictions = OnnxModel(onnx_path).predict(X)[:, 0]
+
+    max_diff = float(np.max(np.abs(keras_predictions - onnx_predictions)))
+    label_agreement = float(np.mean((keras_predictions > 0.5) == (onnx_predictions > 0.5)))
+    passed = max_diff <= tolerance and label_agreement == 1.0
+
+    print(f"\nONNX parity check on {len(X)} bundled images:")
+    print(f"Max absolute difference: {max_diff:.2e} (tolerance {tolerance:.0e})")
+    print(f"Label agreement:         {label_agreement:.2%}")
+    print(f"Parity check {'passed' if passed else 'FAILED'}")
+    return passed
+
+def export_flat_weights(model, architecture_path='model/plant_health_model.json',
+                        weights_path='model/plant_health_model.weights.bin', dtype=None):
+    """Export the architecture plus a flat weight file that the app loads through a memory map."""
+    from app.utils.backends import save_flat_weights
+
+    os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+    save_flat_weights(model, architecture_path, weights_path, dtype=dtype)
+    print(f"\nMemory-mappable model saved to {architecture_path} and {weights_path} "
+          f"({os.path.getsize(weights_path) / 1024:.1f} KB)")
+
+def check_precision(model, X, y, model_path='model/plant_health_model.h5',
+                    gate_path='model/precision_check.json'):
+    """Check the reduced-precision serving modes against float32 and record which ones pass.
+
+    Args:
+        model: Trained float32 Keras model
+        X: Normalized held-out images to check on (the gate proves nothing on training images)
+        y: Binary labels (1 = healthy)
+        model_path: Saved model file the results apply to
+        gate_path: Where to write the results read by the app at load time
+
+    Returns:
+        dict: Check results per precision
+    """
+    from app.utils.precision import run_precision_check, save_precision_gate
+
+    results = {}
+    print(f"\nReduced-precision check on {len(X)} held-out images:")
+    for precision in ('bfloat16', 'float16'):
+        result = run_precision_check(model, X, y, precision)
+        results[precision] = result
+        print(f"{precision:<9} accuracy {result['accuracy']:.4f} (float32 {result['float32_accuracy']:.4f}), "
+              f"label agreement {result['label_agreement']:.2%}, max diff {result['max_abs_diff']:.2e} "
+              f"-> {'passed' if result['passed'] else 'FAILED'}")
+
+    save_precision_gate(gate_path, model_path, results)
+    print(f"Precision check results saved to {gate_path}")
+
+    if results['float16']['passed']:
+        export_flat_weights(model, 'model/plant_health_model.fp16.json',
+                            'model/plant_health_model.fp16.weights.bin', dtype=np.float16)
+    return results
+
+def publish_model(model, model_path, X_test, y_test, threshold=0.5):
+    """Publish the saved model to the registry so running apps hot-swap to it.
+
+    Args:
+        model: Trained Keras model that was saved to ``model_path``
+        model_path: Saved .h5 file to publish
+        X_test: Held-out images used for the recorded metrics
+        y_test: Held-out labels
+        threshold: Decision threshold stored with the version
+
+    Returns:
+        str: The new version name
+    """
+    from app.utils.model_registry import ModelRegistry
+
+    predictions = model.predict(X_test, verbose=0)[:, 0]
+    metrics = {'test_accuracy': float(np.mean((predictions > threshold) == y_test)),
+               'test_images': int(len(X_test))}
+    version = ModelRegistry().publish(model_path, {'threshold': threshold, 'metrics': metrics})
+    print(f"\nPublished {model_path} to the model registry as {version} "
+          f"(test accuracy {metrics['test_accuracy']:.4f})")
+    return version
+
+def train_cascade_stage(model, X_train, y_train, X_val, y_val, model_path='model/plant_health_model.h5',
+                        max_accuracy_loss=0.01, output_path='model/cascade_stage.json', threshold=0.5):
+    """Train the cheap color-histogram stage that answers obvious images before the CNN.
+
+    The held-out images are split in two: the escalation band is tuned on one
+    half and the reported metrics come from the other, so the saved
+    validation numbers are not measured on the images the band was fitted to.
+
+    Args:
+        model: Trained CNN the stage sits in front of
+        X_train: Normalized training images
+        y_train: Training labels (1 = healthy)
+        X_val: Held-out images, split into a tuning half and a reporting half
+        y_val: Held-out labels
+        model_path: Saved CNN file the stage is tied to
+        max_accuracy_loss: Allowed accuracy drop of the cascade versus the CNN alone
+        output_path: Where to write the stage for the app
+        threshold: Decision threshold of the CNN, also applied to stage-1 answers
+
+    Returns:
+        dict: Tuned band and validation metrics
+    """
+    from sklearn.linear_model import LogisticRegression
+    from app.utils.cascade import CascadeStage, color_features, tune_band
+    from app.utils.precision import file_fingerprint
+
+    features = color_features(X_train)
+    feature_mean = features.mean(axis=0)
+    feature_std = np.maximum(features.std(axis=0), 1e-6)
+    classifier = LogisticRegression(max_iter=1000)
+    classifier.fit((features - feature_mean) / feature_std, y_train)
+
+    stratify = y_val if min(np.bincount(np.asarray(y_val, dtype=np.int64), minlength=2)) >= 2 else None
+    X_tune, X_report, y_tune, y_report = train_test_split(X_val, y_val, test_size=0.5, random_state=42,
+                                                          stratify=stratify)
+
+    stage = CascadeStage(classifier.coef_[0], classifier.intercept_[0], feature_mean, feature_std, 0.0, 1.0)
+    band = tune_band(stage.predict_proba(X_tune), model.predict(X_tune, verbose=0)[:, 0], y_tune,
+                     max_accuracy_loss, threshold)
+
+    # Measure the tuned band on the images it was not fitted to
+    stage_probabilities = stage.predict_proba(X_report)
+    cnn_predictions = model.predict(X_report, verbose=0)[:, 0] > threshold
+
+    def evaluate(low, high):
+        confident = (stage_probabilities < low) | (stage_probabilities > high)
+        cascade_predictions = np.where(confident, stage_probabilities > threshold, cnn_predictions)
+        return {'low': float(low), 'high': float(high),
+                'stage1_hit_rate': float(np.mean(confident)),
+                'cnn_accuracy': float(np.mean(cnn_predictions == y_report)),
+                'cascade_accuracy': float(np.mean(cascade_predictions == y_report)),
+                'images': int(len(X_report)), 'tuning_images': int(len(X_tune))}
+
+    validation = evaluate(band['low'], band['high'])
+    if validation['cnn_accuracy'] - validation['cascade_accuracy'] > max_accuracy_loss + 1e-9:
+        # The band does not generalize; escalate every image rather than ship an inaccurate shortcut
+        print(f"⚠️ Tuned band loses {validation['cnn_accuracy'] - validation['cascade_accuracy']:.4f} accuracy "
+              f"on the reporting images; saving a band that sends every image to the CNN")
+        validation = evaluate(0.0, 1.0)
+    stage.low, stage.high = validation['low'], validation['high']
+    stage.metadata = {'model_fingerprint': file_fingerprint(model_path), 'max_accuracy_loss': max_accuracy_loss,
+                      'threshold': threshold, 'validation': validation}
+    stage.save(output_path)
+
+    print(f"\nCascade stage saved to {output_path}")
+    print(f"Escalation band (tuned on {len(X_tune)} held-out images): answer below {stage.low:.3f} "
+          f"or above {stage.high:.3f}, otherwise run the CNN")
+    print(f"Validation on {len(X_report)} other held-out images: color stage answers "
+          f"{validation['stage1_hit_rate']:.1%} of images; accuracy {validation['cascade_accuracy']:.4f} "
+          f"vs CNN alone {validation['cnn_accuracy']:.4f}")
+    if len(X_report) < 50:
+        print("⚠️ Fewer than 50 held-out images: treat these cascade metrics as a rough estimate")
+    return validation
+
+def main(args):
+    if args.train_family:
+        train_model_family(args.input_sizes, args.architecture, args.epochs, args.tier_max_loss)
+        return
+
+    print("Loading images...")
+    X, y, X_train, X_test, y_train, y_test = load_dataset()
+
+    if args.compare_architectures:
+        compare_architectures(X_train, y_train, X_test, y_test, args.epochs)
+        return
 
-    print("Creating and compiling model...")
-    # Create and compile model
-    model = create_model()
-    model.compile(optimizer='adam',
-                loss='binary_crossentropy',
-                metrics=['accuracy'])
-
-    print("Training model...")
-    # Train the model
-    history = model.fit(X_train, y_train,
-                    epochs=20,
-                    batch_size=32,
-                    validation_data=(X_test, y_test))
-
-    # Evaluate model on test set
-    test_loss, test_accuracy = model.evaluate(X_test, y_test)
-    print(f"\nTest accuracy: {test_accuracy:.4f}")
-    print(f"Test loss: {test_loss:.4f}")
-
-    # Create model directory if it doesn't exist
-    os.makedirs('model', exist_ok=True)
-
-    # Save the model
     model_save_path = 'model/plant_health_model.h5'
-    model.save(model_save_path)
-    print(f"\nModel saved to {model_save_path}")
+    if args.skip_training:
+        print(f"Loading existing model from {model_save_path}...")
+        model = tf.keras.models.load_model(model_save_path)
+    else:
+        print(f"Creating and compiling the '{args.architecture}' model...")
+        # Create and compile model
+        model = create_model(args.architecture)
+        model.compile(optimizer='adam',
+                    loss='binary_crossentropy',
+                    metrics=['accuracy'])
+
+        print("Training model...")
+        # Train the model
+        history = model.fit(X_train, y_train,
+                        epochs=args.epochs,
+                        batch_size=32,
+                        validation_data=(X_test, y_test))
+
+        # Evaluate model on test set
+        test_loss, test_accuracy = model.evaluate(X_test, y_test)
+        print(f"\nTest accuracy: {test_accuracy:.4f}")
+        print(f"Test loss: {test_loss:.4f}")
+        print_profiles([profile_model(model, X_test, y_test, args.architecture)])
+
+        # Create model directory if it doesn't exist
+        os.makedirs('model', exist_ok=True)
+
+        # Save the model
+        model.save(model_save_path)
+        print(f"\nModel saved to {model_save_path}")
+
+    if args.distill:
+        print(f"\nDistilling a '{args.student_architecture}' student from the model...")
+        student_path = 'model/plant_health_student.h5'
+        distill_student(model, X_train, y_train, X_test, y_test, args.student_architecture, args.epochs,
+                        temperature=args.temperature, output_path=student_path)
+        if args.export_mmap:
+            export_flat_weights(tf.keras.models.load_model(student_path, compile=False),
+                                'model/plant_health_student.json', 'model/plant_health_student.weights.bin')
+
+    if args.export_mmap:
+        export_flat_weights(model)
+
+    if args.export_tflite:
+        print("\nExporting int8 TFLite model...")
+        export_tflite(model, X_train, X_test, y_test)
+
+    if args.export_onnx:
+        print("\nExporting ONNX model...")
+        export_onnx(model)
+        check_onnx_parity(model)
+
+    if args.check_precision:
+        check_precision(model, X_test, y_test, model_save_path)
+
+    if args.train_cascade:
+        train_cascade_stage(model, X_train, y_train, X_test, y_test, model_save_path,
+                            max_accuracy_loss=args.cascade_max_loss)
+
+    if args.publish:
+        publish_model(model, model_save_path, X_test, y_test)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the Smart Plant Care health classifier")
+    parser.add_argument("--epochs", type=int, default=20, help="Number of training epochs (default: 20)")
+    parser.add_argument("--architecture", choices=ARCHITECTURES, default='baseline',
+                        help="Model variant: 'gap' and 'separable' are much smaller and faster (default: baseline)")
+    parser.add_argument("--compare-architectures", action="store_true",
+                        help="Train every architecture variant and report params, FLOPs, CPU latency and accuracy")
+    parser.add_argument("--train-family", action="store_true",
+                        help="Train one model per --input-sizes resolution into model/family and pick "
+                             "the 'fast' and 'accurate' serving tiers")
+    parser.add_argument("--input-sizes", type=lambda value: [int(size) for size in value.split(',')],
+                        default=[96, 128, 160, 224],
+                        help="Comma-separated input resolutions for --train-family (default: 96,128,160,224)")
+    parser.add_argument("--tier-max-loss", type=float, default=0.02,
+                        help="Accuracy the fast tier may lose versus the accurate tier (default: 0.02)")
+    parser.add_argument("--distill", action="store_true",
+                        help="Also distill a small student into model/plant_health_student.h5 and compare it")
+    parser.add_argument("--student-architecture", choices=ARCHITECTURES, default='separable',
+                        help="Architecture of the distilled student (default: separable)")
+    parser.add_argument("--temperature", type=float, default=2.0,
+                        help="Softening temperature for distillation (default: 2.0)")
+    parser.add_argument("--skip-training", action="store_true",
+                        help="Load the existing model/plant_health_model.h5 instead of training a new one")
+    parser.add_argument("--export-mmap", action="store_true",
+                        help="Also export a fast-loading architecture + memory-mapped weights artifact")
+    parser.add_argument("--export-tflite", action="store_true",
+                        help="Also export a post-training int8-quantized TFLite model")
+    parser.add_argument("--export-onnx", action="store_true",
+                        help="Also export an ONNX model and check its parity with Keras")
+    parser.add_argument("--train-cascade", action="store_true",
+                        help="Also train the cheap color-histogram stage that skips the CNN for obvious images")
+    parser.add_argument("--cascade-max-loss", type=float, default=0.01,
+                        help="Accuracy the cascade may lose versus the CNN alone (default: 0.01)")
+    parser.add_argument("--publish", action="store_true",
+                        help="Publish the model to model/registry; running apps switch to it without a restart")
+    parser.add_argument("--check-precision", action="store_true",
+                        help="Check the bfloat16/float16 serving modes against float32 and enable the ones that pass")
+    main(parser.parse_args())